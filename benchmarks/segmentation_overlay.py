@@ -0,0 +1,105 @@
+"""Compares the cost per megapixel of drawing a segmentation overlay with the previous implementation of
+visualizers.draw_image_with_segmentation and with the current one, given a PIL image or the array canvas of the image.
+
+    python benchmarks/segmentation_overlay.py --sizes 640x480 1920x1080 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+# Run as a script from a checkout, the package is imported from the repository instead of an installed copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datasetvisualizer.core.visualization.visualizers import (  # noqa: E402
+    draw_image_with_segmentation,
+)
+
+
+def previous_draw_image_with_segmentation(image: Image, segmentation: Image):
+    rgba = np.array(segmentation.copy().convert("RGBA"))
+    r, g, b, a = rgba.T
+    black_areas = (r == 0) & (b == 0) & (g == 0) & (a == 255)
+    other_areas = (r != 0) | (b != 0) | (g != 0)
+    rgba[..., 0:4][black_areas.T] = (0, 0, 0, 0)
+    rgba[..., -1][other_areas.T] = int(0.6 * 255)
+
+    foreground = Image.fromarray(rgba)
+    image = image.copy()
+    image.paste(foreground, (0, 0), foreground)
+    return image
+
+
+def make_frame(width: int, height: int, mode: str, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(
+        rng.integers(0, 256, (height, width, len(mode)), dtype=np.uint8), mode
+    )
+    # About half of the pixels are labeled, like a typical segmentation of a scene
+    labels = rng.integers(0, 8, (height, width), dtype=np.uint8)
+    palette = rng.integers(1, 256, (8, 4), dtype=np.uint8)
+    palette[0] = (0, 0, 0, 255)
+    palette[1:4] = palette[0]
+    palette[:, 3] = 255
+    segmentation = Image.fromarray(palette[labels], "RGBA")
+    return image, segmentation
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080"])
+    parser.add_argument("--mode", default="RGBA", choices=["RGB", "RGBA"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>12} {'previous ms/MP':>15} {'current ms/MP':>14} {'speedup':>8} {'canvas ms/MP':>13} {'speedup':>8}"
+    )
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        image, segmentation = make_frame(width, height, args.mode)
+        megapixels = width * height / 1e6
+
+        expected = np.asarray(
+            previous_draw_image_with_segmentation(image, segmentation)
+        )
+        actual = np.asarray(draw_image_with_segmentation(image, segmentation))
+        assert np.array_equal(expected, actual), "outputs differ"
+        canvas = np.array(image)
+        draw_image_with_segmentation(canvas, segmentation)
+        assert np.array_equal(expected, canvas), "outputs differ"
+
+        previous = min(
+            timeit.repeat(
+                lambda: previous_draw_image_with_segmentation(image, segmentation),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        current = min(
+            timeit.repeat(
+                lambda: draw_image_with_segmentation(image, segmentation),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        # Blending into the same canvas again costs the same, the canvas isn't reset between runs
+        in_place = min(
+            timeit.repeat(
+                lambda: draw_image_with_segmentation(canvas, segmentation),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(
+            f"{size:>12} {previous * 1000 / megapixels:>15.2f} {current * 1000 / megapixels:>14.2f} "
+            f"{previous / current:>7.1f}x {in_place * 1000 / megapixels:>13.2f} {previous / in_place:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
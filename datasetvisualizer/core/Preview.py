@@ -21,6 +21,8 @@ from datasetvisualizer.helpers.ui import AppState, Components
 
 def preview_app(args):
     AppState.create_default_state(dataset_dir=args["data"])
+    # Frames still rendering for the previous run of the script won't be shown anymore
+    AppState.start_render_generation()
     base_dataset_dir = AppState.get_base_dataset_directory()
 
     # Top-level wrapper for UCVD
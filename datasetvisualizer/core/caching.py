@@ -0,0 +1,471 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_DATASET_CACHE_ENTRIES = 4
+DEFAULT_RENDER_CACHE_MB = 512
+DEFAULT_RENDER_DISK_CACHE_MB = 4096
+DEFAULT_DECODED_CACHE_MB = 8192
+DEFAULT_ENCODED_CACHE_MB = 256
+DEFAULT_INDEX_DIR = os.path.join(str(Path.home()), ".cache", "datasetvisualizer")
+
+_index_dir = DEFAULT_INDEX_DIR
+
+
+def get_index_dir() -> str:
+    """gets the directory where dataset indices that persist across restarts are saved, creating it if needed"""
+    os.makedirs(_index_dir, exist_ok=True)
+    return _index_dir
+
+
+def set_index_dir(index_dir: str):
+    global _index_dir
+    _index_dir = index_dir
+
+
+class LRUCache:
+    """Thread safe least recently used cache bounded by number of entries and, optionally, by total size in bytes."""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        """
+        :param max_entries: Optional, maximum number of entries kept, unbounded if None
+        :type max_entries: int
+        :param max_bytes: Optional, maximum sum of the sizes of the entries kept, unbounded if None
+        :type max_bytes: int
+        :param sizeof: Optional, function returning the size in bytes of a value, required if max_bytes is set
+        :type sizeof: Callable[[Any], int]
+        """
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("A sizeof function is required to bound the cache size")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self.pop(key)
+            size = self.sizeof(value) if self.sizeof is not None else 0
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size = self._entries.pop(key)
+            self.current_bytes -= size
+            return value
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def resize(
+        self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ):
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > 0 and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+
+
+class DatasetCache:
+    """Process wide cache of opened datasets.
+
+    Streamlit reruns the preview script on every widget interaction and for every browser session, parsing the
+    dataset definitions and captures each time. Datasets are cached here by resolved path, by the modification
+    times of the files they were parsed from and by the stamps of the dataset class, so a dataset is only parsed
+    again when it changes on disk.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_DATASET_CACHE_ENTRIES):
+        self.entries = LRUCache(max_entries=max_entries)
+        self._keys_by_path: Dict[Tuple[str, str], Tuple] = {}
+        self._path_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def set_max_entries(self, max_entries: int):
+        self.entries.resize(max_entries=max_entries)
+
+    @staticmethod
+    def _get_stamps_digest(files: List[str], stamps: List[Any]) -> str:
+        # Large datasets have thousands of files, keys holding every (path, mtime) pair are slow to hash and compare
+        digest = hashlib.sha1()
+        for file in sorted(files):
+            try:
+                mtime = os.stat(file).st_mtime_ns
+            except OSError:
+                mtime = -1
+            digest.update(f"{file}\0{mtime}\0".encode("utf8"))
+        digest.update(repr(stamps).encode("utf8"))
+        return digest.hexdigest()
+
+    def get_dataset(self, data_root: str, dataset_class: Any) -> Any:
+        """Returns the cached dataset of type dataset_class at data_root, opening it if it was never opened or if the
+        files it was parsed from changed
+
+        :param data_root: Path to the root of the dataset
+        :type data_root: str
+        :param dataset_class: Either SoloDataset or LegacyDataset, must provide get_definition_files(data_root) and
+                              can provide get_dataset_stamps(data_root) for changes the definition files don't show
+        :type dataset_class: type
+        :return: The opened dataset
+        """
+        path = str(Path(data_root).resolve())
+        path_key = (dataset_class.__name__, path)
+
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path_key, threading.Lock())
+
+        # Sessions opening the same dataset wait for the first one to parse it instead of parsing it again
+        with path_lock:
+            get_dataset_stamps = getattr(dataset_class, "get_dataset_stamps", None)
+            digest = DatasetCache._get_stamps_digest(
+                dataset_class.get_definition_files(data_root),
+                get_dataset_stamps(data_root) if get_dataset_stamps else [],
+            )
+            key = path_key + (digest,)
+
+            dataset = self.entries.get(key)
+            if dataset is not None:
+                return dataset
+
+            previous_key = self._keys_by_path.pop(path_key, None)
+            if previous_key is not None:
+                self.entries.pop(previous_key)
+
+            dataset = dataset_class(data_root)
+            dataset.dataset_key = key
+            dataset.dataset_digest = hashlib.sha1(repr(key).encode("utf8")).hexdigest()
+            if dataset.dataset_valid:
+                self.entries.put(key, dataset)
+                self._keys_by_path[path_key] = key
+            return dataset
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._keys_by_path.clear()
+
+
+class RenderCache:
+    """Two tier cache of rendered frames, the images with every enabled labeler drawn on them.
+
+    The first tier keeps decoded images in memory within a byte budget, the optional second tier keeps them as PNG
+    files in a directory so they survive restarts and memory evictions.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_RENDER_CACHE_MB * 1024 * 1024,
+        cache_dir: Optional[str] = None,
+        disk_max_bytes: int = DEFAULT_RENDER_DISK_CACHE_MB * 1024 * 1024,
+    ):
+        self.memory = LRUCache(max_bytes=max_bytes, sizeof=RenderCache.image_size)
+        self.cache_dir: Optional[str] = None
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        self.set_cache_dir(cache_dir)
+
+    @staticmethod
+    def image_size(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    @staticmethod
+    def make_key(
+        dataset: Any, index: int, labelers: Iterable[Hashable], max_size: int
+    ) -> Tuple:
+        """Creates the key of a rendered frame
+
+        :param dataset: The dataset the frame belongs to
+        :param index: The index of the frame
+        :type index: int
+        :param labelers: identifiers of the enabled labelers, order does not matter
+        :type labelers: Iterable[Hashable]
+        :param max_size: The maximum width and height the frame was rendered at
+        :type max_size: int
+        :return: key of the rendered frame
+        :rtype: Tuple
+        """
+        # Keys are hashed on every lookup, the digest of a cached dataset is a string whose hash python keeps
+        dataset_key = getattr(dataset, "dataset_digest", None)
+        if dataset_key is None:
+            dataset_key = (type(dataset).__name__, os.path.abspath(dataset.data_root))
+        return dataset_key, int(index), tuple(sorted(labelers, key=repr)), int(max_size)
+
+    def set_max_bytes(self, max_bytes: int):
+        self.memory.resize(max_bytes=max_bytes)
+
+    def set_cache_dir(
+        self, cache_dir: Optional[str], disk_max_bytes: Optional[int] = None
+    ):
+        with self._disk_lock:
+            if disk_max_bytes is not None:
+                self.disk_max_bytes = disk_max_bytes
+            self.cache_dir = cache_dir
+            self.disk_bytes = 0
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                self.disk_bytes = sum(
+                    f.stat().st_size for f in os.scandir(cache_dir) if f.is_file()
+                )
+
+    def _get_disk_path(self, key: Tuple) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(repr(key).encode("utf8")).hexdigest() + ".png"
+        )
+
+    def get(self, key: Tuple) -> Optional[Image.Image]:
+        image = self.memory.get(key)
+        if image is not None or self.cache_dir is None:
+            return image
+
+        path = self._get_disk_path(key)
+        try:
+            with Image.open(path) as disk_image:
+                disk_image.load()
+                image = disk_image.copy()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        self.memory.put(key, image)
+        return image
+
+    def put(self, key: Tuple, image: Image.Image):
+        self.memory.put(key, image)
+        if self.cache_dir is None:
+            return
+
+        path = self._get_disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            return
+
+        with self._disk_lock:
+            self.disk_bytes += size
+            if self.disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        files = sorted(
+            (f for f in os.scandir(self.cache_dir) if f.is_file()),
+            key=lambda f: f.stat().st_mtime,
+        )
+        self.disk_bytes = sum(f.stat().st_size for f in files)
+        # Evict down to 90% of the budget so eviction doesn't run on every put once the cache is full
+        for f in files:
+            if self.disk_bytes <= self.disk_max_bytes * 0.9:
+                break
+            try:
+                size = f.stat().st_size
+                os.remove(f.path)
+                self.disk_bytes -= size
+            except OSError:
+                pass
+
+    def get_or_render(
+        self, key: Tuple, render: Callable[[], Image.Image]
+    ) -> Image.Image:
+        image = self.get(key)
+        if image is None:
+            image = render()
+            self.put(key, image)
+        return image
+
+    def clear(self):
+        self.memory.clear()
+
+
+class DecodedFrameCache:
+    """Opt-in disk cache of decoded captures and masks, so revisiting a frame skips decoding its files.
+
+    Every decoded image is kept as a .npy file holding its pixels in a fixed (height, width, bands) shape, read back
+    as a read-only np.memmap. L and RGBA images are handed back as PIL images sharing the memory of the map, PIL
+    copies them on the first write. RGB images are stored with 3 bytes per pixel while PIL uses 4, they are copied
+    once into a new image, which is still much cheaper than decoding them. Least recently used files are evicted once
+    the files exceed the disk budget.
+    """
+
+    # Modes whose pixels can be stored as an array and rebuilt without a palette or other information
+    MODES = {"L": 1, "RGB": 3, "RGBA": 4}
+    SHARED_MODES = ("L", "RGBA")
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_DECODED_CACHE_MB * 1024 * 1024,
+    ):
+        self.cache_dir: Optional[str] = None
+        self.max_bytes = max_bytes
+        self.disk_bytes = 0
+        self._lock = threading.Lock()
+        self.set_cache_dir(cache_dir, max_bytes)
+
+    def set_cache_dir(self, cache_dir: Optional[str], max_bytes: Optional[int] = None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self.cache_dir = cache_dir
+            self.disk_bytes = 0
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                self.disk_bytes = sum(
+                    f.stat().st_size for f in os.scandir(cache_dir) if f.is_file()
+                )
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    @staticmethod
+    def make_key(filename: str, target: Tuple) -> Optional[Tuple]:
+        """Creates the key of a decoded file, the key changes when the file is modified
+
+        :param filename: path to the decoded file
+        :type filename: str
+        :param target: how the file was decoded, e.g. the max_size it was fitted in
+        :type target: Tuple
+        :return: key of the decoded image or None if the file can't be found
+        :rtype: Tuple
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, target
+
+    def _get_path(self, key: Tuple) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(repr(key).encode("utf8")).hexdigest() + ".npy"
+        )
+
+    def get_array(self, key: Tuple) -> Optional[np.memmap]:
+        """gets the pixels of a decoded image as a read-only view of its cache file, None if it isn't cached"""
+        if self.cache_dir is None or key is None:
+            return None
+        path = self._get_path(key)
+        try:
+            pixels = np.load(path, mmap_mode="r", allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return pixels
+
+    def get(self, key: Tuple) -> Optional[Image.Image]:
+        pixels = self.get_array(key)
+        if pixels is None:
+            return None
+        height, width, bands = pixels.shape
+        mode = next(m for m, b in DecodedFrameCache.MODES.items() if b == bands)
+        if mode in DecodedFrameCache.SHARED_MODES:
+            return Image.frombuffer(mode, (width, height), pixels, "raw", mode, 0, 1)
+        return Image.fromarray(pixels, mode)
+
+    def put(self, key: Tuple, image: Image.Image):
+        if self.cache_dir is None or key is None:
+            return
+        if image.mode not in DecodedFrameCache.MODES:
+            return
+
+        path = self._get_path(key)
+        # Worker processes share the directory, thread ids are only unique within a process
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        try:
+            pixels = np.lib.format.open_memmap(
+                tmp_path,
+                mode="w+",
+                dtype=np.uint8,
+                shape=(image.height, image.width, DecodedFrameCache.MODES[image.mode]),
+            )
+            pixels[:] = np.asarray(image).reshape(pixels.shape)
+            pixels.flush()
+            del pixels
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            self.disk_bytes += size
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = sorted(
+            (f for f in os.scandir(self.cache_dir) if f.is_file()),
+            key=lambda f: f.stat().st_mtime,
+        )
+        self.disk_bytes = sum(f.stat().st_size for f in files)
+        # Evict down to 90% of the budget so eviction doesn't run on every put once the cache is full
+        for f in files:
+            if self.disk_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                size = f.stat().st_size
+                os.remove(f.path)
+                self.disk_bytes -= size
+            except OSError:
+                pass
+
+
+dataset_cache = DatasetCache()
+render_cache = RenderCache()
+decoded_cache = DecodedFrameCache()
+# Frames encoded for the browser by (render key, encoding settings), repeat views of a frame skip encoding it again
+encoded_cache = LRUCache(max_bytes=DEFAULT_ENCODED_CACHE_MB * 1024 * 1024, sizeof=len)
+
+
+def open_dataset(data_root: str, dataset_class: Any) -> Any:
+    return dataset_cache.get_dataset(data_root, dataset_class)
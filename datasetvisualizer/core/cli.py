@@ -6,6 +6,9 @@ from pathlib import Path
 import streamlit.bootstrap as bootstrap
 from streamlit import config as _config
 
+from datasetvisualizer.core import caching, export, frame_server, indexing, rendering
+from datasetvisualizer.core.formats.perception import LegacyDataset
+from datasetvisualizer.core.visualization import encoding
 from datasetvisualizer.helpers import ui
 
 
@@ -36,8 +39,15 @@ def preview(dataset_path):
 
 
 def main(arg):
+    if len(arg) > 0 and arg[0] == "export":
+        sys.exit(export.main(arg[1:]))
+    if len(arg) > 0 and arg[0] == "index":
+        sys.exit(indexing.main(arg[1:]))
+
     cli = argparse.ArgumentParser(
-        description="Visualize annotations of synthetic datasets generated using Unity's Perception package."
+        description="Visualize annotations of synthetic datasets generated using Unity's Perception package.",
+        epilog="Run 'datasetvisualizer export -h' to render frames to image files without opening the app and "
+        "'datasetvisualizer index -h' to index the annotations of a SOLO dataset.",
     )
     cli.add_argument(
         "-o",
@@ -58,8 +68,160 @@ def main(arg):
         help="text path to the root of a dataset",
         default=None,
     )
+    cli.add_argument(
+        "--dataset-cache-size",
+        type=int,
+        help="number of opened datasets kept in memory and shared between browser sessions",
+        default=caching.DEFAULT_DATASET_CACHE_ENTRIES,
+    )
+    cli.add_argument(
+        "--render-cache-size",
+        type=int,
+        help="memory in MB used to keep rendered frames so that revisiting them doesn't render them again",
+        default=caching.DEFAULT_RENDER_CACHE_MB,
+    )
+    cli.add_argument(
+        "--render-cache-dir",
+        type=str,
+        help="directory where rendered frames are also kept on disk, disabled if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--render-cache-disk-size",
+        type=int,
+        help="disk space in MB used by the rendered frames kept in --render-cache-dir",
+        default=caching.DEFAULT_RENDER_DISK_CACHE_MB,
+    )
+    cli.add_argument(
+        "--decoded-cache-dir",
+        type=str,
+        help="directory where decoded images and masks are kept as memory-mapped files so that scrubbing back over "
+        "frames doesn't decode them again, disabled if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--decoded-cache-size",
+        type=int,
+        help="disk space in MB used by the decoded images kept in --decoded-cache-dir",
+        default=caching.DEFAULT_DECODED_CACHE_MB,
+    )
+    cli.add_argument(
+        "--index-dir",
+        type=str,
+        help="directory where dataset indices are saved so they are reused across restarts",
+        default=caching.DEFAULT_INDEX_DIR,
+    )
+    cli.add_argument(
+        "--lazy-captures-threshold",
+        type=int,
+        help="size in MB of the captures files of a legacy dataset above which captures are read on demand instead "
+        "of being loaded in memory when the dataset is opened",
+        default=LegacyDataset.DEFAULT_LAZY_CAPTURES_THRESHOLD_MB,
+    )
+    cli.add_argument(
+        "--render-workers",
+        type=int,
+        help="number of workers rendering the frames of a page concurrently",
+        default=rendering.DEFAULT_RENDER_WORKERS,
+    )
+    cli.add_argument(
+        "--render-processes",
+        help="render frames in a pool of processes instead of a pool of threads",
+        action="store_true",
+    )
+    cli.add_argument(
+        "--prefetch-workers",
+        type=int,
+        help="number of workers rendering the neighbor pages of the grid and the neighbor frames of the zoom view in "
+        "the background, 0 disables prefetching",
+        default=rendering.DEFAULT_PREFETCH_WORKERS,
+    )
+    for view in (encoding.GRID_VIEW, encoding.ZOOM_VIEW):
+        settings = encoding.view_encodings[view]
+        cli.add_argument(
+            f"--{view}-format",
+            choices=encoding.FORMATS,
+            help=f"format of the frames of the {view} view sent to the browser",
+            default=settings.format,
+        )
+        cli.add_argument(
+            f"--{view}-quality",
+            type=int,
+            help=f"quality from 1 to 100 of the frames of the {view} view encoded as jpeg or webp",
+            default=settings.quality,
+        )
+        cli.add_argument(
+            f"--{view}-subsampling",
+            choices=encoding.SUBSAMPLINGS,
+            help=f"chroma subsampling of the frames of the {view} view encoded as jpeg",
+            default=settings.subsampling,
+        )
+    cli.add_argument(
+        "--encoded-cache-size",
+        type=int,
+        help="memory in MB used to keep the frames encoded for the browser so that showing them again doesn't "
+        "encode them again",
+        default=caching.DEFAULT_ENCODED_CACHE_MB,
+    )
+    cli.add_argument(
+        "--frame-server-port",
+        type=int,
+        help="port of a local HTTP server the browser loads the frames from, so that it caches them and revisited "
+        "frames aren't sent again, 0 picks a free port, disabled if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--frame-server-address",
+        type=str,
+        help="address the frame server listens on",
+        default=frame_server.DEFAULT_FRAME_SERVER_ADDRESS,
+    )
+    cli.add_argument(
+        "--frame-server-url",
+        type=str,
+        help="URL the browser reaches the frame server at, e.g. behind a proxy, http://<address>:<port> if not "
+        "specified",
+        default=None,
+    )
     args = cli.parse_args(arg)
 
+    caching.set_index_dir(str(Path(args.index_dir).resolve()))
+    caching.dataset_cache.set_max_entries(max(1, args.dataset_cache_size))
+    caching.render_cache.set_max_bytes(max(0, args.render_cache_size) * 1024 * 1024)
+    LegacyDataset.LegacyDataset.lazy_captures_threshold = (
+        max(0, args.lazy_captures_threshold) * 1024 * 1024
+    )
+    caching.encoded_cache.resize(
+        max_bytes=max(0, args.encoded_cache_size) * 1024 * 1024
+    )
+    for view in (encoding.GRID_VIEW, encoding.ZOOM_VIEW):
+        encoding.set_view_encoding(
+            view,
+            encoding.EncodingSettings(
+                getattr(args, f"{view}_format"),
+                getattr(args, f"{view}_quality"),
+                getattr(args, f"{view}_subsampling"),
+            ),
+        )
+    rendering.render_executor.configure(
+        args.render_workers, args.render_processes, args.prefetch_workers
+    )
+    if args.render_cache_dir is not None:
+        caching.render_cache.set_cache_dir(
+            str(Path(args.render_cache_dir).resolve()),
+            max(0, args.render_cache_disk_size) * 1024 * 1024,
+        )
+    if args.decoded_cache_dir is not None:
+        caching.decoded_cache.set_cache_dir(
+            str(Path(args.decoded_cache_dir).resolve()),
+            max(0, args.decoded_cache_size) * 1024 * 1024,
+        )
+    if args.frame_server_port is not None:
+        server = frame_server.start_frame_server(
+            args.frame_server_address, args.frame_server_port, args.frame_server_url
+        )
+        print(f"\tServing frames at {server.url}")
+
     data_folder = args.data or None
 
     if args.open_folder_selector:
@@ -0,0 +1,522 @@
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from PIL import Image
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.caching import open_dataset
+from datasetvisualizer.core.formats.common import (
+    DATASET_TYPE_LEGACY,
+    DATASET_TYPE_SOLO,
+    get_dataset_format,
+)
+from datasetvisualizer.core.formats.perception.LegacyDataset import LegacyDataset
+from datasetvisualizer.core.formats.solo.SoloDataset import SoloDataset
+from datasetvisualizer.core.rendering import DEFAULT_RENDER_WORKERS, WorkerSettings
+
+EXPORT_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG"}
+DEFAULT_EXPORT_FORMAT = "png"
+DEFAULT_JPEG_QUALITY = 90
+# Frames submitted to the pool per worker, bounds the memory used by pending frames on large datasets
+DEFAULT_QUEUE_FACTOR = 4
+# max_size used to export frames at the resolution of the dataset, images are never upscaled
+FULL_RESOLUTION_MAX_SIZE = 1 << 16
+PROGRESS_INTERVAL = 2.0
+FRAME_RANGE_PATTERN = re.compile(r"^(\d+)(?:\s*-\s*(\d+))?$")
+
+
+class ExportJob:
+    """Everything a worker needs to render a frame and save it, sent once to every worker process"""
+
+    def __init__(
+        self,
+        dataset_class: Any,
+        data_root: str,
+        method: str,
+        args: Tuple,
+        output_dir: str,
+        image_format: str = DEFAULT_EXPORT_FORMAT,
+        quality: int = DEFAULT_JPEG_QUALITY,
+        digits: int = 6,
+    ):
+        self.dataset_class = dataset_class
+        self.data_root = data_root
+        self.method = method
+        self.args = args
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.quality = quality
+        self.digits = digits
+
+    def get_output_path(self, index: int) -> str:
+        return os.path.join(
+            self.output_dir, f"frame_{index:0{self.digits}d}.{self.image_format}"
+        )
+
+
+def parse_frame_ranges(spec: str) -> List[Tuple[int, int]]:
+    """gets the (start, end) ranges of a comma separated list of indices and start-end ranges, e.g. "0-99,150"
+
+    :param spec: the list of frames, ranges include their end
+    :type spec: str
+    :return: ranges including their end, an index is a range that starts and ends at it
+    :rtype: List[Tuple[int, int]]
+    :raises ValueError: if a part isn't an index or a range, or if a range ends before it starts
+    """
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = FRAME_RANGE_PATTERN.match(part)
+        if match is None:
+            raise ValueError(
+                f'invalid frames "{part}", expected an index or a start-end range like "0-99"'
+            )
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) is not None else start
+        if end < start:
+            raise ValueError(
+                f'invalid frames "{part}", the range ends before it starts'
+            )
+        ranges.append((start, end))
+    return ranges
+
+
+def parse_frames(spec: str, length: int) -> List[int]:
+    """gets the frame indices of a comma separated list of indices and start-end ranges, e.g. "0-99,150,200-249"
+
+    :param spec: the list of frames, ranges include their end
+    :type spec: str
+    :param length: number of frames of the dataset, frames out of range are dropped
+    :type length: int
+    :return: sorted indices without duplicates
+    :rtype: List[int]
+    :raises ValueError: if spec is invalid, see parse_frame_ranges
+    """
+    frames = set()
+    for start, end in parse_frame_ranges(spec):
+        frames.update(range(start, min(length, end + 1)))
+    return sorted(frames)
+
+
+def select_frames(
+    length: int,
+    start: int = 0,
+    end: Optional[int] = None,
+    step: int = 1,
+    frames: Optional[str] = None,
+    sample: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> List[int]:
+    """gets the indices of the frames to export
+
+    :param length: number of frames of the dataset
+    :type length: int
+    :param start: first frame of the range
+    :type start: int
+    :param end: Optional, end of the range (exclusive), the end of the dataset if None
+    :type end: int
+    :param step: interval between frames of the range
+    :type step: int
+    :param frames: Optional, list of frames as accepted by parse_frames, replaces the range
+    :type frames: str
+    :param sample: Optional, number of frames picked at random among the selected frames
+    :type sample: int
+    :param seed: Optional, seed of the random sample so the same frames are picked when an export is resumed
+    :type seed: int
+    :return: sorted indices
+    :rtype: List[int]
+    """
+    if frames is not None:
+        indices = parse_frames(frames, length)
+    else:
+        end = length if end is None else min(end, length)
+        indices = list(range(max(0, start), end, max(1, step)))
+
+    if sample is not None and sample < len(indices):
+        indices = sorted(random.Random(seed).sample(indices, max(0, sample)))
+    return indices
+
+
+def save_image(image: Image.Image, path: str, image_format: str, quality: int):
+    """Saves an image through a temporary file so that an interrupted export never leaves a truncated frame"""
+    pil_format = EXPORT_FORMATS[image_format]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if pil_format == "JPEG":
+            image.save(tmp_path, pil_format, quality=quality)
+        else:
+            image.save(tmp_path, pil_format)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+_worker_job: Optional[ExportJob] = None
+
+
+def _init_worker(job: ExportJob, settings: WorkerSettings):
+    global _worker_job
+    _worker_job = job
+    # Every frame is rendered once, the settings also disable the render cache of the workers
+    settings.apply()
+
+
+def export_frame(job: ExportJob, index: int) -> Tuple[int, Optional[str]]:
+    """Renders the frame at index and saves it in the output directory of the job
+
+    :return: (index, None) if the frame was exported, else (index, error message)
+    :rtype: Tuple[int, Optional[str]]
+    """
+    try:
+        ds = open_dataset(job.data_root, job.dataset_class)
+        image = getattr(ds, job.method)(index, *job.args)
+        save_image(image, job.get_output_path(index), job.image_format, job.quality)
+        return index, None
+    except Exception as e:
+        return index, f"{type(e).__name__}: {e}"
+
+
+def _export_frame_in_process(index: int) -> Tuple[int, Optional[str]]:
+    return export_frame(_worker_job, index)
+
+
+class ExportProgress:
+    """Prints the number of exported frames, the throughput and the estimated remaining time"""
+
+    def __init__(
+        self,
+        total: int,
+        out: Optional[TextIO] = None,
+        interval: float = PROGRESS_INTERVAL,
+    ):
+        self.total = total
+        self.out = out
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start_time = time.perf_counter()
+        self._last_report = self.start_time
+
+    def update(self, error: Optional[str] = None, index: Optional[int] = None):
+        self.done += 1
+        if error is not None:
+            self.failed += 1
+            self.write(f"\tError: frame {index} could not be exported, {error}")
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def get_throughput(self) -> float:
+        elapsed = time.perf_counter() - self.start_time
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        throughput = self.get_throughput()
+        remaining = self.total - self.done
+        eta = remaining / throughput if throughput > 0 else 0.0
+        self.write(
+            f"{self.done}/{self.total} frames exported, {throughput:.1f} frames/s, "
+            f"{self.failed} failed, {int(eta) // 60:d}:{int(eta) % 60:02d} remaining"
+        )
+
+    def write(self, message: str):
+        if self.out is not None:
+            print(message, file=self.out, flush=True)
+
+
+def run_export(
+    job: ExportJob,
+    indices: Iterable[int],
+    workers: int = DEFAULT_RENDER_WORKERS,
+    queue_size: Optional[int] = None,
+    overwrite: bool = False,
+    out: Optional[TextIO] = None,
+) -> ExportProgress:
+    """Exports the frames at indices, frames are rendered by a pool of processes that each open the dataset once
+
+    Frames whose output file already exists are skipped unless overwrite is set, so an interrupted export resumes
+    where it stopped. At most queue_size frames are submitted to the pool at a time.
+
+    :param job: the dataset, render arguments and output of the export
+    :type job: ExportJob
+    :param indices: indices of the frames to export
+    :type indices: Iterable[int]
+    :param workers: number of worker processes, frames are rendered in this process if 1 or less
+    :type workers: int
+    :param queue_size: Optional, maximum number of frames submitted and not done, workers * 4 if None
+    :type queue_size: int
+    :param overwrite: export frames even if their output file exists
+    :type overwrite: bool
+    :param out: Optional, stream progress is printed to, nothing is printed if None
+    :type out: TextIO
+    :return: the final progress, with the number of exported, skipped and failed frames
+    :rtype: ExportProgress
+    """
+    os.makedirs(job.output_dir, exist_ok=True)
+    indices = list(indices)
+    pending = [
+        index
+        for index in indices
+        if overwrite or not os.path.exists(job.get_output_path(index))
+    ]
+    progress = ExportProgress(len(pending), out)
+    progress.skipped = len(indices) - len(pending)
+    if progress.skipped > 0:
+        progress.write(f"{progress.skipped} frames already exported are skipped")
+
+    if workers <= 1 or len(pending) <= 1:
+        for index in pending:
+            index, error = export_frame(job, index)
+            progress.update(error, index)
+        progress.report()
+        return progress
+
+    queue_size = max(1, queue_size or workers * DEFAULT_QUEUE_FACTOR)
+    remaining = iter(pending)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(job, WorkerSettings.current()),
+    ) as executor:
+        in_flight = set()
+        for index in remaining:
+            in_flight.add(executor.submit(_export_frame_in_process, index))
+            if len(in_flight) >= queue_size:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, error = future.result()
+                progress.update(error, index)
+                next_index = next(remaining, None)
+                if next_index is not None:
+                    in_flight.add(executor.submit(_export_frame_in_process, next_index))
+    progress.report()
+    return progress
+
+
+def get_legacy_render_arguments(
+    ds: Any, labelers: Optional[Sequence[str]], max_size: int
+) -> Tuple[str, Tuple]:
+    """gets the method and arguments rendering the frames of a legacy dataset with the selected labelers"""
+    labelers_to_use = {
+        name: labelers is None or name in labelers
+        for name in ds.get_available_labelers()
+    }
+    return "get_image_with_labelers", (labelers_to_use, max_size)
+
+
+def get_solo_render_arguments(
+    ds: Any, labelers: Optional[Sequence[str]], max_size: int
+) -> Tuple[str, Tuple]:
+    """gets the method and arguments rendering the frames of a SOLO dataset with the selected annotators"""
+    annotator_dic = ds.get_annotator_dictionary()
+    labelers_to_use: Dict[str, bool] = {}
+    for annotator_type, annotators in annotator_dic.items():
+        for annotator in annotators:
+            annotator.state = labelers is None or annotator.name in labelers
+        labelers_to_use[annotator_type] = any(a.state for a in annotators)
+    return "get_solo_image_with_labelers", (labelers_to_use, annotator_dic, max_size)
+
+
+def get_labeler_names(ds: Any) -> List[str]:
+    return [
+        labeler["name"] if isinstance(labeler, dict) else labeler
+        for labeler in ds.get_available_labelers()
+    ]
+
+
+def main(arg):
+    cli = argparse.ArgumentParser(
+        prog="datasetvisualizer export",
+        description="Render frames of a dataset with their annotations to image files, without opening the app.",
+    )
+    cli.add_argument(
+        "-d",
+        "--data",
+        type=str,
+        help="text path to the root of a dataset",
+        required=True,
+    )
+    cli.add_argument(
+        "-O",
+        "--output",
+        type=str,
+        help="directory the frames are written to, frames already in it are not exported again",
+        default=None,
+    )
+    cli.add_argument(
+        "-l",
+        "--labelers",
+        type=str,
+        nargs="+",
+        help="names of the labelers drawn on the frames, all the labelers of the dataset if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--list-labelers",
+        help="print the names of the labelers of the dataset and exit",
+        action="store_true",
+    )
+    cli.add_argument("--start", type=int, help="first frame exported", default=0)
+    cli.add_argument(
+        "--end",
+        type=int,
+        help="frame the export stops at (exclusive), the last frame of the dataset if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--step", type=int, help="interval between exported frames", default=1
+    )
+    cli.add_argument(
+        "--frames",
+        type=str,
+        help='comma separated frames and ranges to export instead of --start/--end, e.g. "0-99,150"',
+        default=None,
+    )
+    cli.add_argument(
+        "--sample",
+        type=int,
+        help="number of frames picked at random among the selected frames",
+        default=None,
+    )
+    cli.add_argument(
+        "--seed",
+        type=int,
+        help="seed of --sample, keep it when resuming an export so the same frames are picked",
+        default=0,
+    )
+    cli.add_argument(
+        "--format",
+        type=str,
+        choices=sorted(EXPORT_FORMATS.keys()),
+        help="image format of the exported frames",
+        default=DEFAULT_EXPORT_FORMAT,
+    )
+    cli.add_argument(
+        "--quality",
+        type=int,
+        help="quality of the exported JPEG images",
+        default=DEFAULT_JPEG_QUALITY,
+    )
+    cli.add_argument(
+        "--max-size",
+        type=int,
+        help="maximum width and height of the exported frames, the resolution of the dataset if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--workers",
+        type=int,
+        help="number of processes rendering frames",
+        default=DEFAULT_RENDER_WORKERS,
+    )
+    cli.add_argument(
+        "--queue-size",
+        type=int,
+        help=f"maximum number of frames waiting to be rendered, {DEFAULT_QUEUE_FACTOR} per worker if not specified",
+        default=None,
+    )
+    cli.add_argument(
+        "--overwrite",
+        help="export frames again even if they are already in the output directory",
+        action="store_true",
+    )
+    cli.add_argument(
+        "--index-dir",
+        type=str,
+        help="directory where dataset indices are saved so they are reused across restarts",
+        default=caching.DEFAULT_INDEX_DIR,
+    )
+    args = cli.parse_args(arg)
+    if args.output is None and not args.list_labelers:
+        cli.error("the following arguments are required: -O/--output")
+    if args.frames is not None:
+        # Checked before the dataset is opened, which can take a while
+        try:
+            parse_frame_ranges(args.frames)
+        except ValueError as e:
+            cli.error(f"argument --frames: {e}")
+
+    caching.set_index_dir(str(Path(args.index_dir).resolve()))
+    caching.render_cache.set_max_bytes(0)
+    data_root = str(Path(args.data).resolve())
+    dataset_format = get_dataset_format(data_root)
+    if dataset_format == DATASET_TYPE_SOLO:
+        dataset_class = SoloDataset
+    elif dataset_format == DATASET_TYPE_LEGACY:
+        dataset_class = LegacyDataset
+    else:
+        print(
+            "\tError: The provided folder is not a SOLO or legacy Perception dataset."
+        )
+        return 1
+
+    ds = open_dataset(data_root, dataset_class)
+    available = get_labeler_names(ds)
+    if args.list_labelers:
+        print("\n".join(available))
+        return 0
+    if args.labelers is not None:
+        unknown = [name for name in args.labelers if name not in available]
+        if unknown:
+            print(
+                f"\tError: Unknown labelers {unknown}, available labelers are {available}"
+            )
+            return 1
+
+    max_size = args.max_size or FULL_RESOLUTION_MAX_SIZE
+    if dataset_format == DATASET_TYPE_SOLO:
+        method, render_args = get_solo_render_arguments(ds, args.labelers, max_size)
+    else:
+        method, render_args = get_legacy_render_arguments(ds, args.labelers, max_size)
+
+    length = ds.length()
+    indices = select_frames(
+        length,
+        args.start,
+        args.end,
+        args.step,
+        args.frames,
+        args.sample,
+        args.seed,
+    )
+    job = ExportJob(
+        dataset_class,
+        data_root,
+        method,
+        render_args,
+        str(Path(args.output).resolve()),
+        args.format,
+        args.quality,
+        digits=max(6, len(str(max(0, length - 1)))),
+    )
+    progress = run_export(
+        job,
+        indices,
+        args.workers,
+        args.queue_size,
+        args.overwrite,
+        out=sys.stdout,
+    )
+    print(
+        f"Exported {progress.done - progress.failed} frames to {job.output_dir} in "
+        f"{time.perf_counter() - progress.start_time:.1f}s, {progress.skipped} skipped, {progress.failed} failed"
+    )
+    return 1 if progress.failed > 0 else 0
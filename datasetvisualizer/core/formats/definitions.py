@@ -0,0 +1,138 @@
+from typing import Any, Dict, List, Optional
+
+
+class DefinitionRegistry:
+    """Lookup tables for the annotation and metric definitions of a dataset.
+
+    Built once when a dataset is opened so that per-frame rendering can resolve definitions, label mappings and
+    keypoint templates with a dictionary lookup instead of rebuilding record lists from the definition tables.
+    """
+
+    def __init__(
+        self,
+        annotation_definitions: List[Dict[str, Any]],
+        metric_definitions: List[Dict[str, Any]],
+    ):
+        """
+        :param annotation_definitions: annotation definition records, each with at least an "id"
+        :type annotation_definitions: List[Dict[str, Any]]
+        :param metric_definitions: metric definition records, each with at least an "id"
+        :type metric_definitions: List[Dict[str, Any]]
+        """
+        self.annotation_definitions: List[Dict[str, Any]] = annotation_definitions
+        self.metric_definitions: List[Dict[str, Any]] = metric_definitions
+
+        self.annotation_ids_by_name: Dict[str, Any] = {}
+        self.annotation_indices_by_name: Dict[str, int] = {}
+        self.annotations_by_id: Dict[Any, Dict[str, Any]] = {}
+        self.label_mappings_by_id: Dict[Any, Dict[int, str]] = {}
+        self.keypoint_templates: Dict[str, Dict[str, Any]] = {}
+        self.metrics_by_id: Dict[Any, Dict[str, Any]] = {}
+
+        for idx, definition in enumerate(annotation_definitions):
+            def_id = definition["id"]
+            name = definition.get("name", def_id)
+            if name not in self.annotation_ids_by_name:
+                self.annotation_ids_by_name[name] = def_id
+                self.annotation_indices_by_name[name] = idx
+            self.annotations_by_id[def_id] = definition
+
+            spec = definition.get("spec")
+            if isinstance(spec, list):
+                label_mappings = DefinitionRegistry._to_label_mappings(spec)
+                if len(label_mappings) > 0:
+                    self.label_mappings_by_id[def_id] = label_mappings
+
+            for template in DefinitionRegistry._to_keypoint_templates(definition):
+                self.keypoint_templates[template["templateId"]] = template
+
+        for metric in metric_definitions:
+            self.metrics_by_id[metric["id"]] = metric
+
+    @staticmethod
+    def _to_label_mappings(spec: List[Dict[str, Any]]) -> Dict[int, str]:
+        label_mappings = {}
+        for m in spec:
+            if not isinstance(m, dict):
+                continue
+            if "label_id" in m and "label_name" in m:
+                label_mappings[m["label_id"]] = m["label_name"]
+            elif "labelId" in m and "labelName" in m:
+                label_mappings[m["labelId"]] = m["labelName"]
+        return label_mappings
+
+    @staticmethod
+    def _to_keypoint_templates(definition: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # SOLO keypoint definitions hold a single "template", legacy ones hold a list of templates in "spec"
+        templates = []
+        if isinstance(definition.get("template"), dict):
+            templates.append(definition["template"])
+        spec = definition.get("spec")
+        if isinstance(spec, list):
+            for template in spec:
+                if isinstance(template, dict) and "template_id" in template:
+                    templates.append(dict(template, templateId=template["template_id"]))
+        return [t for t in templates if "templateId" in t]
+
+    @staticmethod
+    def from_legacy(ann_def, metric_def) -> "DefinitionRegistry":
+        """Creates the registry from the datasetinsights definition tables of a legacy Perception dataset
+
+        :param ann_def: annotation definitions of the dataset
+        :type ann_def: AnnotationDefinitions
+        :param metric_def: metric definitions of the dataset
+        :type metric_def: MetricDefinitions
+        :return: registry of the dataset definitions
+        :rtype: DefinitionRegistry
+        """
+        return DefinitionRegistry(
+            ann_def.table.to_dict("records"), metric_def.table.to_dict("records")
+        )
+
+    @staticmethod
+    def from_solo(
+        annotation_definitions: Dict[str, Any],
+        metric_definitions: Optional[Dict[str, Any]] = None,
+    ) -> "DefinitionRegistry":
+        """Creates the registry from the parsed definition files of a SOLO dataset
+
+        :param annotation_definitions: content of annotation_definitions.json
+        :type annotation_definitions: Dict[str, Any]
+        :param metric_definitions: content of metric_definitions.json
+        :type metric_definitions: Dict[str, Any]
+        :return: registry of the dataset definitions
+        :rtype: DefinitionRegistry
+        """
+        metrics = []
+        if metric_definitions is not None:
+            metrics = metric_definitions.get("metricDefinitions", [])
+        return DefinitionRegistry(
+            annotation_definitions.get("annotationDefinitions", []), metrics
+        )
+
+    def get_annotation_names(self) -> List[str]:
+        return [d.get("name", d["id"]) for d in self.annotation_definitions]
+
+    def get_annotation_id(self, name: str) -> Optional[Any]:
+        return self.annotation_ids_by_name.get(name)
+
+    def get_annotation_index(self, name: str) -> int:
+        return self.annotation_indices_by_name.get(name, -1)
+
+    def get_annotation(self, def_id: Any) -> Optional[Dict[str, Any]]:
+        return self.annotations_by_id.get(def_id)
+
+    def get_label_mappings(self, def_id: Any) -> Dict[int, str]:
+        return self.label_mappings_by_id.get(def_id, {})
+
+    def get_keypoint_template(self, template_id: str) -> Optional[Dict[str, Any]]:
+        return self.keypoint_templates.get(template_id)
+
+    def get_metric(self, def_id: Any) -> Optional[Dict[str, Any]]:
+        return self.metrics_by_id.get(def_id)
+
+    def get_metric_name(self, def_id: Any) -> Optional[str]:
+        metric = self.metrics_by_id.get(def_id)
+        if metric is None:
+            return None
+        return metric.get("name", metric["id"])
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from datasetvisualizer.core.caching import get_index_dir
+
+CAPTURES_FILE_PATTERN = re.compile(r"^captures_(\d+)\.json$")
+CAPTURES_ARRAY_PATTERN = re.compile(rb'"captures"\s*:\s*\[')
+FRAME_NUMBER_PATTERN = re.compile(r"_(\d+)\.[^./\\]*$")
+OFFSET_TABLE_VERSION = 1
+
+
+class CaptureOffsetTable:
+    """Maps the global frame index of a legacy Perception dataset to the captures file holding the capture of that
+    frame, its position in the file and the byte range of its json record.
+
+    Frames are ordered by the frame number of their RGB filename like in LegacyDataset. The table is saved in the
+    index directory and rebuilt only when a captures file is added, removed or modified, so reading the capture of a
+    frame only needs to parse that one record.
+    """
+
+    def __init__(self, captures_dir: str):
+        self.captures_dir = captures_dir
+        self.files: List[str] = []
+        self.file_ids = np.zeros(0, dtype=np.int32)
+        self.positions = np.zeros(0, dtype=np.int32)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self.frame_numbers = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def get_captures_files(captures_dir: str) -> List[str]:
+        """gets the names of the captures files of the directory ordered by their number
+
+        :param captures_dir: directory holding the captures json files
+        :type captures_dir: str
+        :return: names of the captures files
+        :rtype: List[str]
+        """
+        files = []
+        for file in os.listdir(captures_dir):
+            match = CAPTURES_FILE_PATTERN.match(file)
+            if match is not None:
+                files.append((int(match.group(1)), file))
+        return [file for _, file in sorted(files)]
+
+    @staticmethod
+    def _get_frame_number(filename: str) -> int:
+        match = FRAME_NUMBER_PATTERN.search(filename)
+        return int(match.group(1)) if match is not None else -1
+
+    @staticmethod
+    def scan_captures_file(path: str) -> List[Tuple[int, int, Dict[str, Any]]]:
+        """Finds the byte range of every record of the captures array of a captures file
+
+        :param path: path to the captures json file
+        :type path: str
+        :return: list of (start, end, capture) where [start, end) is the byte range of the capture record
+        :rtype: List[Tuple[int, int, Dict[str, Any]]]
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+
+        match = CAPTURES_ARRAY_PATTERN.search(data)
+        if match is None:
+            return []
+
+        # Latin-1 maps every byte to one character so that character offsets are byte offsets, multi-byte utf-8
+        # characters can only appear inside of strings so they don't change how the json is structured
+        text = data.decode("latin-1")
+        decoder = json.JSONDecoder()
+        records = []
+        position = match.end()
+        length = len(text)
+        while position < length:
+            c = text[position]
+            if c in " \t\r\n,":
+                position += 1
+            elif c == "]":
+                break
+            else:
+                capture, end = decoder.raw_decode(text, position)
+                records.append((position, end, capture))
+                position = end
+        return records
+
+    def _get_stamps(self) -> Tuple[List[str], np.ndarray]:
+        files = CaptureOffsetTable.get_captures_files(self.captures_dir)
+        stamps = np.array(
+            [
+                os.stat(os.path.join(self.captures_dir, file)).st_mtime_ns
+                for file in files
+            ],
+            dtype=np.int64,
+        )
+        return files, stamps
+
+    def _get_table_path(self) -> str:
+        digest = hashlib.sha1(
+            os.path.abspath(self.captures_dir).encode("utf8")
+        ).hexdigest()
+        return os.path.join(get_index_dir(), f"captures_{digest}.npz")
+
+    def build(self, files: List[str]):
+        file_ids, positions, starts, ends, frame_numbers = [], [], [], [], []
+        for file_id, file in enumerate(files):
+            records = CaptureOffsetTable.scan_captures_file(
+                os.path.join(self.captures_dir, file)
+            )
+            for position, (start, end, capture) in enumerate(records):
+                file_ids.append(file_id)
+                positions.append(position)
+                starts.append(start)
+                ends.append(end)
+                frame_numbers.append(
+                    CaptureOffsetTable._get_frame_number(capture.get("filename", ""))
+                )
+
+        order = np.argsort(np.array(frame_numbers, dtype=np.int64), kind="stable")
+        self.files = files
+        self.file_ids = np.array(file_ids, dtype=np.int32)[order]
+        self.positions = np.array(positions, dtype=np.int32)[order]
+        self.starts = np.array(starts, dtype=np.int64)[order]
+        self.ends = np.array(ends, dtype=np.int64)[order]
+        self.frame_numbers = np.array(frame_numbers, dtype=np.int64)[order]
+
+    def load(self) -> "CaptureOffsetTable":
+        """Loads the table from the index directory, building and saving it if it is missing or outdated
+
+        :return: self
+        :rtype: CaptureOffsetTable
+        """
+        files, stamps = self._get_stamps()
+        table_path = self._get_table_path()
+
+        try:
+            with np.load(table_path, allow_pickle=False) as table:
+                if (
+                    int(table["version"]) == OFFSET_TABLE_VERSION
+                    and table["files"].tolist() == files
+                    and np.array_equal(table["stamps"], stamps)
+                ):
+                    self.files = files
+                    self.file_ids = table["file_ids"]
+                    self.positions = table["positions"]
+                    self.starts = table["starts"]
+                    self.ends = table["ends"]
+                    self.frame_numbers = table["frame_numbers"]
+                    return self
+        except (OSError, KeyError, ValueError):
+            pass
+
+        self.build(files)
+        self.save(table_path, stamps)
+        return self
+
+    def save(self, table_path: str, stamps: np.ndarray):
+        tmp_path = f"{table_path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(
+                tmp_path,
+                version=np.array(OFFSET_TABLE_VERSION),
+                files=np.array(self.files, dtype=str),
+                stamps=stamps,
+                file_ids=self.file_ids,
+                positions=self.positions,
+                starts=self.starts,
+                ends=self.ends,
+                frame_numbers=self.frame_numbers,
+            )
+            os.replace(tmp_path, table_path)
+        except OSError as e:
+            # The table still works from memory if the index directory isn't writable
+            print(e)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def get_location(self, index: int) -> Tuple[str, int, int, int]:
+        """gets where the capture of a frame is stored
+
+        :param index: global frame index
+        :type index: int
+        :return: (path to the captures file, position in the captures array, start byte, end byte)
+        :rtype: Tuple[str, int, int, int]
+        """
+        return (
+            os.path.join(self.captures_dir, self.files[self.file_ids[index]]),
+            int(self.positions[index]),
+            int(self.starts[index]),
+            int(self.ends[index]),
+        )
+
+    def read_capture(self, index: int) -> Optional[Dict[str, Any]]:
+        """Parses only the capture record of the frame at index
+
+        :param index: global frame index
+        :type index: int
+        :return: the capture record
+        :rtype: Dict[str, Any]
+        """
+        if index < 0 or index >= len(self):
+            return None
+        path, _, start, end = self.get_location(index)
+        with open(path, "rb") as f:
+            f.seek(start)
+            return json.loads(f.read(end - start).decode("utf8"))
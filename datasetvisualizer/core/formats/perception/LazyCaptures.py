@@ -0,0 +1,87 @@
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from datasetvisualizer.core.caching import LRUCache
+from datasetvisualizer.core.formats.perception.CaptureOffsetTable import (
+    CAPTURES_FILE_PATTERN,
+    CaptureOffsetTable,
+)
+
+PARSED_CAPTURES_CACHE_ENTRIES = 256
+
+
+def get_captures_size(files: Iterable[str]) -> int:
+    """gets the total size in bytes of the captures files among files
+
+    :param files: paths of the json files of a dataset, e.g. LegacyDataset.get_definition_files
+    :type files: Iterable[str]
+    :return: size of the captures_*.json files
+    :rtype: int
+    """
+    size = 0
+    for file in files:
+        if CAPTURES_FILE_PATTERN.match(os.path.basename(file)):
+            try:
+                size += os.path.getsize(file)
+            except OSError:
+                pass
+    return size
+
+
+class LazyCaptures:
+    """Captures of a legacy Perception dataset read on demand.
+
+    Opening the dataset only loads the offset table of the captures, the record of a frame is parsed from its byte
+    range in its captures file the first time the frame is used. The most recently parsed records are kept so the
+    labelers of a frame don't parse it again. Records are returned as capture rows with the same keys as the rows of
+    the captures DataFrame of datasetinsights filtered by annotation definition.
+    """
+
+    def __init__(
+        self,
+        offsets: CaptureOffsetTable,
+        max_entries: int = PARSED_CAPTURES_CACHE_ENTRIES,
+    ):
+        """
+        :param offsets: The loaded offset table of the captures files
+        :type offsets: CaptureOffsetTable
+        :param max_entries: number of parsed capture records kept in memory
+        :type max_entries: int
+        """
+        self.offsets = offsets
+        self.records = LRUCache(max_entries=max_entries)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get_record(self, index: int) -> Dict[str, Any]:
+        record = self.records.get(index)
+        if record is None:
+            record = self.offsets.read_capture(index)
+            if record is None:
+                raise IndexError(f"Frame {index} is out of range")
+            self.records.put(index, record)
+        return record
+
+    def get_capture(self, def_id: Optional[str], index: int) -> Dict[str, Any]:
+        """gets the capture of the frame at index joined with the annotation of the specified definition
+
+        :param def_id: annotation definition id
+        :type def_id: str
+        :param index: The index of the frame we want
+        :type index: int
+        :return: capture row with the keys of the capture record and the "annotation." keys, "annotation.values" is
+                 empty if the capture has no annotation of the definition
+        :rtype: Dict[str, Any]
+        """
+        record = self.get_record(index)
+        capture = {key: value for key, value in record.items() if key != "annotations"}
+        capture["annotation.values"] = []
+        for annotation in record.get("annotations") or []:
+            if annotation.get("annotation_definition") == def_id:
+                for key, value in annotation.items():
+                    capture[f"annotation.{key}"] = value
+                if capture["annotation.values"] is None:
+                    capture["annotation.values"] = []
+                break
+        return capture
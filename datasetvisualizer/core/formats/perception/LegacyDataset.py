@@ -1,17 +1,40 @@
-﻿import os
-from typing import Dict, Optional
+﻿import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
+import pandas as pd
 from datasetinsights.datasets.unity_perception import (
     AnnotationDefinitions,
     MetricDefinitions,
 )
 from datasetinsights.datasets.unity_perception.captures import Captures
+from datasetinsights.datasets.unity_perception.exceptions import DefinitionIDError
 from PIL import Image
 
 import datasetvisualizer.core.visualization.visualizers as v
+from datasetvisualizer.core.caching import RenderCache, render_cache
+from datasetvisualizer.core.formats.definitions import DefinitionRegistry
+from datasetvisualizer.core.formats.perception.CaptureOffsetTable import (
+    CaptureOffsetTable,
+)
+from datasetvisualizer.core.formats.perception.LazyCaptures import (
+    LazyCaptures,
+    get_captures_size,
+)
+from datasetvisualizer.core.formats.perception.LegacySQLiteIndex import (
+    LegacySQLiteIndex,
+    get_metrics_files,
+)
+from datasetvisualizer.core.visualization.decoding import open_image, open_mask
+
+# Datasets whose captures files are larger than this are opened with LazyCaptures instead of datasetinsights Captures
+DEFAULT_LAZY_CAPTURES_THRESHOLD_MB = 256
 
 
 class LegacyDataset:
+    lazy_captures_threshold = DEFAULT_LAZY_CAPTURES_THRESHOLD_MB * 1024 * 1024
+
     @staticmethod
     def is_folder_valid_dataset(base_dataset_dir: str):
         found_dataset = False
@@ -32,36 +55,211 @@ class LegacyDataset:
         except PermissionError:
             return False
 
+    @staticmethod
+    def get_definition_files(base_dataset_dir: str) -> List[str]:
+        """gets the json files the dataset is parsed from, used to detect when a cached dataset is outdated
+
+        :param base_dataset_dir: Path to the root of the dataset
+        :type base_dataset_dir: str
+        :return: paths of the json files inside of the Dataset directories
+        :rtype: List[str]
+        """
+        files = []
+        try:
+            for directory in os.scandir(base_dataset_dir):
+                if directory.is_dir() and directory.name.startswith("Dataset"):
+                    files.extend(
+                        f.path
+                        for f in os.scandir(directory.path)
+                        if f.is_file() and f.name.endswith(".json")
+                    )
+        except OSError:
+            pass
+        return files
+
     def __init__(self, data_root: str):
         self.ann_def: Optional[AnnotationDefinitions] = None
         self.metric_def: Optional[MetricDefinitions] = None
         self.cap: Optional[Captures] = None
+        self.lazy_captures: Optional[LazyCaptures] = None
+        self.sqlite_index: Optional[LegacySQLiteIndex] = None
+        self.definitions: Optional[DefinitionRegistry] = None
         self.data_root: Optional[str] = None
+        self.frame_index: Dict[str, pd.DataFrame] = {}
+        self.rgb_definition_id: Optional[str] = None
+        self.captures_dir: Optional[str] = None
+        self.metrics_index: Optional[Dict[Tuple[str, int], List[Dict[str, Any]]]] = None
+        self.metrics_index_lock = threading.Lock()
+        self.capture_offsets: Optional[CaptureOffsetTable] = None
+        self.capture_offsets_lock = threading.Lock()
         self.dataset_valid: bool = False
 
         if LegacyDataset.is_folder_valid_dataset(data_root):
             try:
                 self.ann_def = AnnotationDefinitions(data_root)
                 self.metric_def = MetricDefinitions(data_root)
-                self.cap = Captures(data_root)
+                self.definitions = DefinitionRegistry.from_legacy(
+                    self.ann_def, self.metric_def
+                )
                 self.data_root = data_root
+                self.sqlite_index = LegacySQLiteIndex.open(self.get_captures_dir())
+                captures_size = get_captures_size(
+                    LegacyDataset.get_definition_files(data_root)
+                )
+                if self.sqlite_index is not None:
+                    self._set_rgb_definition_id()
+                elif captures_size > LegacyDataset.lazy_captures_threshold:
+                    self._open_lazy_captures()
+                else:
+                    self.cap = Captures(data_root)
+                    self._build_frame_index()
                 self.dataset_valid = True
             except Exception as e:
                 print(e)
                 self.ann_def = None
                 self.metric_def = None
                 self.cap = None
+                self.lazy_captures = None
+                self.sqlite_index = None
+                self.definitions = None
                 self.data_root = None
+                self.frame_index = {}
+                self.rgb_definition_id = None
                 self.dataset_valid = False
 
+    def _build_frame_index(self):
+        """Filters and sorts the captures once per annotation definition so that looking up the capture of a frame
+        for a given labeler is a positional lookup instead of a filter and sort of the whole captures table
+        """
+        self.frame_index = {}
+        self.rgb_definition_id = None
+        for def_id in self.definitions.annotations_by_id:
+            try:
+                captures = self.cap.filter(def_id=def_id)
+            except DefinitionIDError:
+                continue
+            self.frame_index[def_id] = captures.sort_values(
+                by="filename", key=LegacyDataset.custom_compare_filenames
+            ).reset_index(drop=True)
+            if self.rgb_definition_id is None and isinstance(def_id, str):
+                self.rgb_definition_id = def_id
+
+    def _open_lazy_captures(self):
+        """Opens the captures with only their offset table in memory, records are parsed when their frame is used.
+        Large datasets would otherwise take minutes and most of the memory to load in the captures DataFrame
+        """
+        self.lazy_captures = LazyCaptures(self.get_capture_offsets())
+        self._set_rgb_definition_id()
+
+    def _set_rgb_definition_id(self):
+        # Captures read from the SQLite index or lazily hold their RGB filename whatever the definition
+        self.frame_index = {}
+        annotation_ids = list(self.definitions.annotations_by_id)
+        self.rgb_definition_id = annotation_ids[0] if annotation_ids else None
+
+    def get_capture(self, def_id: str, index: int) -> pd.Series:
+        """gets the capture of the frame at index joined with the annotation of the specified definition
+
+        :param def_id: annotation definition id
+        :type def_id: str
+        :param index: The index of the frame we want
+        :type index: int
+        :return: capture row with the columns of the captures table and the "annotation." columns, a dictionary with
+                 the same keys if the captures are read lazily
+        :rtype: pd.Series
+        """
+        if self.sqlite_index is not None:
+            return self.sqlite_index.get_capture(def_id, index)
+        if self.lazy_captures is not None:
+            return self.lazy_captures.get_capture(def_id, index)
+        return self.frame_index[def_id].iloc[index]
+
     def get_metrics_records(self):
-        return self.metric_def.table.to_dict("records")
+        return self.definitions.metric_definitions
+
+    def get_captures_dir(self) -> Optional[str]:
+        """gets the absolute path of the Dataset directory that holds the captures and metrics json files
+
+        :return: absolute path of the directory or None if it doesn't exist
+        :rtype: str
+        """
+        if self.captures_dir is None:
+            self.captures_dir = LegacyDataset.find_captures_dir(self.data_root)
+        return self.captures_dir
+
+    @staticmethod
+    def find_captures_dir(data_root: str) -> Optional[str]:
+        for directory in os.walk(data_root):
+            name = str(directory[0]).replace("\\", "/").split("/")[-1]
+            if (
+                name.startswith("Dataset")
+                and "." not in name[1:]
+                and os.path.abspath(data_root) != os.path.abspath(directory[0])
+            ):
+                return os.path.abspath(directory[0])
+        return None
+
+    def _build_metrics_index(self) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
+        metrics_index = {}
+        captures_dir = self.get_captures_dir()
+        if captures_dir is None:
+            return metrics_index
+
+        for file in get_metrics_files(captures_dir):
+            with open(os.path.join(captures_dir, file), "r", encoding="utf8") as f:
+                metrics = json.load(f)["metrics"]
+            for metric in metrics:
+                key = (metric["sequence_id"], metric["step"])
+                metrics_index.setdefault(key, []).append(metric)
+        return metrics_index
+
+    def get_capture_offsets(self) -> CaptureOffsetTable:
+        with self.capture_offsets_lock:
+            if self.capture_offsets is None:
+                self.capture_offsets = CaptureOffsetTable(
+                    self.get_captures_dir()
+                ).load()
+        return self.capture_offsets
+
+    def get_capture_record(self, index: int) -> Optional[Dict[str, Any]]:
+        """gets the json record of the capture of the frame at index, only that record is parsed
+
+        :param index: The index of the frame we want
+        :type index: int
+        :return: the capture record as stored in the captures file
+        :rtype: Dict[str, Any]
+        """
+        if self.sqlite_index is not None:
+            return self.sqlite_index.get_capture_record(index)
+        return self.get_capture_offsets().read_capture(index)
+
+    def get_metrics(self, sequence_id: str, step: int) -> List[Dict[str, Any]]:
+        """gets the metric records of a capture, the metric files are indexed by (sequence_id, step) the first time
+        this is called
+
+        :param sequence_id: sequence id of the capture
+        :type sequence_id: str
+        :param step: step of the capture
+        :type step: int
+        :return: metric records of the capture
+        :rtype: List[Dict[str, Any]]
+        """
+        if self.sqlite_index is not None:
+            return self.sqlite_index.get_metrics(sequence_id, step)
+        with self.metrics_index_lock:
+            if self.metrics_index is None:
+                self.metrics_index = self._build_metrics_index()
+        return self.metrics_index.get((sequence_id, step), [])
 
     def get_available_labelers(self):
-        return [a["name"] for a in self.ann_def.table.to_dict("records")]
+        return self.definitions.get_annotation_names()
 
     def length(self):
-        return len(self.cap.captures.to_dict("records"))
+        if self.sqlite_index is not None:
+            return len(self.sqlite_index)
+        if self.lazy_captures is not None:
+            return len(self.lazy_captures)
+        return len(self.cap.captures)
 
     def get_annotation_id(self, name: str) -> Optional[str]:
         """gets annotation definition id of the specified annotation
@@ -71,11 +269,7 @@ class LegacyDataset:
         :return: annotation definition id
         :rtype: str
         """
-
-        for idx, a in enumerate(self.ann_def.table.to_dict("records")):
-            if a["name"] == name:
-                return a["id"]
-        return None
+        return self.definitions.get_annotation_id(name)
 
     def get_annotation_index(self, name: str) -> int:
         """gets annotation definition index of the specified annotation
@@ -85,10 +279,7 @@ class LegacyDataset:
         :return: index
         :rtype: int
         """
-        for idx, a in enumerate(self.ann_def.table.to_dict("records")):
-            if a["name"] == name:
-                return idx
-        return -1
+        return self.definitions.get_annotation_index(name)
 
     @staticmethod
     def custom_compare_filenames(filenames):
@@ -115,61 +306,62 @@ class LegacyDataset:
         :return: The image with the labelers
         :rtype: PIL.Image
         """
-        ann_def_dict = list(filter(lambda x: type(x['id']) == str, self.ann_def.table.to_dict("records")))
-        captures = self.cap.filter(
-            def_id=ann_def_dict[0]["id"]
+        key = self.get_render_key(index, labelers_to_use, max_size)
+        return render_cache.get_or_render(
+            key,
+            lambda: self._render_image_with_labelers(index, labelers_to_use, max_size),
         )
-        captures = captures.sort_values(
-            by="filename", key=LegacyDataset.custom_compare_filenames
-        ).reset_index(drop=True)
-        capture = captures.loc[index, "filename"]
+
+    def get_render_key(
+        self, index: int, labelers_to_use: Dict[str, bool], max_size: int = 500
+    ) -> Tuple:
+        """gets the render cache key of the image get_image_with_labelers creates with the same arguments"""
+        enabled_labelers = [name for name, used in labelers_to_use.items() if used]
+        return RenderCache.make_key(self, index, enabled_labelers, max_size)
+
+    def _render_image_with_labelers(
+        self, index: int, labelers_to_use: Dict[str, bool], max_size: int
+    ) -> Image:
+        capture = self.get_capture(self.rgb_definition_id, index)["filename"]
         filename = os.path.join(self.data_root, capture)
-        image = Image.open(filename)
+        # The image is decoded at the resolution it is displayed at before anything is drawn on it, boxes and
+        # keypoints are scaled to the downscaled image and 3D boxes are projected with its size
+        image, (full_width, full_height) = open_image(filename, max_size)
+        scale_x = image.width / full_width
+        scale_y = image.height / full_height
 
         if "bounding box" in labelers_to_use and labelers_to_use["bounding box"]:
             bounding_box_definition_id = self.get_annotation_id("bounding box")
-            bb_captures = self.cap.filter(def_id=bounding_box_definition_id)
-            bb_captures = bb_captures.sort_values(
-                by="filename", key=LegacyDataset.custom_compare_filenames
-            ).reset_index(drop=True)
-            init_definition = self.ann_def.get_definition(bounding_box_definition_id)
-            label_mappings = {
-                m["label_id"]: m["label_name"] for m in init_definition["spec"]
-            }
+            label_mappings = self.definitions.get_label_mappings(
+                bounding_box_definition_id
+            )
             image = v.draw_legacy_image_with_boxes(
                 image,
-                index,
-                bb_captures,
+                self.get_capture(bounding_box_definition_id, index),
                 label_mappings,
+                scale=(scale_x, scale_y),
+                full_height=full_height,
             )
 
         if "keypoints" in labelers_to_use and labelers_to_use["keypoints"]:
             keypoints_definition_id = self.get_annotation_id("keypoints")
-            kp_captures = self.cap.filter(def_id=keypoints_definition_id)
-            kp_captures = kp_captures.sort_values(
-                by="filename", key=LegacyDataset.custom_compare_filenames
-            ).reset_index(drop=True)
-            annotations = kp_captures.loc[index, "annotation.values"]
-            templates = self.ann_def.table.to_dict("records")[
-                self.get_annotation_index("keypoints")
-            ]["spec"]
-            v.draw_legacy_image_with_keypoints(image, annotations, templates)
+            annotations = self.get_capture(keypoints_definition_id, index)[
+                "annotation.values"
+            ]
+            templates = self.definitions.get_annotation(keypoints_definition_id)["spec"]
+            v.draw_legacy_image_with_keypoints(
+                image, annotations, templates, scale=(scale_x, scale_y)
+            )
 
         if "bounding box 3D" in labelers_to_use and labelers_to_use["bounding box 3D"]:
             bounding_box_3d_definition_id = self.get_annotation_id("bounding box 3D")
-            box_captures = self.cap.filter(def_id=bounding_box_3d_definition_id)
-            box_captures = box_captures.sort_values(
-                by="filename", key=LegacyDataset.custom_compare_filenames
-            ).reset_index(drop=True)
-            annotations = box_captures.loc[index, "annotation.values"]
-            sensor = box_captures.loc[index, "sensor"]
-            image = v.draw_legacy_image_with_box_3d(image, sensor, annotations, None)
-
-        # bounding boxes and keypoints are depend on pixel coordinates so for now the thumbnail optimization
-        # applies only to segmentation
-        # TODO Make it so that bounding boxes and keypoints can be visualized at a lower resolution
+            box_capture = self.get_capture(bounding_box_3d_definition_id, index)
+            annotations = box_capture["annotation.values"]
+            sensor = box_capture["sensor"]
+            image = v.draw_legacy_image_with_box_3d(
+                image, sensor, annotations, None, scale=min(scale_x, scale_y)
+            )
 
-        image.thumbnail((max_size, max_size))
         if (
             "semantic segmentation" in labelers_to_use
             and labelers_to_use["semantic segmentation"]
@@ -177,16 +369,11 @@ class LegacyDataset:
             semantic_segmentation_definition_id = self.get_annotation_id(
                 "semantic segmentation"
             )
-
-            seg_captures = self.cap.filter(def_id=semantic_segmentation_definition_id)
-            seg_captures = seg_captures.sort_values(
-                by="filename", key=LegacyDataset.custom_compare_filenames
-            ).reset_index(drop=True)
+            seg_capture = self.get_capture(semantic_segmentation_definition_id, index)
             seg_filename = os.path.join(
-                self.data_root, seg_captures.loc[index, "annotation.filename"]
+                self.data_root, seg_capture["annotation.filename"]
             )
-            seg = Image.open(seg_filename)
-            seg.thumbnail((max_size, max_size))
+            seg = open_mask(seg_filename, image.size)
 
             image = v.draw_image_with_segmentation(image, seg)
 
@@ -197,16 +384,11 @@ class LegacyDataset:
             instance_segmentation_definition_id = self.get_annotation_id(
                 "instance segmentation"
             )
-
-            inst_captures = self.cap.filter(def_id=instance_segmentation_definition_id)
-            inst_captures = inst_captures.sort_values(
-                by="filename", key=LegacyDataset.custom_compare_filenames
-            ).reset_index(drop=True)
+            inst_capture = self.get_capture(instance_segmentation_definition_id, index)
             inst_filename = os.path.join(
-                self.data_root, inst_captures.loc[index, "annotation.filename"]
+                self.data_root, inst_capture["annotation.filename"]
             )
-            inst = Image.open(inst_filename)
-            inst.thumbnail((max_size, max_size))
+            inst = open_mask(inst_filename, image.size)
 
             image = v.draw_image_with_segmentation(image, inst)
 
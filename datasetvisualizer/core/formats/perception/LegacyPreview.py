@@ -1,18 +1,26 @@
-import json
-import os
 import re
 from typing import Dict, List, Tuple
 
 import streamlit as st
 import streamlit.components.v1 as components
 
+from datasetvisualizer.core.caching import open_dataset
 from datasetvisualizer.core.formats.perception.LegacyDataset import LegacyDataset
-from datasetvisualizer.helpers.ui import AppState
+from datasetvisualizer.core.frame_server import get_frame_source
+from datasetvisualizer.core.rendering import (
+    PREFETCH_ZOOM_FRAMES,
+    get_neighbor_frames,
+    get_neighbor_pages,
+    render_executor,
+)
+from datasetvisualizer.core.visualization.encoding import GRID_VIEW, ZOOM_VIEW
+from datasetvisualizer.core.visualization.mosaic import get_tile_width, render_mosaic
+from datasetvisualizer.helpers.ui import AppState, Components
 
 
 def preview_dataset(data_root):
     # Attempt to read as a normal perception dataset
-    ds = LegacyDataset(data_root)
+    ds = open_dataset(data_root, LegacyDataset)
 
     with st.sidebar:
         AppState.display_horizontal_rule()
@@ -138,6 +146,15 @@ def create_grid_view_controls(num_rows: int, dataset_size: int) -> Tuple[int, in
         AppState.set_in_grid_mode(False)
         start_at = int(st.session_state.start_at)
 
+    with mid:
+        AppState.set_mosaic_grid(
+            st.checkbox(
+                "Single image grid",
+                value=AppState.get_mosaic_grid(),
+                help="Send the page to the browser as one image, faster for large grids",
+            )
+        )
+
     with right:
         num_cols = st.number_input(
             label="Frames Per Row: ",
@@ -206,14 +223,62 @@ def grid_view(num_rows: int, ds: LegacyDataset, labelers: Dict[str, bool]):
 
     num_cols, start_at = create_grid_view_controls(num_rows, dataset_size)
 
-    containers = create_grid_containers(num_rows, num_cols, start_at, dataset_size)
-
-    for i in range(start_at, min(start_at + (num_cols * num_rows), dataset_size)):
-        image = ds.get_image_with_labelers(i, labelers, max_size=900)
-        this_container = containers[i - start_at]
+    view_range = range(start_at, min(start_at + (num_cols * num_rows), dataset_size))
+
+    if AppState.get_mosaic_grid():
+        # Frames are rendered at the size of their tile and the page is sent as a single image
+        max_size = min(900, get_tile_width(num_cols))
+        mosaic = render_mosaic(
+            ds,
+            "get_image_with_labelers",
+            list(view_range),
+            num_cols,
+            {i: f"RGB_{i}" for i in view_range},
+            labelers,
+            generation=AppState.get_render_generation(),
+            max_size=max_size,
+        )
+        if mosaic is None:
+            return
+        clicked = Components.mosaic(*mosaic, key="legacy_mosaic")
+        if clicked is not None:
+            AppState.set_zoom_image(clicked)
+            AppState.set_in_zoom_mode(True)
+            st.experimental_rerun()
+    else:
+        max_size = 900
+        containers = create_grid_containers(
+            num_rows, num_cols, start_at, dataset_size
+        )
 
-        with this_container:
-            st.image(image, caption=f"RGB_{i}", use_column_width=True)
+        # Frames are rendered concurrently and placed in their container as soon as they are done
+        for i, image in render_executor.render_frames(
+            ds,
+            "get_image_with_labelers",
+            view_range,
+            labelers,
+            generation=AppState.get_render_generation(),
+            max_size=max_size,
+        ):
+            this_container = containers[i - start_at]
+
+            key = ds.get_render_key(i, labelers, max_size=max_size)
+            with this_container:
+                st.image(
+                    get_frame_source(image, GRID_VIEW, key),
+                    caption=f"RGB_{i}",
+                    use_column_width=True,
+                )
+
+    # The next and previous pages are rendered in the background while the user looks at this one
+    render_executor.prefetch(
+        ds,
+        "get_image_with_labelers",
+        get_neighbor_pages(start_at, num_cols * num_rows, dataset_size),
+        labelers,
+        generation=AppState.get_render_generation(),
+        max_size=max_size,
+    )
 
 
 def zoom(index: int, offset: int, ds: LegacyDataset, labelers: Dict[str, bool]):
@@ -267,41 +332,31 @@ def zoom(index: int, offset: int, ds: LegacyDataset, labelers: Dict[str, bool]):
     AppState.display_horizontal_rule()
 
     index = index - offset
-    image = ds.get_image_with_labelers(index, labelers, max_size=2000)
-
-    captures_dir = None
-    for directory in os.walk(ds.data_root):
-        name = str(directory[0]).replace("\\", "/").split("/")[-1]
-        if (
-            name.startswith("Dataset")
-            and "." not in name[1:]
-            and os.path.abspath(ds.data_root) != os.path.abspath(directory[0])
-        ):
-            captures_dir = os.path.abspath(directory[0])
-            break
-
-    path_to_captures = os.path.join(os.path.abspath(captures_dir), "captures_000.json")
-    captures_json_file = json.load(open(path_to_captures, "r", encoding="utf8"))
-    num_captures_per_file = len(captures_json_file["captures"])
-    file_num = index // num_captures_per_file
-    postfix = "000" + str(file_num)
-    postfix = postfix[len(postfix) - 3 :]
-    path_to_captures = os.path.join(
-        os.path.abspath(captures_dir), "captures_" + postfix + ".json"
+    image = render_executor.render_frame(
+        ds,
+        "get_image_with_labelers",
+        index,
+        labelers,
+        generation=AppState.get_render_generation(),
+        max_size=2000,
+    )
+    if image is None:
+        return
+    render_executor.prefetch(
+        ds,
+        "get_image_with_labelers",
+        get_neighbor_frames(index, PREFETCH_ZOOM_FRAMES, dataset_size),
+        labelers,
+        generation=AppState.get_render_generation(),
+        max_size=2000,
     )
-    captures_json_file = json.load(open(path_to_captures, "r", encoding="utf8"))
-    capture = captures_json_file["captures"][index % num_captures_per_file]
 
-    metrics = []
-    for i in os.listdir(captures_dir):
-        path_to_metrics = os.path.join(captures_dir, i)
-        if (
-            os.path.isfile(path_to_metrics)
-            and "metrics_" in i
-            and "definitions" not in i
-        ):
-            captures_json_file = json.load(open(path_to_metrics, encoding="utf8"))
-            metrics.extend(captures_json_file["metrics"])
+    capture = ds.get_capture_record(index)
+    if capture is None:
+        st.error(f"Frame {index + offset} is not in the dataset, it has {dataset_size} frames")
+        return
+
+    metrics = ds.get_metrics(capture["sequence_id"], capture["step"])
 
     filename_match = re.search("(rgb_\\d+)", capture["filename"])
     rgb_filename = f"Image #{index}"
@@ -309,7 +364,12 @@ def zoom(index: int, offset: int, ds: LegacyDataset, labelers: Dict[str, bool]):
     if filename_match is not None and len(filename_match.groups()) > 0:
         rgb_filename = filename_match.group(1)
 
-    st.image(image, caption=rgb_filename, use_column_width=True)
+    key = ds.get_render_key(index, labelers, max_size=2000)
+    st.image(
+        get_frame_source(image, ZOOM_VIEW, key),
+        caption=rgb_filename,
+        use_column_width=True,
+    )
 
     st.subheader("Frame Data")
 
@@ -320,13 +380,9 @@ def zoom(index: int, offset: int, ds: LegacyDataset, labelers: Dict[str, bool]):
     metrics_layout = st.expander(label="Metrics")
     with metrics_layout:
         for metric in metrics:
-            if (
-                metric["sequence_id"] == capture["sequence_id"]
-                and metric["step"] == capture["step"]
-            ):
-                for metric_def in ds.get_metrics_records():
-                    if metric_def["id"] == metric["metric_definition"]:
-                        st.markdown(f"#### {metric_def['name']}")
-                st.write(metric)
+            metric_name = ds.definitions.get_metric_name(metric["metric_definition"])
+            if metric_name is not None:
+                st.markdown(f"#### {metric_name}")
+            st.write(metric)
 
     AppState.display_horizontal_rule()
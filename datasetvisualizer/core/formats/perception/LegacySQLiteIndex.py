@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from datasetvisualizer.core.caching import get_index_dir
+from datasetvisualizer.core.formats.perception.CaptureOffsetTable import (
+    CaptureOffsetTable,
+)
+
+SQLITE_INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE captures (
+    frame INTEGER,
+    frame_number INTEGER NOT NULL,
+    id TEXT,
+    sequence_id TEXT,
+    step INTEGER,
+    filename TEXT,
+    sensor TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE annotations (
+    capture INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    definition TEXT,
+    id TEXT,
+    filename TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE metrics (
+    sequence_id TEXT,
+    step INTEGER,
+    definition TEXT,
+    data TEXT NOT NULL
+);
+"""
+
+# Indices are created once all the rows are inserted, which is faster than updating them on every insert
+_INDICES = """
+CREATE UNIQUE INDEX captures_frame ON captures (frame);
+CREATE INDEX annotations_capture ON annotations (capture, definition, position);
+CREATE INDEX metrics_capture ON metrics (sequence_id, step);
+"""
+
+
+def get_metrics_files(captures_dir: str) -> List[str]:
+    """gets the names of the metrics files of the directory, in name order"""
+    return [
+        file
+        for file in sorted(os.listdir(captures_dir))
+        if os.path.isfile(os.path.join(captures_dir, file))
+        and "metrics_" in file
+        and "definitions" not in file
+    ]
+
+
+class LegacySQLiteIndex:
+    """Persistent SQLite index of the captures, annotations and metrics of a legacy Perception dataset.
+
+    The captures table holds one row per capture with its frame, its position in the frames ordered by the frame
+    number of their RGB filename like in LegacyDataset, the annotations table one row per annotation of a capture
+    and the metrics table one row per metric keyed by (sequence_id, step). Records are kept as json without their
+    nested lists so that a frame is read with indexed queries and nothing is held in memory. The index is built in
+    one pass over the captures and metrics files and is only used while none of these files changed.
+    """
+
+    def __init__(self, captures_dir: str, path: Optional[str] = None):
+        """
+        :param captures_dir: directory holding the captures and metrics json files
+        :type captures_dir: str
+        :param path: Optional, path of the database, in the index directory if None
+        :type path: str
+        """
+        self.captures_dir = captures_dir
+        self.path = path if path is not None else self.get_default_path(captures_dir)
+        self._local = threading.local()
+        self._length: Optional[int] = None
+
+    @staticmethod
+    def get_default_path(captures_dir: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(captures_dir).encode("utf8")).hexdigest()
+        return os.path.join(get_index_dir(), f"legacy_{digest}.sqlite")
+
+    def _get_stamps(self) -> Dict[str, int]:
+        files = CaptureOffsetTable.get_captures_files(self.captures_dir)
+        files += get_metrics_files(self.captures_dir)
+        return {
+            file: os.stat(os.path.join(self.captures_dir, file)).st_mtime_ns
+            for file in files
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections can't be shared between threads, frames are rendered by a pool of threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+            connection = sqlite3.connect(uri, uri=True)
+            self._local.connection = connection
+        return connection
+
+    def is_current(self) -> bool:
+        """gets whether the index exists and was built from the current captures and metrics files"""
+        if not os.path.isfile(self.path):
+            return False
+        try:
+            meta = dict(self._connect().execute("SELECT key, value FROM meta"))
+        except sqlite3.Error:
+            return False
+        return meta.get("version") == str(SQLITE_INDEX_VERSION) and meta.get(
+            "stamps"
+        ) == json.dumps(self._get_stamps(), sort_keys=True)
+
+    @staticmethod
+    def open(captures_dir: Optional[str]) -> Optional["LegacySQLiteIndex"]:
+        """gets the index of the captures directory if it was built and is up to date, None otherwise"""
+        if captures_dir is None:
+            return None
+        index = LegacySQLiteIndex(captures_dir)
+        return index if index.is_current() else None
+
+    def build(
+        self, progress: Optional[Callable[[str], None]] = None
+    ) -> "LegacySQLiteIndex":
+        """Builds the index in one pass over the captures and metrics files, replacing the previous index
+
+        :param progress: Optional, called with the name of every file once it is indexed
+        :type progress: Callable[[str], None]
+        :return: self
+        :rtype: LegacySQLiteIndex
+        """
+        stamps = self._get_stamps()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.executescript(_SCHEMA)
+            for file in CaptureOffsetTable.get_captures_files(self.captures_dir):
+                self._insert_captures(connection, file)
+                if progress is not None:
+                    progress(file)
+            for file in get_metrics_files(self.captures_dir):
+                self._insert_metrics(connection, file)
+                if progress is not None:
+                    progress(file)
+
+            # Frames are numbered in the order of the frame numbers of the captures, ties keep the file order
+            rowids = connection.execute(
+                "SELECT rowid FROM captures ORDER BY frame_number, rowid"
+            ).fetchall()
+            connection.executemany(
+                "UPDATE captures SET frame = ? WHERE rowid = ?",
+                ((frame, rowid) for frame, (rowid,) in enumerate(rowids)),
+            )
+            connection.executescript(_INDICES)
+            connection.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("version", str(SQLITE_INDEX_VERSION)),
+                    ("stamps", json.dumps(stamps, sort_keys=True)),
+                    ("length", str(len(rowids))),
+                ],
+            )
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(tmp_path, self.path)
+        self._local = threading.local()
+        self._length = None
+        return self
+
+    def _insert_captures(self, connection: sqlite3.Connection, file: str):
+        with open(os.path.join(self.captures_dir, file), "r", encoding="utf8") as f:
+            records = json.load(f).get("captures", [])
+        for record in records:
+            annotations = record.pop("annotations", None) or []
+            cursor = connection.execute(
+                "INSERT INTO captures (frame_number, id, sequence_id, step, filename, sensor, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    CaptureOffsetTable._get_frame_number(record.get("filename", "")),
+                    record.get("id"),
+                    record.get("sequence_id"),
+                    record.get("step"),
+                    record.get("filename"),
+                    json.dumps(record.get("sensor")),
+                    json.dumps(record),
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO annotations VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        cursor.lastrowid,
+                        position,
+                        annotation.get("annotation_definition"),
+                        annotation.get("id"),
+                        annotation.get("filename"),
+                        json.dumps(annotation),
+                    )
+                    for position, annotation in enumerate(annotations)
+                ],
+            )
+
+    def _insert_metrics(self, connection: sqlite3.Connection, file: str):
+        with open(os.path.join(self.captures_dir, file), "r", encoding="utf8") as f:
+            metrics = json.load(f)["metrics"]
+        connection.executemany(
+            "INSERT INTO metrics VALUES (?, ?, ?, ?)",
+            [
+                (
+                    metric.get("sequence_id"),
+                    metric.get("step"),
+                    metric.get("metric_definition"),
+                    json.dumps(metric),
+                )
+                for metric in metrics
+            ],
+        )
+
+    def __len__(self):
+        if self._length is None:
+            row = (
+                self._connect()
+                .execute("SELECT value FROM meta WHERE key = 'length'")
+                .fetchone()
+            )
+            self._length = int(row[0])
+        return self._length
+
+    def get_capture(self, def_id: Optional[str], index: int) -> Dict[str, Any]:
+        """gets the capture of the frame at index joined with the annotation of the specified definition
+
+        :param def_id: annotation definition id
+        :type def_id: str
+        :param index: The index of the frame we want
+        :type index: int
+        :return: capture row with the keys of the capture record and the "annotation." keys, "annotation.values" is
+                 empty if the capture has no annotation of the definition
+        :rtype: Dict[str, Any]
+        """
+        row = (
+            self._connect()
+            .execute(
+                "SELECT c.data, a.data FROM captures c LEFT JOIN annotations a "
+                "ON a.capture = c.rowid AND a.definition = ? WHERE c.frame = ? ORDER BY a.position LIMIT 1",
+                (def_id, index),
+            )
+            .fetchone()
+        )
+        if row is None:
+            raise IndexError(f"Frame {index} is out of range")
+
+        capture = json.loads(row[0])
+        capture["annotation.values"] = []
+        if row[1] is not None:
+            for key, value in json.loads(row[1]).items():
+                capture[f"annotation.{key}"] = value
+            if capture["annotation.values"] is None:
+                capture["annotation.values"] = []
+        return capture
+
+    def get_capture_record(self, index: int) -> Optional[Dict[str, Any]]:
+        """gets the capture record of the frame at index with its annotations, as stored in the captures file"""
+        connection = self._connect()
+        row = connection.execute(
+            "SELECT rowid, data FROM captures WHERE frame = ?", (index,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[1])
+        record["annotations"] = [
+            json.loads(data)
+            for (data,) in connection.execute(
+                "SELECT data FROM annotations WHERE capture = ? ORDER BY position",
+                (row[0],),
+            )
+        ]
+        return record
+
+    def get_metrics(self, sequence_id: str, step: int) -> List[Dict[str, Any]]:
+        """gets the metric records of a capture in the order of the metrics files"""
+        return [
+            json.loads(data)
+            for (data,) in self._connect().execute(
+                "SELECT data FROM metrics WHERE sequence_id = ? AND step = ? ORDER BY rowid",
+                (sequence_id, step),
+            )
+        ]
@@ -0,0 +1,518 @@
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from datasetvisualizer.core.caching import LRUCache, get_index_dir
+from datasetvisualizer.core.formats.solo.SoloAnnotations import (
+    BOUNDING_BOX_3D_TYPE,
+    BOUNDING_BOX_TYPE,
+    INSTANCE_SEGMENTATION_TYPE,
+    KEYPOINT_TYPE,
+    SEMANTIC_SEGMENTATION_TYPE,
+    BoundingBoxes2D,
+    BoundingBoxes3D,
+    KeypointFigures,
+)
+from datasetvisualizer.core.formats.solo.SoloFrameIndex import (
+    SoloFrameIndex,
+    get_frame_files_stamp,
+)
+
+ANNOTATION_STORE_VERSION = 2
+# Name of the store directory when it is saved next to the dataset instead of in the index directory
+STORE_DIR_NAME = ".annotation_store"
+LOADED_SEQUENCES_CACHE_ENTRIES = 8
+
+SEGMENTATION_TYPES = (SEMANTIC_SEGMENTATION_TYPE, INSTANCE_SEGMENTATION_TYPE)
+
+
+class StoredSensor:
+    """The fields of the first capture of a frame used for rendering, named like the protobuf sensor message"""
+
+    def __init__(
+        self, sensor_id: str, filename: str, matrix: np.ndarray, projection: str
+    ):
+        self.id = sensor_id
+        self.filename = filename
+        self.matrix = matrix
+        self.projection = projection
+
+
+class StoredFrame:
+    """The annotations of a frame read from the annotation store, used by rendering instead of a parsed SoloFrame"""
+
+    def __init__(
+        self,
+        sensor: StoredSensor,
+        sequence_path: str,
+        sequence: int,
+        step: int,
+        annotations: Dict[Tuple[str, str], Any],
+    ):
+        self.sensor = sensor
+        self.sequence_path = sequence_path
+        self.sequence = sequence
+        self.step = step
+        self.annotations = annotations
+
+    def get_annotation(self, annotation_type: str, annotator_id: str) -> Optional[Any]:
+        """gets the annotation of an annotator, annotations saved without an id belong to every annotator of their type
+
+        :param annotation_type: @type of the annotation, e.g. BOUNDING_BOX_TYPE
+        :type annotation_type: str
+        :param annotator_id: id of the annotator
+        :type annotator_id: str
+        :return: BoundingBoxes2D, BoundingBoxes3D or KeypointFigures, the mask filename of segmentation annotations,
+                 or None if the frame has no annotation of the annotator
+        """
+        annotation = self.annotations.get((annotation_type, annotator_id))
+        if annotation is None:
+            annotation = self.annotations.get((annotation_type, ""))
+        return annotation
+
+
+class _SequenceColumns:
+    """Accumulates the rows of the tables of one sequence while its frames are read"""
+
+    def __init__(self):
+        self.annotators: Dict[Tuple[str, str], int] = {}
+        self.columns: Dict[str, List[Any]] = {}
+
+    def append(self, table: str, **values):
+        for name, value in values.items():
+            self.columns.setdefault(f"{table}_{name}", []).append(value)
+
+    def get_annotator(self, annotation_type: str, annotator_id: str) -> int:
+        return self.annotators.setdefault(
+            (annotation_type, annotator_id), len(self.annotators)
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {
+            "annotator_types": np.array([t for t, _ in self.annotators], dtype=str),
+            "annotator_ids": np.array([i for _, i in self.annotators], dtype=str),
+        }
+        for name, values in self.columns.items():
+            arrays[name] = np.array(values, dtype=_COLUMN_TYPES.get(name, np.int64))
+        return arrays
+
+
+# Columns that are not int64, columns missing from a sequence are created empty with these types and shapes
+_COLUMN_TYPES = {
+    "frame_sensor_id": str,
+    "frame_filename": str,
+    "frame_matrix": np.float64,
+    "frame_projection": str,
+    "bbox2d_label_name": str,
+    "bbox2d_origin": np.float32,
+    "bbox2d_dimension": np.float32,
+    "bbox3d_translation": np.float64,
+    "bbox3d_size": np.float64,
+    "bbox3d_rotation": np.float64,
+    "keypoint_template": str,
+    "joint_location": np.float32,
+    "joint_state": np.int32,
+    "joint_index": np.int32,
+    "segmentation_filename": str,
+}
+_COLUMN_SHAPES = {
+    "frame_matrix": (9,),
+    "bbox2d_origin": (2,),
+    "bbox2d_dimension": (2,),
+    "bbox3d_translation": (3,),
+    "bbox3d_size": (3,),
+    "bbox3d_rotation": (4,),
+    "joint_location": (2,),
+}
+_TABLES = {
+    "frame": ("step", "sensor_id", "filename", "matrix", "projection"),
+    "bbox2d": ("frame", "annotator", "label_id", "label_name", "origin", "dimension"),
+    "bbox3d": ("frame", "annotator", "label_id", "translation", "size", "rotation"),
+    # Figures point to their keypoints in the joint table with joint_start and joint_count
+    "keypoint": (
+        "frame",
+        "annotator",
+        "template",
+        "label_id",
+        "joint_start",
+        "joint_count",
+    ),
+    "joint": ("location", "state", "index"),
+    "segmentation": ("frame", "annotator", "filename"),
+}
+
+
+def _read_vector(values: Any, size: int) -> List[float]:
+    vector = [float(v) for v in (values or [])[:size]]
+    return vector + [0.0] * (size - len(vector))
+
+
+class SoloAnnotationStore:
+    """Columnar copy of the annotations of a SOLO dataset, so frames can be rendered without parsing their json.
+
+    The store has one npz file per sequence holding one table per annotation type, bbox2d, bbox3d, keypoint (with
+    its joint table) and segmentation, plus a frame table with the sensor of every frame. Rows of every table are
+    sorted by frame, the position of the frame in its sequence, and refer to the annotator (type, id) table of the
+    sequence. A sequence file is rebuilt only when a frame file of the sequence is added, removed or modified so
+    building the store again after new sequences were added only reads the new frames.
+    """
+
+    def __init__(
+        self,
+        data_root: str,
+        frame_index: SoloFrameIndex,
+        store_dir: Optional[str] = None,
+    ):
+        """
+        :param data_root: Path to the root of the dataset
+        :type data_root: str
+        :param frame_index: The loaded frame index of the dataset
+        :type frame_index: SoloFrameIndex
+        :param store_dir: Optional, directory of the store, in the index directory if None
+        :type store_dir: str
+        """
+        self.data_root = data_root
+        self.frame_index = frame_index
+        self.store_dir = (
+            store_dir
+            if store_dir is not None
+            else self.get_default_store_dir(data_root)
+        )
+        self.sequences = LRUCache(max_entries=LOADED_SEQUENCES_CACHE_ENTRIES)
+
+    @staticmethod
+    def get_default_store_dir(data_root: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(data_root).encode("utf8")).hexdigest()
+        return os.path.join(get_index_dir(), f"solo_store_{digest}")
+
+    @staticmethod
+    def _find_store_dir(data_root: str) -> Optional[str]:
+        for store_dir in (
+            os.path.join(data_root, STORE_DIR_NAME),
+            SoloAnnotationStore.get_default_store_dir(data_root),
+        ):
+            if os.path.isdir(store_dir):
+                return store_dir
+        return None
+
+    @staticmethod
+    def find(
+        data_root: str, frame_index: SoloFrameIndex
+    ) -> Optional["SoloAnnotationStore"]:
+        """gets the store built next to the dataset or in the index directory, None if it was never built"""
+        store_dir = SoloAnnotationStore._find_store_dir(data_root)
+        if store_dir is None:
+            return None
+        return SoloAnnotationStore(data_root, frame_index, store_dir)
+
+    @staticmethod
+    def get_store_stamp(data_root: str) -> List[Any]:
+        """gets [store directory, number of sequence files, latest modification time of a sequence file] of the store
+        find returns, empty if the store was never built. It changes when the store is built or rebuilt
+
+        :param data_root: Path to the root of the dataset
+        :type data_root: str
+        :return: the stamp of the store of the dataset
+        :rtype: List[Any]
+        """
+        store_dir = SoloAnnotationStore._find_store_dir(data_root)
+        if store_dir is None:
+            return []
+        count = 0
+        latest = 0
+        for entry in os.scandir(store_dir):
+            if entry.name.endswith(".npz"):
+                count += 1
+                latest = max(latest, entry.stat().st_mtime_ns)
+        return [store_dir, count, latest]
+
+    def _get_sequence_file(self, sequence_dir: str) -> str:
+        return os.path.join(self.store_dir, f"{sequence_dir}.npz")
+
+    def _get_stamp(self, sequence_dir: str) -> np.ndarray:
+        """gets (number of frame files, latest modification time of a frame file) of a sequence"""
+        return np.array(
+            get_frame_files_stamp(os.path.join(self.data_root, sequence_dir)),
+            dtype=np.int64,
+        )
+
+    def _is_current(self, columns, sequence_dir: str) -> bool:
+        return int(columns["version"]) == ANNOTATION_STORE_VERSION and np.array_equal(
+            columns["stamp"], self._get_stamp(sequence_dir)
+        )
+
+    def _read_sequence_file(self, sequence_dir: str) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            with np.load(
+                self._get_sequence_file(sequence_dir), allow_pickle=False
+            ) as columns:
+                if not self._is_current(columns, sequence_dir):
+                    return None
+                return {name: columns[name] for name in columns.files}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def is_sequence_stored(self, sequence_dir: str) -> bool:
+        """gets whether the file of a sequence exists and was built from the current content of the sequence"""
+        try:
+            with np.load(
+                self._get_sequence_file(sequence_dir), allow_pickle=False
+            ) as columns:
+                return self._is_current(columns, sequence_dir)
+        except (OSError, KeyError, ValueError):
+            return False
+
+    def build(self, progress: Optional[Callable[[str, bool], None]] = None) -> int:
+        """Builds the files of the sequences that are new or changed since the store was last built and removes the
+        files of sequences that no longer exist
+
+        :param progress: Optional, called with the directory of every sequence and whether it had to be built
+        :type progress: Callable[[str, bool], None]
+        :return: number of sequences built
+        :rtype: int
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        built = 0
+        offsets = self.frame_index.offsets.tolist()
+        for position, sequence_dir in enumerate(self.frame_index.sequence_dirs):
+            stored = self.is_sequence_stored(sequence_dir)
+            if not stored:
+                steps = self.frame_index.steps[
+                    offsets[position] : offsets[position + 1]
+                ].tolist()
+                self.build_sequence(sequence_dir, steps)
+                built += 1
+            if progress is not None:
+                progress(sequence_dir, not stored)
+
+        expected = {
+            f"{sequence_dir}.npz" for sequence_dir in self.frame_index.sequence_dirs
+        }
+        for file in os.listdir(self.store_dir):
+            if file.endswith(".npz") and file not in expected:
+                os.remove(os.path.join(self.store_dir, file))
+        self.sequences.clear()
+        return built
+
+    def build_sequence(self, sequence_dir: str, steps: List[int]):
+        """Reads the frame_data.json files of the steps of a sequence and saves their annotations as columns"""
+        stamp = self._get_stamp(sequence_dir)
+        sequence = _SequenceColumns()
+        for frame, step in enumerate(steps):
+            path = os.path.join(
+                self.data_root, sequence_dir, f"step{step}.frame_data.json"
+            )
+            with open(path, "r", encoding="utf8") as f:
+                data = json.load(f)
+            SoloAnnotationStore._add_frame(sequence, frame, step, data)
+
+        arrays = sequence.to_arrays()
+        for table, names in _TABLES.items():
+            for name in names:
+                column = f"{table}_{name}"
+                if column not in arrays:
+                    dtype = _COLUMN_TYPES.get(column, np.int64)
+                    arrays[column] = np.zeros(
+                        (0,) + _COLUMN_SHAPES.get(column, ()), dtype=dtype
+                    )
+
+        sequence_file = self._get_sequence_file(sequence_dir)
+        tmp_path = f"{sequence_file}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            version=np.array(ANNOTATION_STORE_VERSION),
+            stamp=stamp,
+            **arrays,
+        )
+        os.replace(tmp_path, sequence_file)
+
+    @staticmethod
+    def _add_frame(
+        sequence: _SequenceColumns, frame: int, step: int, data: Dict[str, Any]
+    ):
+        captures = data.get("captures", [])
+        capture = captures[0] if len(captures) > 0 else {}
+        sequence.append(
+            "frame",
+            step=step,
+            sensor_id=capture.get("id", ""),
+            filename=capture.get("filename", ""),
+            matrix=_read_vector(capture.get("matrix"), 9),
+            projection=capture.get("projection", ""),
+        )
+
+        for annotation in capture.get("annotations", []):
+            annotation_type = annotation.get("@type", "")
+            annotator = sequence.get_annotator(
+                annotation_type, annotation.get("id", "")
+            )
+            values = annotation.get("values", [])
+            if annotation_type == BOUNDING_BOX_TYPE:
+                for box in values:
+                    sequence.append(
+                        "bbox2d",
+                        frame=frame,
+                        annotator=annotator,
+                        label_id=int(box.get("labelId", 0)),
+                        label_name=box.get("labelName", ""),
+                        origin=_read_vector(box.get("origin"), 2),
+                        dimension=_read_vector(box.get("dimension"), 2),
+                    )
+            elif annotation_type == BOUNDING_BOX_3D_TYPE:
+                for box in values:
+                    sequence.append(
+                        "bbox3d",
+                        frame=frame,
+                        annotator=annotator,
+                        label_id=int(box.get("labelId", 0)),
+                        translation=_read_vector(box.get("translation"), 3),
+                        size=_read_vector(box.get("size"), 3),
+                        rotation=_read_vector(box.get("rotation"), 4),
+                    )
+            elif annotation_type == KEYPOINT_TYPE:
+                for figure in values:
+                    keypoints = figure.get("keypoints", [])
+                    sequence.append(
+                        "keypoint",
+                        frame=frame,
+                        annotator=annotator,
+                        template=annotation.get("templateId", ""),
+                        label_id=int(figure.get("labelId", 0)),
+                        joint_start=len(sequence.columns.get("joint_state", [])),
+                        joint_count=len(keypoints),
+                    )
+                    for keypoint in keypoints:
+                        sequence.append(
+                            "joint",
+                            location=_read_vector(keypoint.get("location"), 2),
+                            state=int(keypoint.get("state", 0)),
+                            index=int(keypoint.get("index", 0)),
+                        )
+            elif annotation_type in SEGMENTATION_TYPES:
+                sequence.append(
+                    "segmentation",
+                    frame=frame,
+                    annotator=annotator,
+                    filename=annotation.get("filename", ""),
+                )
+
+    def _load_sequence(self, position: int) -> Optional[Dict[str, np.ndarray]]:
+        sequence_dir = self.frame_index.sequence_dirs[position]
+        columns = self.sequences.get(sequence_dir)
+        if columns is None:
+            columns = self._read_sequence_file(sequence_dir)
+            if columns is None:
+                return None
+            self.sequences.put(sequence_dir, columns)
+        return columns
+
+    def get_frame(self, index: int) -> Optional[StoredFrame]:
+        """gets the sensor and annotations of the frame at index from the store
+
+        :param index: global frame index
+        :type index: int
+        :return: The frame or None if its sequence isn't in the store or changed since the store was built
+        :rtype: StoredFrame
+        """
+        sequence, step = self.frame_index.resolve(index)
+        position = self.frame_index.get_sequence_position(index)
+        columns = self._load_sequence(position)
+        if columns is None:
+            return None
+        frame = index - int(self.frame_index.offsets[position])
+        if (
+            frame >= len(columns["frame_step"])
+            or int(columns["frame_step"][frame]) != step
+        ):
+            return None
+
+        sensor = StoredSensor(
+            str(columns["frame_sensor_id"][frame]),
+            str(columns["frame_filename"][frame]),
+            columns["frame_matrix"][frame],
+            str(columns["frame_projection"][frame]),
+        )
+        annotator_types = columns["annotator_types"].tolist()
+        annotator_ids = columns["annotator_ids"].tolist()
+        annotations: Dict[Tuple[str, str], Any] = {}
+
+        def rows(table: str) -> Dict[int, np.ndarray]:
+            frames = columns[f"{table}_frame"]
+            start, end = np.searchsorted(frames, [frame, frame + 1])
+            annotators = columns[f"{table}_annotator"][start:end]
+            return {
+                int(annotator): start + np.flatnonzero(annotators == annotator)
+                for annotator in np.unique(annotators)
+            }
+
+        for annotator, selected in rows("bbox2d").items():
+            annotations[(annotator_types[annotator], annotator_ids[annotator])] = (
+                BoundingBoxes2D(
+                    columns["bbox2d_label_id"][selected],
+                    columns["bbox2d_label_name"][selected].tolist(),
+                    columns["bbox2d_origin"][selected],
+                    columns["bbox2d_dimension"][selected],
+                )
+            )
+        for annotator, selected in rows("bbox3d").items():
+            annotations[(annotator_types[annotator], annotator_ids[annotator])] = (
+                BoundingBoxes3D(
+                    columns["bbox3d_label_id"][selected],
+                    columns["bbox3d_translation"][selected],
+                    columns["bbox3d_size"][selected],
+                    columns["bbox3d_rotation"][selected],
+                )
+            )
+        for annotator, selected in rows("keypoint").items():
+            annotations[(annotator_types[annotator], annotator_ids[annotator])] = (
+                self._get_figures(columns, selected)
+            )
+        for annotator, selected in rows("segmentation").items():
+            annotations[(annotator_types[annotator], annotator_ids[annotator])] = str(
+                columns["segmentation_filename"][selected[0]]
+            )
+
+        return StoredFrame(
+            sensor,
+            self.frame_index.get_sequence_path(index),
+            sequence,
+            step,
+            annotations,
+        )
+
+    @staticmethod
+    def _get_figures(
+        columns: Dict[str, np.ndarray], selected: np.ndarray
+    ) -> KeypointFigures:
+        starts = columns["keypoint_joint_start"][selected]
+        counts = columns["keypoint_joint_count"][selected]
+        num_figures = len(selected)
+        num_joints = int(counts.max()) if num_figures > 0 else 0
+
+        # Joints of every figure are gathered at once into arrays padded like KeypointFigures.from_message
+        figure_rows = np.repeat(np.arange(num_figures), counts)
+        joint_columns = np.arange(int(counts.sum())) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        joints = np.repeat(starts, counts) + joint_columns
+
+        locations = np.zeros((num_figures, num_joints, 2), dtype=np.float32)
+        states = np.zeros((num_figures, num_joints), dtype=np.int32)
+        indices = np.full((num_figures, num_joints), -1, dtype=np.int32)
+        locations[figure_rows, joint_columns] = columns["joint_location"][joints]
+        states[figure_rows, joint_columns] = columns["joint_state"][joints]
+        indices[figure_rows, joint_columns] = columns["joint_index"][joints]
+
+        template_id = (
+            str(columns["keypoint_template"][selected[0]]) if num_figures > 0 else None
+        )
+        return KeypointFigures(
+            template_id,
+            columns["keypoint_label_id"][selected],
+            locations,
+            states,
+            indices,
+        )
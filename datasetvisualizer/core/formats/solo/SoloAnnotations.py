@@ -0,0 +1,186 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SEMANTIC_SEGMENTATION_TYPE = "type.unity.com/unity.solo.SemanticSegmentationAnnotation"
+INSTANCE_SEGMENTATION_TYPE = "type.unity.com/unity.solo.InstanceSegmentationAnnotation"
+BOUNDING_BOX_TYPE = "type.unity.com/unity.solo.BoundingBox2DAnnotation"
+BOUNDING_BOX_3D_TYPE = "type.unity.com/unity.solo.BoundingBox3DAnnotation"
+KEYPOINT_TYPE = "type.unity.com/unity.solo.KeypointAnnotation"
+
+_FIELD_NAMES: Dict[str, Dict[str, str]] = {}
+
+
+def get_field_names(descriptor) -> Dict[str, str]:
+    """gets a dictionary from the json name and from the name of every field of a protobuf message to its attribute
+    name, so fields can be read with the names used in the SOLO json files
+
+    :param descriptor: descriptor of the protobuf message
+    :return: json name or name of the field to its attribute name
+    :rtype: Dict[str, str]
+    """
+    names = _FIELD_NAMES.get(descriptor.full_name)
+    if names is None:
+        names = {}
+        for field in descriptor.fields:
+            names[field.json_name] = field.name
+            names[field.name] = field.name
+        _FIELD_NAMES[descriptor.full_name] = names
+    return names
+
+
+def get_field(message, json_name: str, default: Any = None) -> Any:
+    name = get_field_names(message.DESCRIPTOR).get(json_name)
+    if name is None:
+        return default
+    return getattr(message, name)
+
+
+class BoundingBoxes2D:
+    """2D bounding boxes of a BoundingBox2DAnnotation as arrays, origins and dimensions are in pixels"""
+
+    def __init__(
+        self,
+        label_ids: np.ndarray,
+        label_names: List[str],
+        origins: np.ndarray,
+        dimensions: np.ndarray,
+    ):
+        self.label_ids = label_ids
+        self.label_names = label_names
+        self.origins = origins
+        self.dimensions = dimensions
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    def scaled(self, scale_x: float, scale_y: float) -> "BoundingBoxes2D":
+        """gets the boxes in the pixel coordinates of the image resized by (scale_x, scale_y)"""
+        scale = np.array([scale_x, scale_y], dtype=np.float32)
+        return BoundingBoxes2D(
+            self.label_ids,
+            self.label_names,
+            self.origins * scale,
+            self.dimensions * scale,
+        )
+
+    @staticmethod
+    def from_message(annotation) -> "BoundingBoxes2D":
+        values = get_field(annotation, "values", [])
+        n = len(values)
+        label_ids = np.zeros(n, dtype=np.int64)
+        origins = np.zeros((n, 2), dtype=np.float32)
+        dimensions = np.zeros((n, 2), dtype=np.float32)
+        label_names = []
+        if n > 0:
+            names = get_field_names(values[0].DESCRIPTOR)
+            label_id, label_name = names["labelId"], names["labelName"]
+            origin, dimension = names["origin"], names["dimension"]
+            for i, box in enumerate(values):
+                label_ids[i] = getattr(box, label_id)
+                label_names.append(getattr(box, label_name))
+                origins[i] = getattr(box, origin)[:2]
+                dimensions[i] = getattr(box, dimension)[:2]
+        return BoundingBoxes2D(label_ids, label_names, origins, dimensions)
+
+
+class BoundingBoxes3D:
+    """3D bounding boxes of a BoundingBox3DAnnotation as arrays, rotations are quaternions stored as (x, y, z, w)"""
+
+    def __init__(
+        self,
+        label_ids: np.ndarray,
+        translations: np.ndarray,
+        sizes: np.ndarray,
+        rotations: np.ndarray,
+    ):
+        self.label_ids = label_ids
+        self.translations = translations
+        self.sizes = sizes
+        self.rotations = rotations
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    @staticmethod
+    def from_message(annotation) -> "BoundingBoxes3D":
+        values = get_field(annotation, "values", [])
+        n = len(values)
+        label_ids = np.zeros(n, dtype=np.int64)
+        translations = np.zeros((n, 3), dtype=np.float64)
+        sizes = np.zeros((n, 3), dtype=np.float64)
+        rotations = np.zeros((n, 4), dtype=np.float64)
+        if n > 0:
+            names = get_field_names(values[0].DESCRIPTOR)
+            label_id, translation = names["labelId"], names["translation"]
+            size, rotation = names["size"], names["rotation"]
+            for i, box in enumerate(values):
+                label_ids[i] = getattr(box, label_id)
+                translations[i] = getattr(box, translation)[:3]
+                sizes[i] = getattr(box, size)[:3]
+                rotations[i] = getattr(box, rotation)[:4]
+        return BoundingBoxes3D(label_ids, translations, sizes, rotations)
+
+
+class KeypointFigures:
+    """Figures of a KeypointAnnotation as arrays indexed by (figure, joint).
+
+    Figures with fewer keypoints than the largest one are padded with keypoints of state 0 and index -1.
+    """
+
+    def __init__(
+        self,
+        template_id: Optional[str],
+        label_ids: np.ndarray,
+        locations: np.ndarray,
+        states: np.ndarray,
+        indices: np.ndarray,
+    ):
+        self.template_id = template_id
+        self.label_ids = label_ids
+        self.locations = locations
+        self.states = states
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    def scaled(self, scale_x: float, scale_y: float) -> "KeypointFigures":
+        """gets the figures in the pixel coordinates of the image resized by (scale_x, scale_y)"""
+        scale = np.array([scale_x, scale_y], dtype=np.float32)
+        return KeypointFigures(
+            self.template_id,
+            self.label_ids,
+            self.locations * scale,
+            self.states,
+            self.indices,
+        )
+
+    @staticmethod
+    def from_message(annotation) -> "KeypointFigures":
+        template_id = get_field(annotation, "templateId")
+        figures = get_field(annotation, "values", [])
+        num_figures = len(figures)
+        label_ids = np.zeros(num_figures, dtype=np.int64)
+        keypoint_lists = []
+        if num_figures > 0:
+            names = get_field_names(figures[0].DESCRIPTOR)
+            label_id, keypoints = names["labelId"], names["keypoints"]
+            for i, figure in enumerate(figures):
+                label_ids[i] = getattr(figure, label_id)
+                keypoint_lists.append(getattr(figure, keypoints))
+
+        num_joints = max((len(k) for k in keypoint_lists), default=0)
+        locations = np.zeros((num_figures, num_joints, 2), dtype=np.float32)
+        states = np.zeros((num_figures, num_joints), dtype=np.int32)
+        indices = np.full((num_figures, num_joints), -1, dtype=np.int32)
+        if num_joints > 0:
+            first = next(k for k in keypoint_lists if len(k) > 0)[0]
+            names = get_field_names(first.DESCRIPTOR)
+            index, location, state = names["index"], names["location"], names["state"]
+            for f, keypoint_list in enumerate(keypoint_lists):
+                for j, keypoint in enumerate(keypoint_list):
+                    locations[f, j] = getattr(keypoint, location)[:2]
+                    states[f, j] = getattr(keypoint, state)
+                    indices[f, j] = getattr(keypoint, index)
+        return KeypointFigures(template_id, label_ids, locations, states, indices)
@@ -1,28 +1,61 @@
-﻿import glob
-import json
+﻿import json
 import os
 from enum import Enum
 from os.path import isfile, join
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from google.protobuf.json_format import MessageToDict
+from google.protobuf import descriptor_pool, message_factory
+from google.protobuf.json_format import ParseDict, ParseError
 from PIL import Image
-from unity_vision.consumers.solo.parser import Solo
 from unity_vision.protos.solo_pb2 import (
     BoundingBox2DAnnotation,
     BoundingBox3DAnnotation,
     InstanceSegmentationAnnotation,
     KeypointAnnotation,
+    RGBCamera,
     SemanticSegmentationAnnotation,
 )
 
 import datasetvisualizer.core.visualization.visualizers as v
+from datasetvisualizer.core.caching import LRUCache, RenderCache, render_cache
+from datasetvisualizer.core.formats.definitions import DefinitionRegistry
+from datasetvisualizer.core.formats.solo.SoloAnnotations import (
+    BOUNDING_BOX_3D_TYPE,
+    BOUNDING_BOX_TYPE,
+    INSTANCE_SEGMENTATION_TYPE,
+    KEYPOINT_TYPE,
+    SEMANTIC_SEGMENTATION_TYPE,
+    BoundingBoxes2D,
+    BoundingBoxes3D,
+    KeypointFigures,
+    get_field,
+)
+from datasetvisualizer.core.formats.solo.SoloAnnotationStore import (
+    SoloAnnotationStore,
+    StoredFrame,
+)
+from datasetvisualizer.core.formats.solo.SoloFrameIndex import SoloFrameIndex
+from datasetvisualizer.core.visualization.decoding import open_image, open_mask
 
-SEMANTIC_SEGMENTATION_TYPE = "type.unity.com/unity.solo.SemanticSegmentationAnnotation"
-INSTANCE_SEGMENTATION_TYPE = "type.unity.com/unity.solo.InstanceSegmentationAnnotation"
-BOUNDING_BOX_TYPE = "type.unity.com/unity.solo.BoundingBox2DAnnotation"
-BOUNDING_BOX_3D_TYPE = "type.unity.com/unity.solo.BoundingBox3DAnnotation"
-KEYPOINT_TYPE = "type.unity.com/unity.solo.KeypointAnnotation"
+PARSED_FRAMES_CACHE_ENTRIES = 256
+
+
+class SoloFrame:
+    """A parsed step*.frame_data.json file, shared by rendering and the zoom view so the json is parsed only once"""
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        sensor: Any,
+        sequence_path: str,
+        sequence: int,
+        step: int,
+    ):
+        self.data = data
+        self.sensor = sensor
+        self.sequence_path = sequence_path
+        self.sequence = sequence
+        self.step = step
 
 
 class SoloDataset:
@@ -69,22 +102,50 @@ class SoloDataset:
         except TypeError:
             return False
 
+    @staticmethod
+    def get_definition_files(base_dataset_dir: str) -> List[str]:
+        files = []
+        for special_file in SoloDataset.SpecialFile:
+            path, found = SoloDataset.get_special_file(base_dataset_dir, special_file)
+            if found:
+                files.append(path)
+        return files
+
+    @staticmethod
+    def get_dataset_stamps(base_dataset_dir: str) -> List[Any]:
+        """gets the stamps of the frames and of the annotation store of a dataset, the definition files don't change
+        when sequences are added or rewritten or when the store is built again
+
+        :param base_dataset_dir: Path to the root of the dataset
+        :type base_dataset_dir: str
+        :return: stamps of the frame files and of the annotation store
+        :rtype: List[Any]
+        """
+        return SoloFrameIndex.get_dataset_stamp(
+            base_dataset_dir
+        ) + SoloAnnotationStore.get_store_stamp(base_dataset_dir)
+
     def __init__(self, data_root: str):
+        self.frames = LRUCache(max_entries=PARSED_FRAMES_CACHE_ENTRIES)
+        self.frame_index: Optional[SoloFrameIndex] = None
+        self.annotation_store: Optional[SoloAnnotationStore] = None
         if SoloDataset.is_solo_dataset(data_root):
             try:
                 self.data_root = data_root
                 self.get_annotation_definitions()
-                self.solo = Solo(data_root, start=0)
+                self.frame_index = SoloFrameIndex(data_root).load()
+                self.annotation_store = SoloAnnotationStore.find(
+                    data_root, self.frame_index
+                )
                 self.dataset_valid = True
             except Exception as e:
                 print(e)
                 self.data_root = None
-                self.solo = None
+                self.frame_index = None
+                self.annotation_store = None
                 self.dataset_valid = False
         else:
             self.data_root = None
-            self.solo = None
-
             self.dataset_valid = False
 
     def get_annotation_definitions(self):
@@ -103,22 +164,118 @@ class SoloDataset:
             "r",
         )
         self.annotaion_definitions = json.load(f)
+
+        f = open(
+            SoloDataset.get_special_file(
+                self.data_root, SoloDataset.SpecialFile.METRIC_DEFINITIONS
+            )[0],
+            "r",
+        )
+        self.metric_definitions = json.load(f)
+
+        self.definitions = DefinitionRegistry.from_solo(
+            self.annotaion_definitions, self.metric_definitions
+        )
         return self.metadata
 
     def get_available_labelers(self):
         return self.metadata["annotators"]
 
     def length(self):
+        if self.frame_index is not None and len(self.frame_index) > 0:
+            return len(self.frame_index)
         return self.metadata["totalFrames"]
 
+    def get_sequence_and_step(self, index: int) -> Tuple[int, int]:
+        return self.frame_index.resolve(index)
+
+    @staticmethod
+    def _to_sensor_message(frame_data: Dict[str, Any]) -> Optional[Any]:
+        """Parses the first capture of the frame into the protobuf message of its @type"""
+        captures = frame_data.get("captures", [])
+        if len(captures) == 0:
+            return None
+        type_name = captures[0].get("@type", "").split("/")[-1]
+        try:
+            descriptor = descriptor_pool.Default().FindMessageTypeByName(type_name)
+        except KeyError:
+            return None
+        if hasattr(message_factory, "GetMessageClass"):
+            message_class = message_factory.GetMessageClass(descriptor)
+        else:
+            message_class = message_factory.MessageFactory().GetPrototype(descriptor)
+        try:
+            return ParseDict(captures[0], message_class(), ignore_unknown_fields=True)
+        except ParseError:
+            return None
+
+    @staticmethod
+    def _to_camera_message(frame_data: Dict[str, Any]) -> Any:
+        """Parses the first capture of the frame as an RGBCamera message, for captures of an @type that isn't known"""
+        captures = frame_data.get("captures", [])
+        capture = captures[0] if len(captures) > 0 else {}
+        try:
+            return ParseDict(capture, RGBCamera(), ignore_unknown_fields=True)
+        except ParseError:
+            # Annotations of unknown types can't be unpacked, the camera is still rendered without them
+            capture = {
+                key: value for key, value in capture.items() if key != "annotations"
+            }
+            return ParseDict(capture, RGBCamera(), ignore_unknown_fields=True)
+
+    def load_frame(self, index: int) -> SoloFrame:
+        """Resolves the frame at index with the frame index and parses its frame_data.json, recently loaded frames
+        are kept so that rendering and the zoom view don't parse the same file again
+
+        :param index: The index of the frame we want
+        :type index: int
+        :return: The parsed frame
+        :rtype: SoloFrame
+        """
+        frame = self.frames.get(index)
+        if frame is not None:
+            return frame
+
+        sequence, step = self.frame_index.resolve(index)
+        sequence_path = self.frame_index.get_sequence_path(index)
+        with open(
+            self.frame_index.get_frame_data_path(index), "r", encoding="utf8"
+        ) as f:
+            data = json.load(f)
+
+        # The frame is always read from the file the frame index resolved, the solo parser maps indices to files
+        # assuming every sequence has the same number of steps
+        sensor = SoloDataset._to_sensor_message(data)
+        if sensor is None:
+            sensor = SoloDataset._to_camera_message(data)
+
+        frame = SoloFrame(data, sensor, sequence_path, sequence, step)
+        self.frames.put(index, frame)
+        return frame
+
+    def load_render_frame(self, index: int):
+        """gets the frame at index from the annotation store if it was built, otherwise parses its frame_data.json
+
+        :param index: The index of the frame we want
+        :type index: int
+        :return: The frame, a StoredFrame or a SoloFrame
+        """
+        if self.annotation_store is not None:
+            frame = self.annotation_store.get_frame(index)
+            if frame is not None:
+                return frame
+        return self.load_frame(index)
+
     def get_keypoint_template(self, templateId: str):
-        for i in self.annotaion_definitions["annotationDefinitions"]:
-            if i["@type"] == KEYPOINT_TYPE:
-                template = i["template"]
-                if template["templateId"] == templateId:
-                    return template
+        return self.definitions.get_keypoint_template(templateId)
 
-        return None
+    def get_label_mappings(
+        self, annotator_id: str, boxes: BoundingBoxes2D
+    ) -> Dict[int, str]:
+        label_mappings = self.definitions.get_label_mappings(annotator_id)
+        if len(label_mappings) > 0:
+            return label_mappings
+        return dict(zip(boxes.label_ids.tolist(), boxes.label_names))
 
     def _to_annotation(self, annotation):
         if annotation == SEMANTIC_SEGMENTATION_TYPE:
@@ -144,40 +301,76 @@ class SoloDataset:
                 annotator_dic[labeler["type"]].append(annotator_name_state)
         return annotator_dic
 
-    def _get_annotation_from_sensor(self, sensor, annotator, annotation):
-        annotations = sensor.annotations
-        ann_type = self._to_annotation(annotation)
+    def _get_annotation_message(self, frame: SoloFrame, annotator, annotation):
+        """gets the typed annotation message of annotator in the frame, only the matching annotation is unpacked
 
-        for a in annotations:
-            if a.Is(ann_type.DESCRIPTOR):
-                a.Unpack(ann_type)
-                messageToDict = MessageToDict(a)
-                if (
-                    "id" in messageToDict
-                    and messageToDict["id"] == annotator.name
-                    and annotator.state
-                ):
-                    return messageToDict
-                elif "id" not in messageToDict and annotator.state:
-                    return messageToDict
+        :param frame: The loaded frame
+        :type frame: SoloFrame
+        :param annotator: The annotator, its annotation is returned only if it is enabled
+        :type annotator: AnnotatorNameState
+        :param annotation: @type of the annotation, e.g. BOUNDING_BOX_TYPE
+        :type annotation: str
+        :return: The annotation message or None if the frame has no annotation of the annotator
+        """
+        if not annotator.state:
+            return None
+
+        ann_type = self._to_annotation(annotation)
+        captures = frame.data.get("captures", [])
+        records = captures[0].get("annotations", []) if len(captures) > 0 else []
+
+        for position, a in enumerate(frame.sensor.annotations):
+            # The json records are in the same order as the packed annotations, they tell the type and id of an
+            # annotation without unpacking it
+            if position < len(records):
+                record = records[position]
+                if record.get("@type") != annotation:
+                    continue
+                if record.get("id", "") not in ("", annotator.name):
+                    continue
+            elif not a.Is(ann_type.DESCRIPTOR):
+                continue
+
+            if a.Unpack(ann_type):
+                ann_id = get_field(ann_type, "id", "")
+                if ann_id == "" or ann_id == annotator.name:
+                    return ann_type
 
         return None
 
+    def _get_annotation(self, frame, annotator, annotation):
+        """gets the annotation of annotator in the frame as arrays, read from the store or from the parsed json
+
+        :param frame: The frame returned by load_render_frame
+        :param annotator: The annotator, its annotation is returned only if it is enabled
+        :type annotator: AnnotatorNameState
+        :param annotation: @type of the annotation, e.g. BOUNDING_BOX_TYPE
+        :type annotation: str
+        :return: BoundingBoxes2D, BoundingBoxes3D or KeypointFigures, the mask filename of segmentation annotations,
+                 or None if the frame has no annotation of the annotator
+        """
+        if not annotator.state:
+            return None
+        if isinstance(frame, StoredFrame):
+            return frame.get_annotation(annotation, annotator.name)
+
+        message = self._get_annotation_message(frame, annotator, annotation)
+        if message is None:
+            return None
+        if annotation == BOUNDING_BOX_TYPE:
+            return BoundingBoxes2D.from_message(message)
+        if annotation == BOUNDING_BOX_3D_TYPE:
+            return BoundingBoxes3D.from_message(message)
+        if annotation == KEYPOINT_TYPE:
+            return KeypointFigures.from_message(message)
+        return get_field(message, "filename")
+
     # create AnnotatorNameState class
     class AnnotatorNameState:
         def __init__(self, name: str, state: bool):
             self.name = name
             self.state = state
 
-    def get_sequence_path(self):
-        filename_pattern = f"{self.solo.sequence_path}"
-        files = glob.glob(filename_pattern)
-        if len(files) != 1:
-            raise Exception(
-                f"Metadata file not found for sequence {self.solo.sequence_path}"
-            )
-        return files[0]
-
     def get_solo_image_with_labelers(
         self,
         index: int,
@@ -185,63 +378,99 @@ class SoloDataset:
         annotator_dic: Dict[str, AnnotatorNameState],
         max_size: int = 500,
     ) -> Image:
+        key = self.get_render_key(index, labelers_to_use, annotator_dic, max_size)
+        return render_cache.get_or_render(
+            key,
+            lambda: self._render_solo_image_with_labelers(
+                index, labelers_to_use, annotator_dic, max_size
+            ),
+        )
+
+    def get_render_key(
+        self,
+        index: int,
+        labelers_to_use: Dict[str, bool],
+        annotator_dic: Dict[str, AnnotatorNameState],
+        max_size: int = 500,
+    ) -> Tuple:
+        """gets the render cache key of the image get_solo_image_with_labelers creates with the same arguments"""
+        enabled_annotators = []
+        if labelers_to_use is not None:
+            for annotation_type, used in labelers_to_use.items():
+                if used:
+                    enabled_annotators.extend(
+                        (annotation_type, annotator.name)
+                        for annotator in annotator_dic.get(annotation_type, [])
+                        if annotator.state
+                    )
+        return RenderCache.make_key(self, index, enabled_annotators, max_size)
 
-        self.solo.__load_frame__(index)
+    def _render_solo_image_with_labelers(
+        self,
+        index: int,
+        labelers_to_use: Dict[str, bool],
+        annotator_dic: Dict[str, AnnotatorNameState],
+        max_size: int,
+    ) -> Image:
+        frame = self.load_render_frame(index)
+        sensor = frame.sensor
+        sequence_path = frame.sequence_path
 
-        sensor = self.solo.sensors()[0]["message"]
-        filename = os.path.join(self.get_sequence_path(), sensor.filename)
-        image = Image.open(filename)
+        filename = os.path.join(sequence_path, sensor.filename)
+        # The image is decoded at the resolution it is displayed at before anything is drawn on it, annotations in
+        # pixel coordinates are scaled to the downscaled image and 3D boxes are projected with its size
+        image, (full_width, full_height) = open_image(filename, max_size)
+        scale_x = image.width / full_width
+        scale_y = image.height / full_height
 
         if labelers_to_use is None:
             labelers_to_use = []
 
         if BOUNDING_BOX_TYPE in labelers_to_use and labelers_to_use[BOUNDING_BOX_TYPE]:
             for annotator in annotator_dic[BOUNDING_BOX_TYPE]:
-                if annotator.state:
-                    bbox_data = self._get_annotation_from_sensor(
-                        sensor, annotator, BOUNDING_BOX_TYPE
-                    )
-                    label_mappings = {
-                        m["labelId"]: m["labelName"] for m in bbox_data["values"]
-                    }
+                boxes = self._get_annotation(frame, annotator, BOUNDING_BOX_TYPE)
+                if boxes is not None:
+                    label_mappings = self.get_label_mappings(annotator.name, boxes)
                     image = v.draw_solo_image_with_boxes(
-                        image, bbox_data, label_mappings
+                        image,
+                        boxes,
+                        label_mappings,
+                        scale=(scale_x, scale_y),
+                        full_height=full_height,
                     )
 
         if KEYPOINT_TYPE in labelers_to_use and labelers_to_use[KEYPOINT_TYPE]:
             for annotator in annotator_dic[KEYPOINT_TYPE]:
-                if annotator.state:
-                    keypoint_data = self._get_annotation_from_sensor(
-                        sensor, annotator, KEYPOINT_TYPE
+                figures = self._get_annotation(frame, annotator, KEYPOINT_TYPE)
+                if figures is not None:
+                    figures = figures.scaled(scale_x, scale_y)
+                    template = self.get_keypoint_template(figures.template_id)
+                    image = v.draw_image_with_keypoints(
+                        image, figures, template, scale=min(scale_x, scale_y)
                     )
-                    b = keypoint_data["templateId"]
-                    template = self.get_keypoint_template(b)
-                    image = v.draw_image_with_keypoints(image, keypoint_data, template)
 
         if (
             BOUNDING_BOX_3D_TYPE in labelers_to_use
             and labelers_to_use[BOUNDING_BOX_3D_TYPE]
         ):
             for annotator in annotator_dic[BOUNDING_BOX_3D_TYPE]:
-                if annotator.state:
-                    bbox_3d_data = self._get_annotation_from_sensor(
-                        sensor, annotator, BOUNDING_BOX_3D_TYPE
+                boxes_3d = self._get_annotation(frame, annotator, BOUNDING_BOX_3D_TYPE)
+                if boxes_3d is not None:
+                    image = v.draw_image_with_box_3d(
+                        image, sensor, boxes_3d, None, scale=min(scale_x, scale_y)
                     )
-                    image = v.draw_image_with_box_3d(image, sensor, bbox_3d_data, None)
 
         if (
             SEMANTIC_SEGMENTATION_TYPE in labelers_to_use
             and labelers_to_use[SEMANTIC_SEGMENTATION_TYPE]
         ):
             for annotator in annotator_dic[SEMANTIC_SEGMENTATION_TYPE]:
-                if annotator.state:
-                    seg_data = self._get_annotation_from_sensor(
-                        sensor, annotator, SEMANTIC_SEGMENTATION_TYPE
-                    )
-                    seg_filename = os.path.join(
-                        self.get_sequence_path(), seg_data["filename"]
-                    )
-                    seg = Image.open(seg_filename)
+                seg_file = self._get_annotation(
+                    frame, annotator, SEMANTIC_SEGMENTATION_TYPE
+                )
+                if seg_file is not None:
+                    seg_filename = os.path.join(sequence_path, seg_file)
+                    seg = open_mask(seg_filename, image.size)
                     image = v.draw_image_with_segmentation(image, seg)
 
         if (
@@ -249,14 +478,12 @@ class SoloDataset:
             and labelers_to_use[INSTANCE_SEGMENTATION_TYPE]
         ):
             for annotator in annotator_dic[INSTANCE_SEGMENTATION_TYPE]:
-                if annotator.state:
-                    inst_data = self._get_annotation_from_sensor(
-                        sensor, annotator, INSTANCE_SEGMENTATION_TYPE
-                    )
-                    inst_filename = os.path.join(
-                        self.get_sequence_path(), inst_data["filename"]
-                    )
-                    inst = Image.open(inst_filename)
+                inst_file = self._get_annotation(
+                    frame, annotator, INSTANCE_SEGMENTATION_TYPE
+                )
+                if inst_file is not None:
+                    inst_filename = os.path.join(sequence_path, inst_file)
+                    inst = open_mask(inst_filename, image.size)
                     image = v.draw_image_with_segmentation(image, inst)
 
         return image
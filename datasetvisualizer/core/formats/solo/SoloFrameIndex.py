@@ -0,0 +1,192 @@
+import bisect
+import hashlib
+import os
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+from datasetvisualizer.core.caching import get_index_dir
+
+SEQUENCE_DIR_PATTERN = re.compile(r"^sequence\.(\d+)$")
+FRAME_DATA_FILE_PATTERN = re.compile(r"^step(\d+)\.frame_data\.json$")
+FRAME_INDEX_VERSION = 1
+
+
+def get_frame_files_stamp(sequence_path: str) -> Tuple[int, int]:
+    """gets (number of frame files, latest modification time of a frame file) of a sequence directory"""
+    # The modification time of the sequence directory doesn't change when a frame file is rewritten in place
+    count = 0
+    latest = 0
+    for entry in os.scandir(sequence_path):
+        if FRAME_DATA_FILE_PATTERN.match(entry.name) is not None:
+            count += 1
+            latest = max(latest, entry.stat().st_mtime_ns)
+    return count, latest
+
+
+class SoloFrameIndex:
+    """Maps the global frame index of a SOLO dataset to its sequence directory and step.
+
+    Sequences don't need to have the same number of steps, a frame is resolved with a bisect on the cumulative step
+    counts of the sequences. The index is saved in the index directory and rebuilt when a sequence directory is
+    added, removed or modified.
+    """
+
+    def __init__(self, data_root: str):
+        self.data_root = data_root
+        self.sequence_dirs: List[str] = []
+        self.sequence_numbers = np.zeros(0, dtype=np.int64)
+        # offsets[i] is the global index of the first frame of sequence i, offsets[-1] is the number of frames
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.steps = np.zeros(0, dtype=np.int32)
+        self._offsets_list: List[int] = [0]
+
+    def _get_sequence_dirs(self) -> List[Tuple[int, str]]:
+        sequences = []
+        for entry in os.scandir(self.data_root):
+            match = SEQUENCE_DIR_PATTERN.match(entry.name)
+            if match is not None and entry.is_dir():
+                sequences.append((int(match.group(1)), entry.name))
+        return sorted(sequences)
+
+    def _get_stamps(self, sequences: List[Tuple[int, str]]) -> np.ndarray:
+        stamps = [os.stat(self.data_root).st_mtime_ns]
+        for _, sequence_dir in sequences:
+            stamps.append(
+                os.stat(os.path.join(self.data_root, sequence_dir)).st_mtime_ns
+            )
+        return np.array(stamps, dtype=np.int64)
+
+    @staticmethod
+    def get_dataset_stamp(data_root: str) -> List[int]:
+        """gets [number of sequences, number of frame files, latest modification time of a frame file] of a dataset,
+        it changes when sequences or frames are added, removed or rewritten
+
+        :param data_root: Path to the root of the dataset
+        :type data_root: str
+        :return: the stamp of the frames of the dataset
+        :rtype: List[int]
+        """
+        sequences = SoloFrameIndex(data_root)._get_sequence_dirs()
+        frames = 0
+        latest = 0
+        for _, sequence_dir in sequences:
+            count, modified = get_frame_files_stamp(
+                os.path.join(data_root, sequence_dir)
+            )
+            frames += count
+            latest = max(latest, modified)
+        return [len(sequences), frames, latest]
+
+    def _get_index_path(self) -> str:
+        digest = hashlib.sha1(
+            os.path.abspath(self.data_root).encode("utf8")
+        ).hexdigest()
+        return os.path.join(get_index_dir(), f"solo_{digest}.npz")
+
+    def build(self, sequences: List[Tuple[int, str]]):
+        offsets = [0]
+        steps = []
+        for _, sequence_dir in sequences:
+            sequence_steps = []
+            for file in os.listdir(os.path.join(self.data_root, sequence_dir)):
+                match = FRAME_DATA_FILE_PATTERN.match(file)
+                if match is not None:
+                    sequence_steps.append(int(match.group(1)))
+            steps.extend(sorted(sequence_steps))
+            offsets.append(offsets[-1] + len(sequence_steps))
+
+        self._set_arrays(
+            [sequence_dir for _, sequence_dir in sequences],
+            np.array([number for number, _ in sequences], dtype=np.int64),
+            np.array(offsets, dtype=np.int64),
+            np.array(steps, dtype=np.int32),
+        )
+
+    def _set_arrays(self, sequence_dirs, sequence_numbers, offsets, steps):
+        self.sequence_dirs = sequence_dirs
+        self.sequence_numbers = sequence_numbers
+        self.offsets = offsets
+        self.steps = steps
+        self._offsets_list = offsets.tolist()
+
+    def load(self) -> "SoloFrameIndex":
+        """Loads the index from the index directory, building and saving it if it is missing or outdated
+
+        :return: self
+        :rtype: SoloFrameIndex
+        """
+        sequences = self._get_sequence_dirs()
+        stamps = self._get_stamps(sequences)
+        index_path = self._get_index_path()
+        sequence_dirs = [sequence_dir for _, sequence_dir in sequences]
+
+        try:
+            with np.load(index_path, allow_pickle=False) as index:
+                if (
+                    int(index["version"]) == FRAME_INDEX_VERSION
+                    and index["sequence_dirs"].tolist() == sequence_dirs
+                    and np.array_equal(index["stamps"], stamps)
+                ):
+                    self._set_arrays(
+                        sequence_dirs,
+                        index["sequence_numbers"],
+                        index["offsets"],
+                        index["steps"],
+                    )
+                    return self
+        except (OSError, KeyError, ValueError):
+            pass
+
+        self.build(sequences)
+        self.save(index_path, stamps)
+        return self
+
+    def save(self, index_path: str, stamps: np.ndarray):
+        tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(
+                tmp_path,
+                version=np.array(FRAME_INDEX_VERSION),
+                sequence_dirs=np.array(self.sequence_dirs, dtype=str),
+                sequence_numbers=self.sequence_numbers,
+                offsets=self.offsets,
+                steps=self.steps,
+                stamps=stamps,
+            )
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            # The index still works from memory if the index directory isn't writable
+            print(e)
+
+    def __len__(self):
+        return self._offsets_list[-1]
+
+    def resolve(self, index: int) -> Tuple[int, int]:
+        """gets the sequence number and step of the frame at index
+
+        :param index: global frame index
+        :type index: int
+        :return: (sequence number, step)
+        :rtype: Tuple[int, int]
+        """
+        if index < 0 or index >= len(self):
+            raise IndexError(f"Frame {index} is out of range")
+        position = self.get_sequence_position(index)
+        return int(self.sequence_numbers[position]), int(self.steps[index])
+
+    def get_sequence_position(self, index: int) -> int:
+        """gets the position in sequence_dirs of the sequence of the frame at index"""
+        return bisect.bisect_right(self._offsets_list, index) - 1
+
+    def get_sequence_path(self, index: int) -> str:
+        return os.path.join(
+            self.data_root, self.sequence_dirs[self.get_sequence_position(index)]
+        )
+
+    def get_frame_data_path(self, index: int) -> str:
+        return os.path.join(
+            self.get_sequence_path(index),
+            f"step{int(self.steps[index])}.frame_data.json",
+        )
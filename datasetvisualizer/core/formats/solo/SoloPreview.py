@@ -1,9 +1,8 @@
-import glob
-import json
 from typing import Dict, List, Tuple
 
 import streamlit as st
 
+from datasetvisualizer.core.caching import open_dataset
 from datasetvisualizer.core.formats.solo.SoloDataset import (
     BOUNDING_BOX_3D_TYPE,
     BOUNDING_BOX_TYPE,
@@ -12,7 +11,16 @@ from datasetvisualizer.core.formats.solo.SoloDataset import (
     SEMANTIC_SEGMENTATION_TYPE,
     SoloDataset,
 )
-from datasetvisualizer.helpers.ui import AppState
+from datasetvisualizer.core.frame_server import get_frame_source
+from datasetvisualizer.core.rendering import (
+    PREFETCH_ZOOM_FRAMES,
+    get_neighbor_frames,
+    get_neighbor_pages,
+    render_executor,
+)
+from datasetvisualizer.core.visualization.encoding import GRID_VIEW, ZOOM_VIEW
+from datasetvisualizer.core.visualization.mosaic import get_tile_width, render_mosaic
+from datasetvisualizer.helpers.ui import AppState, Components
 
 
 def create_sidebar_entry(
@@ -147,7 +155,7 @@ def create_sidebar_labeler_menu(
 
 
 def preview_dataset(data_root):
-    ds = SoloDataset(data_root)
+    ds = open_dataset(data_root, SoloDataset)
 
     # This should probably never occur anyway as we check for validity before
     # unless our validity function incorrectly permits an invalid SOLO dataset
@@ -157,7 +165,7 @@ def preview_dataset(data_root):
         )
         return
 
-    dataset_len = ds.metadata["totalFrames"]
+    dataset_len = ds.length()
     with st.sidebar:
         AppState.display_horizontal_rule()
         AppState.display_number_frames(dataset_len)
@@ -192,6 +200,15 @@ def _create_grid_view_controls(dataset_size: int) -> Tuple[int, int]:
         st.session_state.just_opened_grid = False
         start_at = int(AppState.get_starting_frame())
 
+    with mid:
+        AppState.set_mosaic_grid(
+            st.checkbox(
+                "Single image grid",
+                value=AppState.get_mosaic_grid(),
+                help="Send the page to the browser as one image, faster for large grids",
+            )
+        )
+
     with right:
         num_cols = st.number_input(
             label="Sequences Per Row",
@@ -259,24 +276,71 @@ def grid_view(num_rows: int, ds: SoloDataset, labelers: Dict[str, bool], annotat
 
     num_cols, start_at = _create_grid_view_controls(dataset_size)
 
-    containers = _create_grid_containers(num_rows, num_cols, start_at, dataset_size)
     view_range = range(start_at, min(start_at + (num_cols * num_rows), dataset_size))
-
-    for i in view_range:
-        image = ds.get_solo_image_with_labelers(
-            i, labelers, annotator_dic, max_size=get_resolution_from_num_cols(num_cols)
+    max_size = get_resolution_from_num_cols(num_cols)
+
+    if AppState.get_mosaic_grid():
+        # Frames are rendered at the size of their tile and the page is sent as a single image
+        max_size = min(max_size, get_tile_width(num_cols))
+        captions = {}
+        for i in view_range:
+            sequence, step = ds.get_sequence_and_step(i)
+            captions[i] = f"sequence{sequence}.step{step}"
+        mosaic = render_mosaic(
+            ds,
+            "get_solo_image_with_labelers",
+            list(view_range),
+            num_cols,
+            captions,
+            labelers,
+            annotator_dic,
+            generation=AppState.get_render_generation(),
+            max_size=max_size,
         )
-        sequence = int(i / ds.solo.steps_per_sequence)
-        step = i % ds.solo.steps_per_sequence
-
-        with containers[i - start_at]:
-            st.image(
-                image, caption=f"sequence{sequence}.step{step}", use_column_width=True
-            )
-            if st.button("Open", key=f"i_{i}"):
-                AppState.set_zoom_image(i)
-                st.session_state.just_opened_zoom = True
-                st.experimental_rerun()
+        if mosaic is None:
+            return
+        clicked = Components.mosaic(*mosaic, key="solo_mosaic")
+        if clicked is not None:
+            AppState.set_zoom_image(clicked)
+            st.session_state.just_opened_zoom = True
+            st.experimental_rerun()
+    else:
+        containers = _create_grid_containers(num_rows, num_cols, start_at, dataset_size)
+
+        # Frames are rendered concurrently and placed in their container as soon as they are done
+        for i, image in render_executor.render_frames(
+            ds,
+            "get_solo_image_with_labelers",
+            view_range,
+            labelers,
+            annotator_dic,
+            generation=AppState.get_render_generation(),
+            max_size=max_size,
+        ):
+            sequence, step = ds.get_sequence_and_step(i)
+            key = ds.get_render_key(i, labelers, annotator_dic, max_size=max_size)
+
+            with containers[i - start_at]:
+                st.image(
+                    get_frame_source(image, GRID_VIEW, key),
+                    caption=f"sequence{sequence}.step{step}",
+                    use_column_width=True,
+                )
+                if st.button("Open", key=f"i_{i}"):
+                    AppState.set_zoom_image(i)
+                    st.session_state.just_opened_zoom = True
+                    st.experimental_rerun()
+
+    # The next and previous pages are rendered in the background while the user looks at this one
+    render_executor.prefetch(
+        ds,
+        "get_solo_image_with_labelers",
+        get_neighbor_pages(start_at, num_cols * num_rows, dataset_size),
+        labelers,
+        annotator_dic,
+        generation=AppState.get_render_generation(),
+        max_size=max_size,
+    )
 
 
 def get_resolution_from_num_cols(num_cols):
@@ -336,16 +400,29 @@ def zoom(
     AppState.display_horizontal_rule()
 
     frame = st.container()
-    step = index % ds.solo.steps_per_sequence
-    image = ds.get_solo_image_with_labelers(
-        index, labelers, annotator_dic, max_size=2000
+    image = render_executor.render_frame(
+        ds,
+        "get_solo_image_with_labelers",
+        index,
+        labelers,
+        annotator_dic,
+        generation=AppState.get_render_generation(),
+        max_size=2000,
+    )
+    if image is None:
+        return
+    render_executor.prefetch(
+        ds,
+        "get_solo_image_with_labelers",
+        get_neighbor_frames(index, PREFETCH_ZOOM_FRAMES, dataset_size),
+        labelers,
+        annotator_dic,
+        generation=AppState.get_render_generation(),
+        max_size=2000,
     )
-    path_to_captures = glob.glob(
-        f"{ds.get_sequence_path()}/step{step}.frame_data.json"
-    )[0]
 
     with frame:
-        json_file = json.load(open(path_to_captures, "r", encoding="utf8"))
+        json_file = ds.load_frame(index).data
         captures = json_file["captures"]
         metrics = json_file["metrics"]
 
@@ -355,7 +432,8 @@ def zoom(
             f"</p>",
             unsafe_allow_html=True,
         )
-        st.image(image, use_column_width=True)
+        key = ds.get_render_key(index, labelers, annotator_dic, max_size=2000)
+        st.image(get_frame_source(image, ZOOM_VIEW, key), use_column_width=True)
 
         frame.subheader("Frame Data")
 
@@ -0,0 +1,189 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Hashable, Optional, Tuple, Union
+
+from PIL import Image
+
+from datasetvisualizer.core.caching import LRUCache
+from datasetvisualizer.core.visualization.encoding import encode_frame, view_encodings
+
+DEFAULT_FRAME_SERVER_ADDRESS = "127.0.0.1"
+DEFAULT_FRAME_SERVER_MB = 512
+FRAMES_PATH = "/frames/"
+# Frames are addressed by the hash of their content, a URL always serves the same bytes
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class FrameServer:
+    """Local HTTP server the browser loads the frames of the views from.
+
+    Streamlit sends images inside its websocket messages, so the browser can't cache them and every rerun sends the
+    same bytes again. The views publish their encoded frames to this server instead and show them by URL. URLs are
+    made of the hash of the frame, they are served with an ETag and cached by the browser for good, so going back to
+    a page doesn't send any frame again. Published frames are kept in memory up to max_bytes.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_FRAME_SERVER_ADDRESS,
+        port: int = 0,
+        public_url: Optional[str] = None,
+        max_bytes: int = DEFAULT_FRAME_SERVER_MB * 1024 * 1024,
+    ):
+        """
+        :param address: address the server listens on
+        :type address: str
+        :param port: port the server listens on, any free port if 0
+        :type port: int
+        :param public_url: Optional, URL of the server for the browser, e.g. when it is behind a proxy,
+                           http://address:port if None
+        :type public_url: str
+        :param max_bytes: maximum size of the published frames kept in memory
+        :type max_bytes: int
+        """
+        self.address = address
+        self.port = port
+        self.public_url = public_url
+        self.frames = LRUCache(max_bytes=max_bytes, sizeof=lambda frame: len(frame[0]))
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    @property
+    def url(self) -> str:
+        if self.public_url is not None:
+            return self.public_url.rstrip("/")
+        return f"http://{self.address}:{self.port}"
+
+    def start(self) -> "FrameServer":
+        self._server = ThreadingHTTPServer(
+            (self.address, self.port), _FrameRequestHandler
+        )
+        self._server.daemon_threads = True
+        self._server.frames = self.frames
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="frame-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def publish(self, data: bytes, mimetype: str) -> str:
+        """Serves the bytes of an encoded frame
+
+        :param data: the encoded frame
+        :type data: bytes
+        :param mimetype: mimetype of the encoded frame
+        :type mimetype: str
+        :return: URL of the frame
+        :rtype: str
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        if digest not in self.frames:
+            self.frames.put(digest, (data, mimetype))
+        return f"{self.url}{FRAMES_PATH}{digest}"
+
+
+def _matches_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """gets whether the If-None-Match header of a request matches the ETag of a frame"""
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class _FrameRequestHandler(BaseHTTPRequestHandler):
+    def _get_frame(self) -> Tuple[Optional[str], Optional[Tuple[bytes, str]]]:
+        if not self.path.startswith(FRAMES_PATH):
+            return None, None
+        digest = self.path[len(FRAMES_PATH) :].split("?", 1)[0]
+        return digest, self.server.frames.get(digest)
+
+    def _send(self, body: bool):
+        digest, frame = self._get_frame()
+        if frame is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{digest}"'
+        if _matches_etag(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        data, mimetype = frame
+        self.send_response(200)
+        self.send_header("Content-Type", mimetype)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._send(body=True)
+
+    def do_HEAD(self):
+        self._send(body=False)
+
+    def log_message(self, format, *args):
+        # Every frame is a request, logging them would flood the terminal the app runs in
+        pass
+
+
+frame_server: Optional[FrameServer] = None
+
+
+def start_frame_server(
+    address: str = DEFAULT_FRAME_SERVER_ADDRESS,
+    port: int = 0,
+    public_url: Optional[str] = None,
+) -> FrameServer:
+    """Starts the frame server the views of this process publish their frames to"""
+    global frame_server
+    if frame_server is not None:
+        frame_server.stop()
+    frame_server = FrameServer(address, port, public_url).start()
+    return frame_server
+
+
+def stop_frame_server():
+    global frame_server
+    if frame_server is not None:
+        frame_server.stop()
+        frame_server = None
+
+
+def publish_frame(data: bytes, mimetype: str) -> Optional[str]:
+    """gets the URL of an encoded frame on the frame server, None if the frame server isn't started"""
+    if frame_server is None:
+        return None
+    return frame_server.publish(data, mimetype)
+
+
+def get_frame_source(
+    image: Image.Image, view: str, key: Optional[Hashable] = None
+) -> Union[str, bytes]:
+    """gets what st.image shows a rendered frame from, see encode_frame
+
+    :return: URL of the frame on the frame server if it runs, the encoded frame otherwise
+    :rtype: Union[str, bytes]
+    """
+    data = encode_frame(image, view, key)
+    url = publish_frame(data, view_encodings[view].mimetype)
+    return url if url is not None else data
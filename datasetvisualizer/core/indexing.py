@@ -0,0 +1,123 @@
+import argparse
+import os
+import time
+from pathlib import Path
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.formats.perception.LegacyDataset import LegacyDataset
+from datasetvisualizer.core.formats.perception.LegacySQLiteIndex import (
+    LegacySQLiteIndex,
+)
+from datasetvisualizer.core.formats.solo.SoloAnnotationStore import (
+    STORE_DIR_NAME,
+    SoloAnnotationStore,
+)
+from datasetvisualizer.core.formats.solo.SoloFrameIndex import SoloFrameIndex
+
+
+def build_solo_store(
+    data_root: str, frame_index: SoloFrameIndex, next_to_dataset: bool = False
+) -> int:
+    """Builds or updates the annotation store of a SOLO dataset, only new or changed sequences are read
+
+    :param data_root: Path to the root of the dataset
+    :type data_root: str
+    :param frame_index: The loaded frame index of the dataset
+    :type frame_index: SoloFrameIndex
+    :param next_to_dataset: save the store in the dataset directory instead of the index directory
+    :type next_to_dataset: bool
+    :return: number of sequences built
+    :rtype: int
+    """
+    store_dir = os.path.join(data_root, STORE_DIR_NAME) if next_to_dataset else None
+    store = SoloAnnotationStore(data_root, frame_index, store_dir)
+    total = len(frame_index.sequence_dirs)
+    start = time.perf_counter()
+    done = 0
+
+    def progress(sequence_dir: str, built: bool):
+        nonlocal done
+        done += 1
+        state = "built" if built else "up to date"
+        print(f"{done}/{total} {sequence_dir} {state}", flush=True)
+
+    built = store.build(progress)
+    print(
+        f"Annotation store of {len(frame_index)} frames saved in {store.store_dir}, {built} sequences built in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    return built
+
+
+def build_legacy_index(captures_dir: str) -> bool:
+    """Builds the SQLite index of the captures and metrics of a legacy dataset if it is missing or outdated
+
+    :param captures_dir: directory holding the captures and metrics json files
+    :type captures_dir: str
+    :return: whether the index had to be built
+    :rtype: bool
+    """
+    index = LegacySQLiteIndex(captures_dir)
+    if index.is_current():
+        print(f"SQLite index {index.path} is up to date")
+        return False
+
+    start = time.perf_counter()
+    index.build(lambda file: print(f"{file} indexed", flush=True))
+    print(
+        f"SQLite index of {len(index)} captures saved in {index.path} in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    return True
+
+
+def main(arg):
+    cli = argparse.ArgumentParser(
+        prog="datasetvisualizer index",
+        description="Index the annotations of a dataset so that frames are read without parsing its json files. SOLO "
+        "datasets are indexed into a columnar store, run it again after new sequences were added to update the store. "
+        "Legacy Perception datasets are indexed into a SQLite database of their captures, annotations and metrics.",
+    )
+    cli.add_argument(
+        "-d",
+        "--data",
+        type=str,
+        help="text path to the root of a dataset",
+        required=True,
+    )
+    cli.add_argument(
+        "--next-to-dataset",
+        help=f"save the store of a SOLO dataset in a {STORE_DIR_NAME} directory of the dataset instead of the index "
+        "directory",
+        action="store_true",
+    )
+    cli.add_argument(
+        "--index-dir",
+        type=str,
+        help="directory where dataset indices are saved so they are reused across restarts",
+        default=caching.DEFAULT_INDEX_DIR,
+    )
+    args = cli.parse_args(arg)
+
+    caching.set_index_dir(str(Path(args.index_dir).resolve()))
+    data_root = str(Path(args.data).resolve())
+    if not os.path.isdir(data_root):
+        print("\tError: The provided dataset folder does not seem to exist.")
+        return 1
+
+    if LegacyDataset.is_folder_valid_dataset(data_root):
+        captures_dir = LegacyDataset.find_captures_dir(data_root)
+        if captures_dir is None:
+            print("\tError: The provided dataset has no Dataset folder with captures.")
+            return 1
+        build_legacy_index(captures_dir)
+        return 0
+
+    frame_index = SoloFrameIndex(data_root).load()
+    if len(frame_index) == 0:
+        print(
+            "\tError: The provided folder is not a SOLO or legacy Perception dataset."
+        )
+        return 1
+    build_solo_store(data_root, frame_index, args.next_to_dataset)
+    return 0
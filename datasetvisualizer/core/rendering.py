@@ -0,0 +1,394 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import Future, as_completed
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from PIL import Image
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.caching import open_dataset, render_cache
+from datasetvisualizer.core.formats.perception import LegacyDataset
+
+DEFAULT_RENDER_WORKERS = min(8, os.cpu_count() or 1)
+DEFAULT_PREFETCH_WORKERS = max(1, DEFAULT_RENDER_WORKERS // 2)
+# Number of frames prefetched on each side of the frame shown in zoom view
+PREFETCH_ZOOM_FRAMES = 2
+
+
+def get_neighbor_pages(start_at: int, page_size: int, dataset_size: int) -> List[int]:
+    """gets the indices of the frames of the next and previous pages of a grid, the next page first
+
+    :param start_at: index of the first frame of the current page
+    :type start_at: int
+    :param page_size: number of frames of a page
+    :type page_size: int
+    :param dataset_size: The size of the dataset
+    :type dataset_size: int
+    :return: indices of the frames of the neighbor pages that are in the dataset
+    :rtype: List[int]
+    """
+    next_page = range(start_at + page_size, min(start_at + 2 * page_size, dataset_size))
+    previous_page = range(max(0, start_at - page_size), min(start_at, dataset_size))
+    return list(next_page) + list(previous_page)
+
+
+def get_neighbor_frames(index: int, count: int, dataset_size: int) -> List[int]:
+    """gets the indices of the count frames on each side of index, nearest first and the next frame before the previous
+
+    :param index: index of the current frame
+    :type index: int
+    :param count: number of frames on each side
+    :type count: int
+    :param dataset_size: The size of the dataset
+    :type dataset_size: int
+    :return: indices of the neighbor frames that are in the dataset
+    :rtype: List[int]
+    """
+    indices = []
+    for distance in range(1, count + 1):
+        indices.extend(
+            i for i in (index + distance, index - distance) if 0 <= i < dataset_size
+        )
+    return indices
+
+
+class WorkerSettings:
+    """Process wide settings cli.main applies, spawned worker processes start from the module defaults and are sent
+    them when they start"""
+
+    def __init__(
+        self,
+        index_dir: str,
+        lazy_captures_threshold: int,
+        decoded_cache_dir: Optional[str],
+        decoded_cache_bytes: int,
+    ):
+        self.index_dir = index_dir
+        self.lazy_captures_threshold = lazy_captures_threshold
+        self.decoded_cache_dir = decoded_cache_dir
+        self.decoded_cache_bytes = decoded_cache_bytes
+
+    @staticmethod
+    def current() -> "WorkerSettings":
+        """gets the settings of this process"""
+        return WorkerSettings(
+            caching.get_index_dir(),
+            LegacyDataset.LegacyDataset.lazy_captures_threshold,
+            caching.decoded_cache.cache_dir,
+            caching.decoded_cache.max_bytes,
+        )
+
+    def apply(self):
+        caching.set_index_dir(self.index_dir)
+        LegacyDataset.LegacyDataset.lazy_captures_threshold = (
+            self.lazy_captures_threshold
+        )
+        caching.decoded_cache.set_cache_dir(
+            self.decoded_cache_dir, self.decoded_cache_bytes
+        )
+        # Rendered frames are sent back to the process that requested them and cached there
+        caching.render_cache.set_max_bytes(0)
+
+
+def _init_worker(settings: WorkerSettings):
+    settings.apply()
+
+
+def _render_frame_in_process(
+    dataset_class: Any, data_root: str, method: str, index: int, args, kwargs
+) -> Image.Image:
+    # Each worker process keeps its own opened copy of the dataset in its dataset cache
+    ds = open_dataset(data_root, dataset_class)
+    return getattr(ds, method)(index, *args, **kwargs)
+
+
+class RenderGeneration:
+    """Frames rendered for one run of the preview script.
+
+    Streamlit reruns the script whenever a widget changes, the frames still rendering for the previous run will never
+    be shown. Every run renders its frames in a new generation and cancels the generation of the previous run, which
+    cancels its frames that haven't started and stops render_frames from yielding more of them. Frames that already
+    started still finish and are stored in the render cache.
+    """
+
+    def __init__(self):
+        self._cancelled = False
+        self._futures: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def add(self, future: Future):
+        """Ties a render to the generation, it is cancelled right away if the generation is"""
+        with self._lock:
+            cancelled = self._cancelled
+            if not cancelled:
+                self._futures.add(future)
+        # Done callbacks of finished futures run right away, they must not be added with the lock held
+        if cancelled:
+            future.cancel()
+        else:
+            future.add_done_callback(self._discard)
+
+    def _discard(self, future: Future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            futures = list(self._futures)
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+
+
+class RenderExecutor:
+    """Renders the frames of a page concurrently.
+
+    Frames are rendered by a pool of threads by default, decoding and drawing with PIL and NumPy release the GIL for
+    most of their work. A pool of processes can be used instead, in which case every worker opens its own copy of the
+    dataset and the rendered images are sent back to be stored in the render cache of this process.
+
+    Frames the user is likely to look at next can be prefetched into the render cache by a separate, smaller pool of
+    threads so they never delay the frames of the current page. Prefetches still queued are cancelled when frames are
+    requested or when other frames are prefetched, a frame requested while it is being prefetched waits for the
+    prefetch instead of being rendered twice.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_RENDER_WORKERS,
+        use_processes: bool = False,
+        prefetch_workers: int = DEFAULT_PREFETCH_WORKERS,
+    ):
+        self.workers = max(1, workers)
+        self.use_processes = use_processes
+        self.prefetch_workers = max(0, prefetch_workers)
+        self._executor: Optional[Executor] = None
+        self._prefetch_executor: Optional[Executor] = None
+        self._prefetches: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        workers: int,
+        use_processes: bool = False,
+        prefetch_workers: int = DEFAULT_PREFETCH_WORKERS,
+    ):
+        self.cancel_prefetches()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._prefetch_executor is not None:
+                self._prefetch_executor.shutdown(wait=False)
+                self._prefetch_executor = None
+            self.workers = max(1, workers)
+            self.use_processes = use_processes
+            self.prefetch_workers = max(0, prefetch_workers)
+
+    def get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(WorkerSettings.current(),),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="render"
+                    )
+            return self._executor
+
+    def _get_prefetch_executor(self) -> Executor:
+        # Called with the lock held
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(
+                max_workers=self.prefetch_workers, thread_name_prefix="prefetch"
+            )
+        return self._prefetch_executor
+
+    def cancel_prefetches(self, keep: Iterable[Hashable] = ()):
+        """Cancels the prefetches that haven't started, except the ones of the frames with the render keys in keep"""
+        keep = set(keep)
+        with self._lock:
+            for key, future in list(self._prefetches.items()):
+                if future.done() or (key not in keep and future.cancel()):
+                    del self._prefetches[key]
+
+    def _take_prefetch(self, key: Hashable) -> Optional[Future]:
+        """gets the prefetch of the frame if it is already being rendered, a queued prefetch is cancelled instead"""
+        with self._lock:
+            future = self._prefetches.pop(key, None)
+        if future is None or future.cancel():
+            return None
+        return future
+
+    def prefetch(
+        self,
+        ds: Any,
+        method: str,
+        indices: Iterable[int],
+        *args,
+        generation: Optional[RenderGeneration] = None,
+        **kwargs,
+    ):
+        """Renders the frames at indices in the background so they are in the render cache when they are requested
+
+        Prefetches of other frames, or of the same frames with other labelers or another resolution, that haven't
+        started are cancelled. Frames already in the render cache are skipped.
+
+        :param ds: The dataset, must provide get_render_key with the same arguments as method
+        :param method: name of the method of the dataset that renders a frame, e.g. "get_image_with_labelers"
+        :type method: str
+        :param indices: indices of the frames to prefetch, in the order they should be rendered
+        :type indices: Iterable[int]
+        :param generation: Optional, nothing is prefetched if the generation was cancelled
+        :type generation: RenderGeneration
+        """
+        if self.prefetch_workers <= 0 or (
+            generation is not None and generation.cancelled
+        ):
+            return
+        keys = [(index, ds.get_render_key(index, *args, **kwargs)) for index in indices]
+        self.cancel_prefetches(keep=[key for _, key in keys])
+
+        with self._lock:
+            executor = self._get_prefetch_executor()
+            for index, key in keys:
+                if key in self._prefetches or key in render_cache.memory:
+                    continue
+                self._prefetches[key] = executor.submit(
+                    _prefetch_frame, ds, method, index, key, args, kwargs
+                )
+
+    def render_frame(
+        self,
+        ds: Any,
+        method: str,
+        index: int,
+        *args,
+        generation: Optional[RenderGeneration] = None,
+        **kwargs,
+    ) -> Optional[Image.Image]:
+        """Renders the frame at index with ds.<method>(index, *args, **kwargs), see render_frames
+
+        :return: the frame or None if the generation was cancelled before the frame was rendered
+        :rtype: PIL.Image
+        """
+        frames = self.render_frames(
+            ds, method, [index], *args, generation=generation, **kwargs
+        )
+        for _, image in frames:
+            return image
+        return None
+
+    def render_frames(
+        self,
+        ds: Any,
+        method: str,
+        indices: Iterable[int],
+        *args,
+        generation: Optional[RenderGeneration] = None,
+        **kwargs,
+    ) -> Iterator[Tuple[int, Image.Image]]:
+        """Renders the frames at indices with ds.<method>(index, *args, **kwargs) and yields them as they are done
+
+        The frames that haven't started rendering are cancelled once the generation is cancelled or the iterator is
+        closed, e.g. when Streamlit stops the script to rerun it.
+
+        :param ds: The dataset, must provide get_render_key with the same arguments as method
+        :param method: name of the method of the dataset that renders a frame, e.g. "get_image_with_labelers"
+        :type method: str
+        :param indices: indices of the frames to render
+        :type indices: Iterable[int]
+        :param generation: Optional, the generation of the run of the script the frames are rendered for
+        :type generation: RenderGeneration
+        :return: iterator of (index, image) in the order the frames finish rendering, it stops early if the
+                 generation is cancelled
+        :rtype: Iterator[Tuple[int, PIL.Image]]
+        """
+        if generation is None:
+            generation = RenderGeneration()
+        if generation.cancelled:
+            return
+        indices = list(indices)
+        keys = [ds.get_render_key(index, *args, **kwargs) for index in indices]
+        # The frames of the page come first, prefetches that haven't started would only slow them down
+        self.cancel_prefetches(keep=keys)
+        prefetched = {
+            index: self._take_prefetch(key) for index, key in zip(indices, keys)
+        }
+
+        if self.workers <= 1 or len(indices) <= 1:
+            for index in indices:
+                if generation.cancelled:
+                    return
+                future = prefetched[index]
+                if future is not None:
+                    yield index, future.result()
+                else:
+                    yield index, getattr(ds, method)(index, *args, **kwargs)
+            return
+
+        executor = self.get_executor()
+        futures = {}
+        try:
+            for index, key in zip(indices, keys):
+                if prefetched[index] is not None:
+                    future = prefetched[index]
+                    key = None
+                elif self.use_processes:
+                    image = render_cache.get(key)
+                    if image is not None:
+                        yield index, image
+                        continue
+                    future = executor.submit(
+                        _render_frame_in_process,
+                        type(ds),
+                        ds.data_root,
+                        method,
+                        index,
+                        args,
+                        kwargs,
+                    )
+                else:
+                    future = executor.submit(
+                        getattr(ds, method), index, *args, **kwargs
+                    )
+                    key = None
+                generation.add(future)
+                futures[future] = (index, key)
+
+            for future in as_completed(futures):
+                if generation.cancelled:
+                    return
+                index, key = futures[future]
+                image = future.result()
+                if key is not None:
+                    render_cache.put(key, image)
+                yield index, image
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _prefetch_frame(
+    ds: Any, method: str, index: int, key: Hashable, args, kwargs
+) -> Image.Image:
+    image = getattr(ds, method)(index, *args, **kwargs)
+    # The render methods of the datasets store the frame in the render cache themselves
+    if key not in render_cache.memory:
+        render_cache.put(key, image)
+    return image
+
+
+render_executor = RenderExecutor()
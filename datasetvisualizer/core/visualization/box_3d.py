@@ -0,0 +1,203 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DEFAULT_BOX_3D_COLOR = (0, 255, 0, 255)
+
+# Signs of the 8 corners of a box relative to its center, in the order of the datasetinsights BBox3D points:
+# back left bottom, back left top, back right top, back right bottom, then the same 4 corners at the front
+_CORNER_SIGNS = np.array(
+    [
+        [-1, -1, -1],
+        [-1, 1, -1],
+        [1, 1, -1],
+        [1, -1, -1],
+        [-1, -1, 1],
+        [-1, 1, 1],
+        [1, 1, 1],
+        [1, -1, 1],
+    ],
+    dtype=np.float64,
+)
+
+# Pairs of corners joined by the 12 edges of a box: back face, front face, then the edges between them
+_EDGES = np.array(
+    [
+        [0, 1],
+        [1, 2],
+        [3, 2],
+        [0, 3],
+        [4, 5],
+        [5, 6],
+        [7, 6],
+        [4, 7],
+        [1, 5],
+        [2, 6],
+        [0, 4],
+        [3, 7],
+    ]
+)
+
+# Projected corners are clamped to this range so points close to the camera plane can't overflow OpenCV's int32
+_MAX_PIXEL = 1 << 24
+
+
+def quaternions_to_matrices(rotations: np.ndarray) -> np.ndarray:
+    """gets the rotation matrices of quaternions, quaternions are normalized like pyquaternion does before rotating
+
+    :param rotations: (n, 4) quaternions stored as (x, y, z, w)
+    :type rotations: np.ndarray
+    :return: (n, 3, 3) rotation matrices
+    :rtype: np.ndarray
+    """
+    q = np.asarray(rotations, dtype=np.float64).reshape(-1, 4)
+    norms = np.linalg.norm(q, axis=1, keepdims=True)
+    q = np.divide(q, norms, out=np.zeros_like(q), where=norms > 0)
+    x, y, z, w = q.T
+
+    # Homogeneous form of the rotation matrix, the zero quaternion maps every vector to zero like pyquaternion
+    matrices = np.empty((len(q), 3, 3))
+    matrices[:, 0, 0] = w * w + x * x - y * y - z * z
+    matrices[:, 0, 1] = 2 * (x * y - w * z)
+    matrices[:, 0, 2] = 2 * (x * z + w * y)
+    matrices[:, 1, 0] = 2 * (x * y + w * z)
+    matrices[:, 1, 1] = w * w - x * x + y * y - z * z
+    matrices[:, 1, 2] = 2 * (y * z - w * x)
+    matrices[:, 2, 0] = 2 * (x * z - w * y)
+    matrices[:, 2, 1] = 2 * (y * z + w * x)
+    matrices[:, 2, 2] = w * w - x * x - y * y + z * z
+    return matrices
+
+
+def get_corners(
+    translations: np.ndarray, sizes: np.ndarray, rotations: np.ndarray
+) -> np.ndarray:
+    """gets the corners of 3D boxes in camera coordinates with one batched rotation
+
+    :param translations: (n, 3) centers of the boxes
+    :type translations: np.ndarray
+    :param sizes: (n, 3) sizes of the boxes
+    :type sizes: np.ndarray
+    :param rotations: (n, 4) quaternions stored as (x, y, z, w)
+    :type rotations: np.ndarray
+    :return: (n, 8, 3) corners
+    :rtype: np.ndarray
+    """
+    translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 3)
+    local = _CORNER_SIGNS[np.newaxis] * (sizes[:, np.newaxis] / 2)
+    matrices = quaternions_to_matrices(rotations)
+    return np.einsum("nij,nkj->nki", matrices, local) + translations[:, np.newaxis]
+
+
+def project_points(
+    points: np.ndarray,
+    projection: np.ndarray,
+    width: int,
+    height: int,
+    orthographic: bool = False,
+) -> np.ndarray:
+    """Projects points in camera coordinates to pixels with one matmul, the same way datasetinsights projects them
+
+    :param points: (..., 3) points
+    :type points: np.ndarray
+    :param projection: 3x3 projection matrix of the camera
+    :type projection: np.ndarray
+    :param width: width of the image in pixels
+    :type width: int
+    :param height: height of the image in pixels
+    :type height: int
+    :param orthographic: True if the camera is orthographic, else perspective
+    :type orthographic: bool
+    :return: (..., 2) int32 pixel coordinates
+    :rtype: np.ndarray
+    """
+    projection = np.asarray(projection, dtype=np.float64)
+    if orthographic:
+        # The 'y' component needs to be flipped because of how Unity works
+        projection = np.diag([projection[0, 0], -projection[1, 1], projection[2, 2]])
+    projected = points @ projection.T
+
+    if orthographic:
+        x = (projected[..., 0] + 1) * 0.5 * width
+        y = (projected[..., 1] + 1) * 0.5 * height
+    else:
+        depth = projected[..., 2]
+        depth = np.where(depth != 0, depth, 1)
+        x = -(projected[..., 0] / depth * width) / 2.0 + width * 0.5
+        y = (projected[..., 1] / depth * height) / 2.0 + height * 0.5
+
+    # Truncated toward zero like the int() of datasetinsights
+    pixels = np.trunc(np.stack([x, y], axis=-1))
+    return np.clip(np.nan_to_num(pixels), -_MAX_PIXEL, _MAX_PIXEL).astype(np.int32)
+
+
+def draw_boxes_3d(
+    image: Image.Image,
+    translations: np.ndarray,
+    sizes: np.ndarray,
+    rotations: np.ndarray,
+    projection: np.ndarray,
+    orthographic: bool = False,
+    colors: Optional[Sequence[Tuple[int, ...]]] = None,
+    line_width: int = 2,
+) -> Image.Image:
+    """Draws 3D boxes on an image, all the corners are projected at once and the edges of all the boxes that share a
+    color are drawn with one call
+
+    :param image: the PIL image
+    :type image: PIL.Image
+    :param translations: (n, 3) centers of the boxes in camera coordinates
+    :type translations: np.ndarray
+    :param sizes: (n, 3) sizes of the boxes
+    :type sizes: np.ndarray
+    :param rotations: (n, 4) quaternions stored as (x, y, z, w)
+    :type rotations: np.ndarray
+    :param projection: 3x3 projection matrix of the camera
+    :type projection: np.ndarray
+    :param orthographic: True if the camera is orthographic, else perspective
+    :type orthographic: bool
+    :param colors: Optional, RGBA color of every box, green if None
+    :type colors: Sequence[Tuple[int, ...]]
+    :param line_width: width of the edges in pixels
+    :type line_width: int
+    :return: a new image with the boxes drawn on it
+    :rtype: PIL.Image
+    """
+    np_image = np.array(image)
+    if len(translations) == 0:
+        return Image.fromarray(np_image)
+
+    height, width = np_image.shape[:2]
+    corners = get_corners(translations, sizes, rotations)
+    pixels = project_points(corners, projection, width, height, orthographic)
+    # (n, 12, 2, 2): the two end points of every edge of every box
+    edges = pixels[:, _EDGES]
+
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for i in range(len(edges)):
+        color = DEFAULT_BOX_3D_COLOR if colors is None else tuple(colors[i])
+        groups.setdefault(color, []).append(i)
+
+    for color, indices in groups.items():
+        lines = edges[indices].reshape(-1, 2, 2)
+        cv2.polylines(np_image, list(lines), False, color, line_width)
+    return Image.fromarray(np_image)
+
+
+def legacy_boxes_to_arrays(
+    values: List[Dict[str, Any]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """gets the translations, sizes and (x, y, z, w) rotations of legacy 3D bounding box annotation values"""
+    translations = np.array(
+        [[b["translation"][k] for k in "xyz"] for b in values], dtype=np.float64
+    ).reshape(-1, 3)
+    sizes = np.array(
+        [[b["size"][k] for k in "xyz"] for b in values], dtype=np.float64
+    ).reshape(-1, 3)
+    rotations = np.array(
+        [[b["rotation"][k] for k in "xyzw"] for b in values], dtype=np.float64
+    ).reshape(-1, 4)
+    return translations, sizes, rotations
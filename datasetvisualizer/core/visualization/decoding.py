@@ -0,0 +1,119 @@
+import math
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from datasetvisualizer.core.caching import decoded_cache
+
+# Scales libjpeg can decode at directly, PIL's reduce can use any integer factor but these keep both paths aligned
+REDUCTION_FACTORS = (8, 4, 2)
+
+# Modes Image.reduce and the resampling of thumbnail don't support, by the mode the image is converted to first
+RESAMPLED_MODES = {"1": "L", "I;16": "I", "I;16L": "I", "I;16B": "I", "I;16N": "I"}
+
+
+def get_reduction_factor(size: Tuple[int, int], max_size: int) -> int:
+    """gets the largest reduction factor that still leaves the longest side of the image at least max_size
+
+    :param size: (width, height) of the full image
+    :type size: Tuple[int, int]
+    :param max_size: the maximum width and height the image will be displayed at
+    :type max_size: int
+    :return: 1 if the image can't be reduced, otherwise 2, 4 or 8
+    :rtype: int
+    """
+    longest = max(size)
+    for factor in REDUCTION_FACTORS:
+        if longest // factor >= max_size:
+            return factor
+    return 1
+
+
+def to_resampled_mode(image: Image.Image) -> Image.Image:
+    """gets the image in a mode that can be reduced and resampled, palette images are converted to RGB or RGBA"""
+    if image.mode == "P":
+        return image.convert("RGBA" if "transparency" in image.info else "RGB")
+    if image.mode in RESAMPLED_MODES:
+        return image.convert(RESAMPLED_MODES[image.mode])
+    return image
+
+
+def open_image(
+    filename: str, max_size: Optional[int] = None
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Opens an image fitted in a max_size square, decoding it at the lowest resolution that still fits max_size.
+
+    JPEG images are decoded directly at 1/2, 1/4 or 1/8 of their size with DCT scaling. Other formats can't be
+    decoded at a lower resolution, they are decoded fully and reduced by an integer factor with a box filter, which
+    is cheaper than resampling the full image. The reduced image is then resampled to fit max_size. When the decoded
+    frame cache is enabled, decoded images are read back from it instead.
+
+    :param filename: path to the image
+    :type filename: str
+    :param max_size: Optional, the maximum width and height of the returned image, the image is not resized if None
+    :type max_size: int
+    :return: (image, (width, height) of the full image), the full size is needed to scale pixel coordinates
+    :rtype: Tuple[PIL.Image, Tuple[int, int]]
+    """
+    image = Image.open(filename)
+    full_size = image.size
+    key = (
+        decoded_cache.make_key(filename, ("max", max_size))
+        if decoded_cache.enabled
+        else None
+    )
+    if key is not None:
+        cached = decoded_cache.get(key)
+        if cached is not None:
+            return cached, full_size
+    if max_size is None:
+        if key is not None:
+            image.load()
+            decoded_cache.put(key, image)
+        return image, full_size
+
+    if max(full_size) > max_size:
+        image = to_resampled_mode(image)
+    factor = get_reduction_factor(full_size, max_size)
+    if factor > 1:
+        reduced_size = (
+            math.ceil(full_size[0] / factor),
+            math.ceil(full_size[1] / factor),
+        )
+        if image.format == "JPEG":
+            image.draft(image.mode, reduced_size)
+        else:
+            image = image.reduce(factor)
+    image.thumbnail((max_size, max_size))
+    if key is not None:
+        decoded_cache.put(key, image)
+    return image, full_size
+
+
+def open_mask(filename: str, size: Tuple[int, int]) -> Image.Image:
+    """Opens a segmentation mask resized to size with nearest neighbor, so label colors are never blended
+
+    :param filename: path to the mask
+    :type filename: str
+    :param size: (width, height) of the image the mask is drawn on
+    :type size: Tuple[int, int]
+    :return: the mask
+    :rtype: PIL.Image
+    """
+    key = (
+        decoded_cache.make_key(filename, ("size", *size))
+        if decoded_cache.enabled
+        else None
+    )
+    if key is not None:
+        cached = decoded_cache.get(key)
+        if cached is not None:
+            return cached
+
+    mask = Image.open(filename)
+    if mask.size != tuple(size):
+        mask = mask.resize(size, Image.NEAREST)
+    if key is not None:
+        mask.load()
+        decoded_cache.put(key, mask)
+    return mask
@@ -0,0 +1,135 @@
+import io
+from typing import Dict, Hashable, Optional, Tuple
+
+from PIL import Image
+
+from datasetvisualizer.core.caching import encoded_cache
+
+GRID_VIEW = "grid"
+ZOOM_VIEW = "zoom"
+
+FORMATS = ("jpeg", "webp", "png")
+SUBSAMPLINGS = ("4:4:4", "4:2:2", "4:2:0")
+
+# Streamlit decodes, resizes and encodes again the images wider than this that are shown at the width of their column
+TRANSPORT_MAX_WIDTH = 1460
+
+
+class EncodingSettings:
+    """How the frames of a view are encoded before they are sent to the browser.
+
+    JPEG and WebP are much smaller than the PNG images Streamlit creates from PIL images. The chroma subsampling only
+    applies to JPEG, 4:4:4 keeps the thin colored lines of the labelers sharp, WebP always uses 4:2:0. The quality is
+    ignored for PNG, which is lossless.
+    """
+
+    def __init__(
+        self, format: str = "jpeg", quality: int = 90, subsampling: str = "4:4:4"
+    ):
+        """
+        :param format: one of FORMATS
+        :type format: str
+        :param quality: quality from 1 to 100 of JPEG and WebP
+        :type quality: int
+        :param subsampling: one of SUBSAMPLINGS, the chroma subsampling of JPEG
+        :type subsampling: str
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported format {format}, expected one of {FORMATS}")
+        if subsampling not in SUBSAMPLINGS:
+            raise ValueError(
+                f"Unsupported subsampling {subsampling}, expected one of {SUBSAMPLINGS}"
+            )
+        self.format = format
+        self.quality = max(1, min(100, quality))
+        self.subsampling = subsampling
+
+    @property
+    def key(self) -> Tuple[str, int, str]:
+        return self.format, self.quality, self.subsampling
+
+    @property
+    def mimetype(self) -> str:
+        return f"image/{self.format}"
+
+
+# Thumbnails of the grid are small lossy images, the frame of the zoom view is lossless by default and can be made
+# lossy with --zoom-format
+view_encodings: Dict[str, EncodingSettings] = {
+    GRID_VIEW: EncodingSettings("jpeg", 85, "4:4:4"),
+    ZOOM_VIEW: EncodingSettings("png", 95, "4:4:4"),
+}
+
+# The zoom view keeps the resolution of the rendered frame so it can be inspected at full size
+view_max_widths: Dict[str, Optional[int]] = {
+    GRID_VIEW: TRANSPORT_MAX_WIDTH,
+    ZOOM_VIEW: None,
+}
+
+
+def set_view_encoding(view: str, settings: EncodingSettings):
+    view_encodings[view] = settings
+
+
+def encode_image(
+    image: Image.Image,
+    settings: EncodingSettings,
+    max_width: Optional[int] = TRANSPORT_MAX_WIDTH,
+) -> bytes:
+    """Encodes the image with the settings, images wider than max_width are downscaled to it first
+
+    :param image: The image
+    :type image: PIL.Image
+    :param settings: format, quality and chroma subsampling of the encoded image
+    :type settings: EncodingSettings
+    :param max_width: Optional (Default: TRANSPORT_MAX_WIDTH), the image is never downscaled if None
+    :type max_width: int
+    :return: the encoded image
+    :rtype: bytes
+    """
+    if max_width is not None and image.width > max_width:
+        image = image.resize(
+            (max_width, round(image.height * max_width / image.width)),
+            Image.BILINEAR,
+        )
+
+    buffer = io.BytesIO()
+    if settings.format == "png":
+        image.save(buffer, format="PNG")
+    elif settings.format == "webp":
+        image.save(buffer, format="WEBP", quality=settings.quality, method=0)
+    else:
+        image.convert("RGB").save(
+            buffer,
+            format="JPEG",
+            quality=settings.quality,
+            subsampling=settings.subsampling,
+        )
+    return buffer.getvalue()
+
+
+def encode_frame(
+    image: Image.Image, view: str, key: Optional[Hashable] = None
+) -> bytes:
+    """Encodes a rendered frame with the settings and at the maximum width of the view it is shown in
+
+    :param image: The rendered frame
+    :type image: PIL.Image
+    :param view: GRID_VIEW or ZOOM_VIEW
+    :type view: str
+    :param key: Optional, render key of the frame, the encoded frame is cached with it
+    :type key: Hashable
+    :return: the encoded frame, st.image sends it to the browser without encoding it again
+    :rtype: bytes
+    """
+    settings = view_encodings[view]
+    max_width = view_max_widths.get(view, TRANSPORT_MAX_WIDTH)
+    if key is None:
+        return encode_image(image, settings, max_width)
+
+    cache_key = (key, settings.key, max_width)
+    data = encoded_cache.get(cache_key)
+    if data is None:
+        data = encode_image(image, settings, max_width)
+        encoded_cache.put(cache_key, data)
+    return data
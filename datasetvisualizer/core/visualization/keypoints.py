@@ -0,0 +1,258 @@
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from datasetvisualizer.core.caching import LRUCache
+
+DEFAULT_BONE_COLOR = (255, 0, 255, 255)
+DEFAULT_JOINT_COLOR = (0, 0, 255, 255)
+VISIBLE_STATE = 2
+COLOR_TABLES_CACHE_ENTRIES = 64
+# Coordinates are clamped to this range so keypoints far out of the image can't overflow OpenCV's int32
+_MAX_PIXEL = 1 << 24
+
+
+class KeypointColors:
+    """Bones and colors of a keypoint template as arrays, built once per template.
+
+    joint_colors has one more row than the template has keypoints, it holds the default color used for keypoints
+    whose index is not in the template.
+    """
+
+    def __init__(
+        self, bones: np.ndarray, bone_colors: np.ndarray, joint_colors: np.ndarray
+    ):
+        self.bones = bones
+        self.bone_colors = bone_colors
+        self.joint_colors = joint_colors
+
+    def get_joint_colors(self, indices: np.ndarray) -> np.ndarray:
+        """gets the colors of keypoints from their indices in the template
+
+        :param indices: keypoint indices of any shape, -1 for keypoints without an index
+        :type indices: np.ndarray
+        :return: colors with the shape of indices plus the 4 RGBA channels
+        :rtype: np.ndarray
+        """
+        num_joints = len(self.joint_colors) - 1
+        valid = (indices >= 0) & (indices < num_joints)
+        return self.joint_colors[np.where(valid, indices, num_joints)]
+
+    @staticmethod
+    def from_template(
+        template: Dict[str, Any],
+        keypoints_key: str,
+        color_from_node: Callable[[Any], Sequence[int]],
+    ) -> "KeypointColors":
+        skeleton = template.get("skeleton", [])
+        bones = np.array(
+            [[bone["joint1"], bone["joint2"]] for bone in skeleton], dtype=np.int64
+        ).reshape(-1, 2)
+        bone_colors = np.array(
+            [
+                (
+                    color_from_node(bone["color"])
+                    if "color" in bone
+                    else DEFAULT_BONE_COLOR
+                )
+                for bone in skeleton
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 4)
+
+        joint_colors = [
+            color_from_node(node["color"]) if "color" in node else DEFAULT_JOINT_COLOR
+            for node in template.get(keypoints_key, [])
+        ]
+        joint_colors.append(DEFAULT_JOINT_COLOR)
+        return KeypointColors(
+            bones, bone_colors, np.array(joint_colors, dtype=np.int64).reshape(-1, 4)
+        )
+
+
+def _solo_color(color: Sequence[Any]) -> Sequence[int]:
+    return [int(c) for c in color[:4]]
+
+
+def _legacy_color(color: Dict[str, float]) -> Sequence[int]:
+    return [int(color[c] * 255) for c in "rgba"]
+
+
+_color_tables = LRUCache(max_entries=COLOR_TABLES_CACHE_ENTRIES)
+
+
+def _get_color_table(
+    template: Dict[str, Any],
+    keypoints_key: str,
+    color_from_node: Callable[[Any], Sequence[int]],
+) -> KeypointColors:
+    # Cached entries keep a reference to their template so that its id can't be reused by another template
+    cached = _color_tables.get(id(template))
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    table = KeypointColors.from_template(template, keypoints_key, color_from_node)
+    _color_tables.put(id(template), (template, table))
+    return table
+
+
+def get_solo_colors(template: Dict[str, Any]) -> KeypointColors:
+    """gets the color table of a SOLO keypoint template, colors are [r, g, b, a] lists in 0..255"""
+    return _get_color_table(template, "keypoints", _solo_color)
+
+
+def get_legacy_colors(template: Dict[str, Any]) -> KeypointColors:
+    """gets the color table of a legacy keypoint template, colors are {r, g, b, a} dicts in 0..1"""
+    return _get_color_table(template, "key_points", _legacy_color)
+
+
+def draw_keypoints(
+    image: Union[Image.Image, np.ndarray],
+    locations: np.ndarray,
+    states: np.ndarray,
+    indices: np.ndarray,
+    colors: KeypointColors,
+    visual_width: int = 6,
+) -> Union[Image.Image, np.ndarray]:
+    """Draws the visible joints and bones of figures on an image in place.
+
+    Visibility, coordinates and colors of every bone and joint are computed with NumPy for all the figures at once.
+    The bones of all the figures that share a color are drawn with one call, then the joints the same way, so the
+    number of drawing calls depends on the number of colors of the template and not on the number of figures. Joints
+    are drawn as dots as wide as the bones. Bones are drawn before joints like datasetinsights does, the joints of a
+    figure are drawn over the bones of the figures drawn after it, which datasetinsights doesn't do.
+
+    OpenCV draws on arrays, a PIL image is converted to an array and back around the region the figures cover, an
+    array canvas is drawn on directly.
+
+    :param image: the PIL image or (height, width[, channels]) uint8 array, modified in place
+    :type image: Union[PIL.Image, np.ndarray]
+    :param locations: (figures, joints, 2) pixel coordinates of the keypoints
+    :type locations: np.ndarray
+    :param states: (figures, joints) states of the keypoints, only keypoints with state 2 are drawn
+    :type states: np.ndarray
+    :param indices: (figures, joints) indices of the keypoints in the template, -1 if they have no index
+    :type indices: np.ndarray
+    :param colors: color table of the template of the figures
+    :type colors: KeypointColors
+    :param visual_width: width of the bones and diameter of the joints
+    :type visual_width: int
+    :return: image
+    :rtype: Union[PIL.Image, np.ndarray]
+    """
+    num_figures, num_joints = states.shape[:2]
+    if num_figures == 0 or num_joints == 0:
+        return image
+
+    locations = np.asarray(locations, dtype=np.float64)
+    is_array = isinstance(image, np.ndarray)
+    size = (image.shape[1], image.shape[0]) if is_array else image.size
+    visible = states == VISIBLE_STATE
+
+    bones = colors.bones
+    in_figure = (bones < num_joints).all(axis=1)
+    bones = bones[in_figure]
+    # (figures, bones, 4): x1, y1, x2, y2 truncated like int()
+    bone_lines = np.trunc(
+        np.concatenate([locations[:, bones[:, 0]], locations[:, bones[:, 1]]], axis=2)
+    )
+    bone_visible = visible[:, bones[:, 0]] & visible[:, bones[:, 1]]
+    bone_visible &= _overlaps_image(bone_lines, visual_width, size)
+    bone_colors = np.broadcast_to(
+        colors.bone_colors[in_figure], bone_visible.shape + (4,)
+    )
+
+    half_width = visual_width / 2
+    joint_boxes = np.concatenate(
+        [locations - half_width, locations + half_width], axis=2
+    )
+    visible &= _overlaps_image(joint_boxes, visual_width, size)
+    # A line from a joint to itself is a dot as wide as the line
+    joint_lines = np.round(np.concatenate([locations, locations], axis=2))
+    joint_colors = colors.get_joint_colors(indices)
+
+    groups = (
+        (bone_lines[bone_visible], bone_colors[bone_visible]),
+        (joint_lines[visible], joint_colors[visible]),
+    )
+    lines = np.concatenate([lines for lines, _ in groups])
+    if len(lines) == 0:
+        return image
+
+    if is_array:
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        for lines, line_colors in groups:
+            _draw_lines(image, lines, line_colors, channels, visual_width)
+        return image
+
+    # Only the region the figures are drawn in is copied to an array and back
+    margin = visual_width + 1
+    xs = lines[:, [0, 2]]
+    ys = lines[:, [1, 3]]
+    box = (
+        max(0, int(xs.min()) - margin),
+        max(0, int(ys.min()) - margin),
+        min(image.width, int(xs.max()) + margin + 1),
+        min(image.height, int(ys.max()) + margin + 1),
+    )
+    np_image = np.array(image.crop(box))
+    channels = 1 if np_image.ndim == 2 else np_image.shape[2]
+    offset = np.array([box[0], box[1], box[0], box[1]], dtype=np.float64)
+    for lines, line_colors in groups:
+        _draw_lines(np_image, lines - offset, line_colors, channels, visual_width)
+    image.paste(Image.fromarray(np_image), box[:2])
+    return image
+
+
+def _draw_lines(
+    np_image: np.ndarray,
+    lines: np.ndarray,
+    line_colors: np.ndarray,
+    channels: int,
+    width: int,
+):
+    """Draws (n, 4) x1, y1, x2, y2 lines of (n, 4) RGBA colors with one call per color"""
+    if len(lines) == 0:
+        return
+    # Points far out of the image can't overflow the int32 coordinates of OpenCV
+    points = np.clip(lines, -_MAX_PIXEL, _MAX_PIXEL).astype(np.int32).reshape(-1, 2, 2)
+    unique_colors, groups = np.unique(line_colors, axis=0, return_inverse=True)
+    groups = groups.reshape(-1)
+    for group, color in enumerate(unique_colors.tolist()):
+        cv2.polylines(
+            np_image,
+            list(points[groups == group]),
+            False,
+            tuple(color[:channels]),
+            width,
+        )
+
+
+def _overlaps_image(boxes: np.ndarray, margin: float, size) -> np.ndarray:
+    # Shapes entirely outside of the image don't draw anything and are skipped
+    width, height = size
+    x_min = np.minimum(boxes[..., 0], boxes[..., 2])
+    x_max = np.maximum(boxes[..., 0], boxes[..., 2])
+    y_min = np.minimum(boxes[..., 1], boxes[..., 3])
+    y_max = np.maximum(boxes[..., 1], boxes[..., 3])
+    return (
+        (x_max >= -margin)
+        & (x_min <= width + margin)
+        & (y_max >= -margin)
+        & (y_min <= height + margin)
+    )
+
+
+def legacy_figures_to_arrays(figures: List[Dict[str, Any]]):
+    """gets the (locations, states, indices) arrays of legacy keypoint figures, padded like KeypointFigures"""
+    num_joints = max((len(f["keypoints"]) for f in figures), default=0)
+    locations = np.zeros((len(figures), num_joints, 2), dtype=np.float64)
+    states = np.zeros((len(figures), num_joints), dtype=np.int32)
+    indices = np.full((len(figures), num_joints), -1, dtype=np.int32)
+    for f, figure in enumerate(figures):
+        for j, k in enumerate(figure["keypoints"]):
+            locations[f, j] = (k["x"], k["y"])
+            states[f, j] = k["state"]
+            indices[f, j] = k.get("index", -1)
+    return locations, states, indices
@@ -0,0 +1,180 @@
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from datasetvisualizer.core.caching import LRUCache
+from datasetvisualizer.core.frame_server import publish_frame
+from datasetvisualizer.core.rendering import RenderGeneration, render_executor
+from datasetvisualizer.core.visualization.encoding import (
+    GRID_VIEW,
+    encode_image,
+    view_encodings,
+)
+
+# Width of the composited page, frames are rendered at the width of a tile so they are never downscaled twice
+MOSAIC_WIDTH = 1800
+MOSAIC_PADDING = 8
+CAPTION_HEIGHT = 20
+MOSAIC_BACKGROUND = (251, 251, 251)
+CAPTION_COLOR = (38, 38, 41)
+MOSAIC_CACHE_ENTRIES = 16
+
+# (frame index, (left, top, right, bottom)) of a frame in the mosaic
+Tile = Tuple[int, Tuple[int, int, int, int]]
+
+
+def get_tile_width(num_cols: int, width: int = MOSAIC_WIDTH) -> int:
+    """gets the width of the frames of a mosaic with num_cols frames per row
+
+    :param num_cols: number of frames per row
+    :type num_cols: int
+    :param width: Optional, width of the mosaic
+    :type width: int
+    :return: width of a tile without its padding
+    :rtype: int
+    """
+    return max(1, width // max(1, num_cols) - 2 * MOSAIC_PADDING)
+
+
+def compose_mosaic(
+    frames: Dict[int, Image.Image],
+    indices: List[int],
+    num_cols: int,
+    captions: Optional[Dict[int, str]] = None,
+    width: int = MOSAIC_WIDTH,
+) -> Tuple[Image.Image, List[Tile]]:
+    """Composites the frames of a grid page into a single image, left to right and top to bottom
+
+    Every tile has the aspect ratio of the first frame, frames with another aspect ratio are fitted in their tile.
+
+    :param frames: rendered frames by index
+    :type frames: Dict[int, PIL.Image]
+    :param indices: indices of the frames in the order they are laid out, indices without a frame leave an empty tile
+    :type indices: List[int]
+    :param num_cols: number of frames per row
+    :type num_cols: int
+    :param captions: Optional, caption drawn under each frame by index
+    :type captions: Dict[int, str]
+    :param width: Optional, width of the mosaic
+    :type width: int
+    :return: (mosaic, tiles) where tiles holds the index and the box of every frame in the mosaic
+    :rtype: Tuple[PIL.Image, List[Tile]]
+    """
+    num_cols = max(1, num_cols)
+    tile_width = get_tile_width(num_cols, width)
+    first = next((frames[i] for i in indices if i in frames), None)
+    tile_height = tile_width
+    if first is not None:
+        tile_height = max(1, round(tile_width * first.height / first.width))
+
+    caption_height = CAPTION_HEIGHT if captions is not None else 0
+    cell_width = tile_width + 2 * MOSAIC_PADDING
+    cell_height = tile_height + caption_height + 2 * MOSAIC_PADDING
+    num_rows = (len(indices) + num_cols - 1) // num_cols
+    mosaic = Image.new(
+        "RGB",
+        (cell_width * num_cols, max(1, cell_height * num_rows)),
+        MOSAIC_BACKGROUND,
+    )
+    draw = ImageDraw.Draw(mosaic)
+
+    tiles = []
+    for position, index in enumerate(indices):
+        left = (position % num_cols) * cell_width + MOSAIC_PADDING
+        top = (position // num_cols) * cell_height + MOSAIC_PADDING
+        frame = frames.get(index)
+        if frame is None:
+            continue
+
+        if frame.size != (tile_width, tile_height):
+            frame = frame.copy()
+            frame.thumbnail((tile_width, tile_height))
+        offset_x = left + (tile_width - frame.width) // 2
+        offset_y = top + (tile_height - frame.height) // 2
+        mosaic.paste(frame.convert("RGB"), (offset_x, offset_y))
+        tiles.append(
+            (
+                index,
+                (offset_x, offset_y, offset_x + frame.width, offset_y + frame.height),
+            )
+        )
+
+        if captions is not None and index in captions:
+            draw.text(
+                (left, top + tile_height + 4), captions[index], fill=CAPTION_COLOR
+            )
+
+    return mosaic, tiles
+
+
+def find_tile(tiles: List[Tile], x: float, y: float) -> Optional[int]:
+    """gets the index of the frame at the pixel (x, y) of the mosaic, None if the pixel isn't on a frame"""
+    for index, (left, top, right, bottom) in tiles:
+        if left <= x < right and top <= y < bottom:
+            return index
+    return None
+
+
+def to_data_uri(data: bytes, mimetype: str) -> str:
+    """gets an encoded image as a data uri, used to send the mosaic to the browser in a single message"""
+    return f"data:{mimetype};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+# Encoded mosaics of the last pages by the render keys of their frames, going back to a page or clicking on a frame
+# of the page doesn't composite and encode it again
+mosaic_cache = LRUCache(max_entries=MOSAIC_CACHE_ENTRIES)
+
+
+def render_mosaic(
+    ds: Any,
+    method: str,
+    indices: List[int],
+    num_cols: int,
+    captions: Optional[Dict[int, str]],
+    *args,
+    generation: Optional[RenderGeneration] = None,
+    **kwargs,
+) -> Optional[Tuple[str, List[Tile]]]:
+    """Renders the frames at indices with ds.<method>(index, *args, **kwargs) and composites them in a mosaic encoded
+    with the settings of the grid view
+
+    :param ds: The dataset, must provide get_render_key with the same arguments as method
+    :param method: name of the method of the dataset that renders a frame, e.g. "get_image_with_labelers"
+    :type method: str
+    :param indices: indices of the frames of the page
+    :type indices: List[int]
+    :param num_cols: number of frames per row
+    :type num_cols: int
+    :param captions: Optional, caption drawn under each frame by index
+    :type captions: Dict[int, str]
+    :param generation: Optional, the generation of the run of the script the frames are rendered for
+    :type generation: RenderGeneration
+    :return: (URL of the mosaic on the frame server or data uri if it isn't started, tiles) or None if the
+             generation was cancelled
+    :rtype: Tuple[str, List[Tile]]
+    """
+    settings = view_encodings[GRID_VIEW]
+    key = (
+        tuple(ds.get_render_key(index, *args, **kwargs) for index in indices),
+        num_cols,
+        tuple(sorted(captions.items())) if captions is not None else None,
+        settings.key,
+    )
+    mosaic = mosaic_cache.get(key)
+    if mosaic is None:
+        frames = dict(
+            render_executor.render_frames(
+                ds, method, indices, *args, generation=generation, **kwargs
+            )
+        )
+        if len(frames) < len(indices):
+            return None
+        image, tiles = compose_mosaic(frames, indices, num_cols, captions)
+        # Clicks are mapped to frames in pixels of the mosaic, it must keep its size
+        mosaic = encode_image(image, settings, max_width=None), tiles
+        mosaic_cache.put(key, mosaic)
+
+    data, tiles = mosaic
+    url = publish_frame(data, settings.mimetype)
+    return url if url is not None else to_data_uri(data, settings.mimetype), tiles
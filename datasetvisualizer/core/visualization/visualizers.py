@@ -1,74 +1,192 @@
-﻿import numpy as np
-from datasetinsights.datasets.synthetic import (
-    read_bounding_box_2d,
-    read_bounding_box_3d,
-)
-from datasetinsights.io.bbox import BBox2D, BBox3D
+﻿from typing import Union
+
+import numpy as np
+from datasetinsights.datasets.synthetic import read_bounding_box_2d
+from datasetinsights.io.bbox import BBox2D
+from datasetinsights.stats.visualization.bbox2d_plot import add_single_bbox_on_image
 from datasetinsights.stats.visualization.plots import (
+    FONT_SCALE,
+    LINE_WIDTH_SCALE,
     plot_bboxes,
-    plot_bboxes3d,
-    plot_keypoints,
 )
-from PIL import Image, ImageDraw
-from pyquaternion import Quaternion
+from PIL import Image
+
+from datasetvisualizer.core.visualization.box_3d import (
+    draw_boxes_3d,
+    legacy_boxes_to_arrays,
+)
+from datasetvisualizer.core.visualization.keypoints import (
+    draw_keypoints,
+    get_legacy_colors,
+    get_solo_colors,
+    legacy_figures_to_arrays,
+)
+
+DEFAULT_SEGMENTATION_OPACITY = 0.6
+
+# Sizes of the keypoints and 3D box lines datasetinsights draws at full resolution
+KEYPOINT_VISUAL_WIDTH = 6
+BOX_3D_LINE_WIDTH = 2
+
+
+def scale_width(width: float, scale: float) -> int:
+    """gets the width in pixels of a line or font drawn on an image resized by scale, at least 1"""
+    return max(1, int(round(width * scale)))
 
 
 def draw_legacy_image_with_boxes(
     image,
-    index,
-    catalog,
+    capture,
     label_mappings,
+    scale=(1.0, 1.0),
+    full_height=None,
 ):
-    cap = catalog.iloc[index]
-    ann = cap["annotation.values"]
-    capture = image
-    image = capture.convert("RGB")  # Remove alpha channel
+    """
+    Draws the 2D bounding boxes of a capture on an image that may have been resized from the captured image.
+
+    :param capture: capture row with an "annotation.values" column holding the boxes
+    :type pd.Series:
+    :param scale: (scale_x, scale_y) from the pixel coordinates of the capture to the pixels of image
+    :type tuple:
+    :param full_height: height of the captured image, line widths and fonts are sized from it like they would be at
+                        full resolution and then scaled, defaults to the height of image
+    :type int:
+    """
+    ann = capture["annotation.values"]
+    image = image.convert("RGB")  # Remove alpha channel
     bboxes = read_bounding_box_2d(ann, label_mappings)
-    return plot_bboxes(image, bboxes, label_mappings)
+    return _draw_bboxes(image, bboxes, label_mappings, scale, full_height)
 
 
 def draw_solo_image_with_boxes(
     image,
-    bbox_data,
+    boxes,
     label_mappings,
+    scale=(1.0, 1.0),
+    full_height=None,
 ):
+    """
+    Draws SOLO 2D bounding boxes on an image that may have been resized from the captured image.
+
+    :param boxes: boxes in the pixel coordinates of the captured image
+    :type BoundingBoxes2D:
+    :param scale: (scale_x, scale_y) from the pixel coordinates of the captured image to the pixels of image
+    :type tuple:
+    :param full_height: height of the captured image, line widths and fonts are sized from it like they would be at
+                        full resolution and then scaled, defaults to the height of image
+    :type int:
+    """
     img = image.convert("RGB")  # Remove alpha channel
-    bboxes = to_db_insights_bbox2d(bbox_data)
-    return plot_bboxes(img, bboxes, label_mappings)
+    bboxes = to_db_insights_bbox2d(boxes)
+    return _draw_bboxes(img, bboxes, label_mappings, scale, full_height)
+
+
+def _draw_bboxes(image, bboxes, label_mappings, scale, full_height):
+    if full_height is None:
+        return plot_bboxes(image, bboxes, label_mappings)
+
+    scale_x, scale_y = scale
+    font_size = scale_width(full_height // FONT_SCALE, scale_y)
+    box_line_width = scale_width(full_height // LINE_WIDTH_SCALE, scale_y)
+    np_image = np.array(image)
+    for box in bboxes:
+        label = label_mappings[box.label] if label_mappings is not None else box.label
+        scaled_box = BBox2D(
+            label=box.label,
+            x=box.x * scale_x,
+            y=box.y * scale_y,
+            w=box.w * scale_x,
+            h=box.h * scale_y,
+            score=box.score,
+        )
+        add_single_bbox_on_image(
+            np_image,
+            scaled_box,
+            label,
+            None,
+            font_size=font_size,
+            box_line_width=box_line_width,
+        )
+    return Image.fromarray(np_image)
 
 
 def draw_image_with_segmentation(
-    image: Image,
+    image: Union[Image.Image, np.ndarray],
     segmentation: Image,
+    opacity: float = DEFAULT_SEGMENTATION_OPACITY,
 ):
     """
-    Draws an image in streamlit with labels and bounding boxes.
+    Draws a segmentation image over an image. Black pixels of the segmentation are left out and the other pixels are
+    blended over the image with the given opacity, rounded like PIL's Image.paste with a mask.
 
-    :param image: the PIL image
-    :type PIL:
-    :param height: height of the image
-    :type int:
-    :param width: width of the image
-    :type int:
+    The segmentation is blended with NumPy into one output buffer. A PIL image is copied to an array once, callers
+    that draw several overlays can pass that (height, width, channels) uint8 array as the canvas instead, it is
+    blended into in place.
+
+    :param image: the PIL image, or the uint8 array of an RGB or RGBA image modified in place
+    :type Union[PIL, np.ndarray]:
     :param segmentation: Segmentation Image
     :type PIL:
-    :param header: Image header
-    :type str:
-    :param description: Image description
-    :type str:
+    :param opacity: opacity of the segmentation between 0 and 1
+    :type float:
+    :return: a new image with the segmentation drawn on it, or the array passed as image
+    :rtype: Union[PIL, np.ndarray]
     """
-    # image_draw = ImageDraw(segmentation)
-    rgba = np.array(segmentation.copy().convert("RGBA"))
-    r, g, b, a = rgba.T
-    black_areas = (r == 0) & (b == 0) & (g == 0) & (a == 255)
-    other_areas = (r != 0) | (b != 0) | (g != 0)
-    rgba[..., 0:4][black_areas.T] = (0, 0, 0, 0)
-    rgba[..., -1][other_areas.T] = int(0.6 * 255)
-
-    foreground = Image.fromarray(rgba)
-    image = image.copy()
-    image.paste(foreground, (0, 0), foreground)
-    return image
+    if isinstance(image, np.ndarray):
+        canvas = image
+    else:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        canvas = np.array(image)
+
+    # Like Image.paste, the segmentation covers the top left corner of the image
+    height = min(canvas.shape[0], segmentation.height)
+    width = min(canvas.shape[1], segmentation.width)
+    if segmentation.size != (width, height):
+        segmentation = segmentation.crop((0, 0, width, height))
+    if segmentation.mode != "RGBA":
+        segmentation = segmentation.convert("RGBA")
+    rgba = np.asarray(segmentation)
+    alpha = get_segmentation_alpha(rgba, opacity).astype(np.uint16)
+    inverse_alpha = 255 - alpha
+
+    # Channels are blended one at a time, 2D arrays avoid broadcasting the alpha over the channels
+    out = canvas[:height, :width]
+    for channel in range(canvas.shape[2]):
+        # The alpha channel of an RGBA image is blended towards the alpha of the segmentation, like Image.paste
+        source = alpha if channel == 3 else rgba[..., channel]
+        blended = out[..., channel] * inverse_alpha
+        blended += source * alpha
+        # Rounded division by 255, out * (255 - alpha) + source * alpha + 128 fits in 16 bits
+        blended += 128
+        blended += blended >> 8
+        blended >>= 8
+        out[..., channel] = blended
+
+    if isinstance(image, np.ndarray):
+        return canvas
+    return Image.fromarray(canvas, image.mode)
+
+
+def get_segmentation_alpha(rgba: np.ndarray, opacity: float) -> np.ndarray:
+    """
+    gets the alpha a segmentation is blended with. Pixels that aren't black get the alpha opacity * 255, opaque black
+    pixels are transparent and the other pixels keep their alpha.
+
+    :param rgba: (height, width, 4) contiguous uint8 array
+    :type np.ndarray:
+    :param opacity: opacity of the segmentation between 0 and 1
+    :type float:
+    :return: (height, width) uint8 alpha
+    :rtype: np.ndarray
+    """
+    # Each RGBA pixel is read as one little endian 32 bit integer, the color is in its low 24 bits
+    pixels = rgba.view("<u4")[..., 0]
+    colored = (pixels & 0x00FFFFFF) != 0
+    alpha = (pixels >> 24).astype(np.uint8)
+    alpha *= (alpha != 255) & ~colored
+    alpha += colored * np.uint8(int(np.clip(opacity, 0, 1) * 255))
+    return alpha
 
 
 def find_metadata_annotation_index(dataset, name):
@@ -77,195 +195,74 @@ def find_metadata_annotation_index(dataset, name):
             return idx
 
 
-def draw_legacy_image_with_keypoints(image, annotations, templates):
-    return plot_keypoints(image, annotations, templates)
-
-
-def draw_image_with_keypoints(image, annotations, templates):
-    return plot_keypoints_with_color(image, annotations, templates)
-
-
-def plot_keypoints_with_color(image, annotations, template, visual_width=6):
-    draw = ImageDraw.Draw(image)
-
-    for figure in annotations["values"]:
-        draw_keypoints_for_figure(image, figure, draw, template, visual_width)
-
-    return image
-
-
-def draw_keypoints_for_figure(image, figure, draw, template, visual_width=6):
-    # load the spec
-    if "skeleton" in template:
-        skeleton = template["skeleton"]
-
-        for bone in skeleton:
-            j1 = figure["keypoints"][bone["joint1"]]
-            j2 = figure["keypoints"][bone["joint2"]]
-
-            if (
-                "state" in j1
-                and j1["state"] == 2
-                and "state" in j2
-                and j2["state"] == 2
-            ):
-                x1 = int(j1["location"][0])
-                y1 = int(j1["location"][1])
-                x2 = int(j2["location"][0])
-                y2 = int(j2["location"][1])
-
-                color = _get_color_for_bone(bone)
-                draw.line((x1, y1, x2, y2), fill=color, width=visual_width)
-
-    for k in figure["keypoints"]:
-        if "state" in k and k["state"] == 2:
-            x = k["location"][0]
-            y = k["location"][1]
-
-            color = _get_color_for_keypoint(template, k)
-
-            half_width = visual_width / 2
-
-            draw.ellipse(
-                (
-                    x - half_width,
-                    y - half_width,
-                    x + half_width,
-                    y + half_width,
-                ),
-                fill=color,
-                outline=color,
+def draw_legacy_image_with_keypoints(image, annotations, templates, scale=(1.0, 1.0)):
+    scale_x, scale_y = scale
+    visual_width = KEYPOINT_VISUAL_WIDTH
+    if scale_x != 1 or scale_y != 1:
+        visual_width = scale_width(KEYPOINT_VISUAL_WIDTH, min(scale_x, scale_y))
+
+    templates_by_id = {template["template_id"]: template for template in templates}
+    locations, states, indices = legacy_figures_to_arrays(annotations)
+    locations *= (scale_x, scale_y)
+
+    # Consecutive figures of the same template are drawn with one call, figures without a known template are skipped
+    start = 0
+    while start < len(annotations):
+        template_id = annotations[start]["template_guid"]
+        end = start + 1
+        while (
+            end < len(annotations) and annotations[end]["template_guid"] == template_id
+        ):
+            end += 1
+        if template_id in templates_by_id:
+            draw_keypoints(
+                image,
+                locations[start:end],
+                states[start:end],
+                indices[start:end],
+                get_legacy_colors(templates_by_id[template_id]),
+                visual_width,
             )
-
+        start = end
     return image
 
 
-def _get_color_for_bone(bone):
-    """Gets the color for the bone from the template. A bone is a visual
-        connection between two keypoints in the keypoint list of the figure.
-
-        bone
-        {
-            joint1: <int> Index into the keypoint list for the first joint.
-            joint2: <int> Index into the keypoint list for the second joint.
-            color {
-                r: <float> Value (0..1) of the red channel.
-                g: <float> Value (0..1) of the green channel.
-                b: <float> Value (0..1) of the blue channel.
-                a: <float> Value (0..1) of the alpha channel.
-            }
-        }
-
-    Args:
-        bone: The active bone.
-
-    Returns: The color of the bone.
-
-    """
-    if "color" in bone:
-        return _get_color_from_color_node(bone["color"])
-    else:
-        return 255, 0, 255, 255
-
-
-def _get_color_for_keypoint(template, keypoint):
-    """Gets the color for the keypoint from the template. A keypoint is a
-        location of interest inside of a figure. Keypoints are connected
-        together with bones. The configuration of keypoint locations and bone
-        connections are defined in a template file.
-
-    keypoint_template {
-        template_id: <str> The UUID of the template.
-        template_name: <str> Human readable name of the template.
-        key_points [ <List> List of joints defined in this template
-            {
-                label: <str> The label of the joint.
-                index: <int> The index of the joint.
-                color {
-                    r: <float> Value (0..1) for the red channel.
-                    g: <float> Value (0..1) for the green channel.
-                    b: <float> Value (0..1) for the blue channel.
-                    a: <float> Value (0..1) for the alpha channel.
-                }
-            }, ...
-        ]
-        skeleton [ <List> List of skeletal connections
-            {
-                joint1: <int> The first joint of the connection.
-                joint2: <int> The second joint of the connection.
-                color {
-                    r: <float> Value (0..1) for the red channel.
-                    g: <float> Value (0..1) for the green channel.
-                    b: <float> Value (0..1) for the blue channel.
-                    a: <float> Value (0..1) for the alpha channel.
-                }
-            }, ...
-        ]
-    }
-
-    Args:
-        template: The active template.
-        keypoint: The active keypoint.
-
-    Returns: The color for the keypoint.
-
+def draw_image_with_keypoints(image, annotations, templates, scale=1.0):
     """
-    if "index" not in keypoint:
-        return 0, 0, 255, 255
-
-    node = template["keypoints"][keypoint["index"]]
-
-    if "color" in node:
-        return _get_color_from_color_node(node["color"])
-    else:
-        return 0, 0, 255, 255
-
-
-def _get_color_from_color_node(color):
-    """Gets the color from the color node in the template.
-
-    Args:
-        color (tuple): The color's channel values expressed in a range from 0..1
-
-    Returns: The color for the node.
+    Draws SOLO keypoints, the keypoints are sized like at full resolution and then scaled.
 
+    :param scale: scale from the captured image to image
+    :type float:
     """
-    r = color[0]
-    g = color[1]
-    b = color[2]
-    a = color[3]
-    return r, g, b, a
-
+    return plot_keypoints_with_color(
+        image, annotations, templates, scale_width(KEYPOINT_VISUAL_WIDTH, scale)
+    )
 
-def to_db_insights_bbox3d(boxes):
-    bboxes = []
-    for b in boxes["values"]:
-        trans = b["translation"]
-        size = b["size"]
-        r = b["rotation"]
-        rotation = Quaternion(r[3], r[0], r[1], r[2])
-        box = BBox3D(
-            translation=(trans[0], trans[1], trans[2]),
-            size=(size[0], size[1], size[2]),
-            label=b["labelId"],
-            sample_token=0,
-            score=1,
-            rotation=rotation,
-        )
-        bboxes.append(box)
 
-    return bboxes
+def plot_keypoints_with_color(
+    image, figures, template, visual_width=KEYPOINT_VISUAL_WIDTH
+):
+    return draw_keypoints(
+        image,
+        figures.locations,
+        figures.states,
+        figures.indices,
+        get_solo_colors(template),
+        visual_width,
+    )
 
 
 def to_db_insights_bbox2d(boxes):
     bboxes = []
-    for b in boxes["values"]:
+    for i in range(len(boxes)):
+        x, y = boxes.origins[i].tolist()
+        w, h = boxes.dimensions[i].tolist()
         box = BBox2D(
-            label=b["labelId"],
-            x=b["origin"][0],
-            y=b["origin"][1],
-            w=b["dimension"][0],
-            h=b["dimension"][1],
+            label=int(boxes.label_ids[i]),
+            x=x,
+            y=y,
+            w=w,
+            h=h,
             score=1,
         )
         bboxes.append(box)
@@ -273,35 +270,51 @@ def to_db_insights_bbox2d(boxes):
     return bboxes
 
 
-# TODO Implement colors
-def draw_image_with_box_3d(image, sensor, values, colors):
+def draw_image_with_box_3d(image, sensor, boxes_3d, colors, scale=1.0):
+    """
+    Draws SOLO 3D bounding boxes, the boxes are projected with the size of image so only the line width depends on
+    the scale of image relative to the captured image.
+
+    :param scale: scale from the captured image to image
+    :type float:
+    """
     i = sensor.matrix
     matrix = [[i[0], i[1], i[2]], [i[3], i[4], i[5]], [i[6], i[7], i[8]]]
     projection = np.array(matrix)
 
-    boxes = to_db_insights_bbox3d(values)
-    img_with_boxes = plot_bboxes3d(
+    return draw_boxes_3d(
         image,
-        boxes,
+        boxes_3d.translations,
+        boxes_3d.sizes,
+        boxes_3d.rotations,
         projection,
-        None,
         orthographic=(sensor.projection == "Orthographic"),
+        colors=colors,
+        line_width=scale_width(BOX_3D_LINE_WIDTH, scale),
     )
-    return img_with_boxes
 
 
-def draw_legacy_image_with_box_3d(image, sensor, values, colors):
+def draw_legacy_image_with_box_3d(image, sensor, values, colors, scale=1.0):
+    """
+    Draws 3D bounding boxes, the boxes are projected with the size of image so only the line width depends on the
+    scale of image relative to the captured image.
+
+    :param scale: scale from the captured image to image
+    :type float:
+    """
     if "camera_intrinsic" in sensor:
         projection = np.array(sensor["camera_intrinsic"])
     else:
         projection = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
 
-    boxes = read_bounding_box_3d(values)
-    img_with_boxes = plot_bboxes3d(
+    translations, sizes, rotations = legacy_boxes_to_arrays(values)
+    return draw_boxes_3d(
         image,
-        boxes,
+        translations,
+        sizes,
+        rotations,
         projection,
-        None,
         orthographic=(sensor["projection"] == "orthographic"),
+        colors=colors,
+        line_width=scale_width(BOX_3D_LINE_WIDTH, scale),
     )
-    return img_with_boxes
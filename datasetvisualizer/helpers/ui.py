@@ -2,11 +2,19 @@ import os
 import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import streamlit as st
+import streamlit.components.v1 as components
 from PIL import Image
 
+from datasetvisualizer.core.rendering import RenderGeneration
+from datasetvisualizer.core.visualization.mosaic import Tile, find_tile
+
+_mosaic_component = components.declare_component(
+    "mosaic", path=os.path.join(os.path.dirname(__file__), "mosaic")
+)
+
 
 class Components:
     @staticmethod
@@ -38,6 +46,26 @@ class Components:
             unsafe_allow_html=True,
         )
 
+    @staticmethod
+    def mosaic(image: str, tiles: List[Tile], key: str) -> Optional[int]:
+        """Shows a grid page composited into a single image, see render_mosaic
+
+        :param image: URL of the mosaic on the frame server or the mosaic encoded as a data uri
+        :type image: str
+        :param tiles: index and box of every frame in the mosaic
+        :type tiles: List[Tile]
+        :param key: key of the component
+        :type key: str
+        :return: index of the frame the user just clicked on, None if there was no new click
+        :rtype: int
+        """
+        click = _mosaic_component(image=image, key=key, default=None)
+        # The component keeps returning its last click on the following runs of the script
+        if click is None or click["time"] == st.session_state.get(f"{key}_click"):
+            return None
+        st.session_state[f"{key}_click"] = click["time"]
+        return find_tile(tiles, click["x"], click["y"])
+
     @staticmethod
     def draw_homepage():
         st.markdown("# Unity CV Dataset Visualizer")
@@ -121,6 +149,31 @@ class AppState:
     def get_labelers_changed():
         return st.session_state.labelers_changed
 
+    @staticmethod
+    def set_mosaic_grid(value: bool):
+        st.session_state.mosaic_grid = value
+
+    @staticmethod
+    def get_mosaic_grid() -> bool:
+        return st.session_state.mosaic_grid
+
+    @staticmethod
+    def start_render_generation() -> RenderGeneration:
+        """Starts the render generation of this run of the script, cancelling the renders of the previous run
+
+        :return: the generation the frames of this run are rendered in
+        :rtype: RenderGeneration
+        """
+        previous = st.session_state.get("render_generation")
+        if previous is not None:
+            previous.cancel()
+        st.session_state.render_generation = RenderGeneration()
+        return st.session_state.render_generation
+
+    @staticmethod
+    def get_render_generation() -> Optional[RenderGeneration]:
+        return st.session_state.get("render_generation")
+
     @staticmethod
     def get_dataset_view_range() -> [int, int]:
         if "dataset_size" not in st.session_state:
@@ -187,6 +240,7 @@ class AppState:
                 "semantic_existed_last_time": False,
                 "previous_labelers": {},
                 "labelers_changed": False,
+                "mosaic_grid": False,
             }
         )
 
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+from datasetinsights.io.bbox import BBox3D
+from datasetinsights.stats.visualization.plots import plot_bboxes3d
+from PIL import Image
+from pyquaternion import Quaternion
+
+from datasetvisualizer.core.visualization.box_3d import (
+    draw_boxes_3d,
+    get_corners,
+    quaternions_to_matrices,
+)
+
+
+class TestBox3D(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 20
+        self.translations = np.c_[rng.uniform(-3, 3, (n, 2)), rng.uniform(5, 20, n)]
+        self.sizes = rng.uniform(0.5, 2, (n, 3))
+        self.rotations = rng.normal(size=(n, 4))
+        self.image = Image.new("RGB", (320, 240))
+
+    def _to_bboxes(self):
+        return [
+            BBox3D(
+                translation=tuple(t),
+                size=tuple(s),
+                label=0,
+                sample_token=0,
+                rotation=Quaternion(r[3], r[0], r[1], r[2]),
+            )
+            for t, s, r in zip(self.translations, self.sizes, self.rotations)
+        ]
+
+    def test_corners_match_datasetinsights(self):
+        corners = get_corners(self.translations, self.sizes, self.rotations)
+        for box, box_corners in zip(self._to_bboxes(), corners):
+            expected = [
+                box.back_left_bottom_pt,
+                box.back_left_top_pt,
+                box.back_right_top_pt,
+                box.back_right_bottom_pt,
+                box.front_left_bottom_pt,
+                box.front_left_top_pt,
+                box.front_right_top_pt,
+                box.front_right_bottom_pt,
+            ]
+            np.testing.assert_allclose(box_corners, expected, atol=1e-9)
+
+    def test_zero_quaternion(self):
+        assert not quaternions_to_matrices(np.zeros((1, 4))).any()
+
+    def test_drawing_matches_datasetinsights(self):
+        perspective = np.array([[1.7, 0, 0], [0, 3.0, 0], [0, 0, -1.0]])
+        orthographic = np.array([[0.1, 0, 0], [0, 0.18, 0], [0, 0, -0.01]])
+        for projection, is_orthographic in ((perspective, False), (orthographic, True)):
+            expected = plot_bboxes3d(
+                self.image,
+                self._to_bboxes(),
+                projection,
+                None,
+                orthographic=is_orthographic,
+            )
+            actual = draw_boxes_3d(
+                self.image,
+                self.translations,
+                self.sizes,
+                self.rotations,
+                projection,
+                orthographic=is_orthographic,
+            )
+            assert np.array_equal(np.asarray(expected), np.asarray(actual))
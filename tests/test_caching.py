@@ -0,0 +1,116 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from PIL import Image
+
+from datasetvisualizer.core.caching import DatasetCache, LRUCache, RenderCache
+
+
+class FakeDataset:
+    opened = 0
+
+    @staticmethod
+    def get_definition_files(data_root):
+        return [os.path.join(data_root, "definitions.json")]
+
+    def __init__(self, data_root):
+        FakeDataset.opened += 1
+        self.data_root = data_root
+        self.dataset_valid = True
+
+
+class FakeStampedDataset(FakeDataset):
+    stamps = [0]
+
+    @staticmethod
+    def get_dataset_stamps(data_root):
+        return list(FakeStampedDataset.stamps)
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used_entry(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.keys() == ["a", "c"]
+
+    def test_byte_budget(self):
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.put("a", b"12345")
+        cache.put("b", b"123456")
+        cache.put("c", b"12345678901")
+
+        assert cache.keys() == ["b"]
+        assert cache.current_bytes == 6
+
+
+class DatasetCacheTests(TestCase):
+    def test_reuses_dataset_until_definitions_change(self):
+        cache = DatasetCache(max_entries=2)
+        with tempfile.TemporaryDirectory() as data_root:
+            definitions = os.path.join(data_root, "definitions.json")
+            with open(definitions, "w") as f:
+                f.write("{}")
+            FakeDataset.opened = 0
+
+            first = cache.get_dataset(data_root, FakeDataset)
+            assert cache.get_dataset(data_root, FakeDataset) is first
+            assert FakeDataset.opened == 1
+
+            stat = os.stat(definitions)
+            os.utime(definitions, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            second = cache.get_dataset(data_root, FakeDataset)
+            assert second is not first
+            assert FakeDataset.opened == 2
+            assert len(cache.entries) == 1
+            assert second.dataset_key[:2] == first.dataset_key[:2]
+            assert second.dataset_key[2] != first.dataset_key[2]
+            assert len(second.dataset_key[2]) == 40
+
+            key = RenderCache.make_key(second, 0, ["keypoints"], 300)
+            assert key == (second.dataset_digest, 0, ("keypoints",), 300)
+            assert key != RenderCache.make_key(first, 0, ["keypoints"], 300)
+
+    def test_reopens_dataset_when_its_stamps_change(self):
+        cache = DatasetCache(max_entries=2)
+        with tempfile.TemporaryDirectory() as data_root:
+            FakeStampedDataset.stamps = [1, 2]
+            first = cache.get_dataset(data_root, FakeStampedDataset)
+            assert cache.get_dataset(data_root, FakeStampedDataset) is first
+
+            FakeStampedDataset.stamps = [1, 3]
+            second = cache.get_dataset(data_root, FakeStampedDataset)
+            assert second is not first
+            assert second.dataset_digest != first.dataset_digest
+
+
+class RenderCacheTests(TestCase):
+    def test_memory_and_disk_tiers(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dataset = FakeDataset(cache_dir)
+            key = RenderCache.make_key(dataset, 3, ["keypoints", "bounding box"], 300)
+            assert key == RenderCache.make_key(
+                dataset, 3, ["bounding box", "keypoints"], 300
+            )
+
+            cache = RenderCache(max_bytes=10**6, cache_dir=cache_dir)
+            renders = []
+
+            def render():
+                renders.append(1)
+                return Image.new("RGB", (20, 10), (255, 0, 0))
+
+            image = cache.get_or_render(key, render)
+            assert cache.get_or_render(key, render) is image
+            assert len(renders) == 1
+
+            cache.clear()
+            from_disk = cache.get_or_render(key, render)
+            assert len(renders) == 1
+            assert from_disk.size == (20, 10)
+            assert from_disk.getpixel((0, 0)) == (255, 0, 0)
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.formats.perception.CaptureOffsetTable import (
+    CaptureOffsetTable,
+)
+
+
+class CaptureOffsetTableTests(TestCase):
+    def test_reads_single_capture_records(self):
+        with tempfile.TemporaryDirectory() as captures_dir:
+            caching.set_index_dir(os.path.join(captures_dir, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            # Files are numbered past 999 and hold different numbers of captures
+            layout = {"captures_999.json": [4, 2], "captures_1000.json": [3, 1, 0]}
+            for file, frames in layout.items():
+                captures = [
+                    {"id": f"cap{n}", "filename": f"RGB/rgb_{n}.png", "label": "é"}
+                    for n in frames
+                ]
+                with open(os.path.join(captures_dir, file), "w", encoding="utf8") as f:
+                    json.dump({"version": "0.0.1", "captures": captures}, f, indent=2)
+
+            table = CaptureOffsetTable(captures_dir).load()
+
+            assert table.files == ["captures_999.json", "captures_1000.json"]
+            assert [table.read_capture(i)["id"] for i in range(5)] == [
+                "cap0",
+                "cap1",
+                "cap2",
+                "cap3",
+                "cap4",
+            ]
+            assert table.read_capture(0)["label"] == "é"
+            assert table.get_location(0)[1:2] == (2,)
+
+            reloaded = CaptureOffsetTable(captures_dir).load()
+            assert reloaded.frame_numbers.tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.caching import DecodedFrameCache
+from datasetvisualizer.core.visualization import decoding
+from datasetvisualizer.core.visualization.decoding import (
+    get_reduction_factor,
+    open_image,
+    open_mask,
+)
+
+
+class TestDecoding(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image = Image.fromarray(
+            np.random.default_rng(0).integers(0, 256, (600, 800, 3), dtype=np.uint8)
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reduction_factor(self):
+        assert get_reduction_factor((3840, 2160), 400) == 8
+        assert get_reduction_factor((3840, 2160), 900) == 4
+        assert get_reduction_factor((800, 600), 500) == 1
+
+    def test_open_image_fits_max_size(self):
+        for extension in ("png", "jpg"):
+            path = os.path.join(self.tmp.name, f"rgb_0.{extension}")
+            self.image.save(path)
+            image, full_size = open_image(path, 200)
+            assert full_size == (800, 600)
+            assert image.size == (200, 150)
+
+            image, full_size = open_image(path)
+            assert image.size == full_size == (800, 600)
+
+    def test_open_image_converts_unreducible_modes(self):
+        images = {
+            "P": self.image.convert("P"),
+            "I;16": Image.fromarray(
+                np.arange(600 * 800, dtype=np.uint16).reshape(600, 800)
+            ),
+            "1": self.image.convert("1"),
+        }
+        for mode, source in images.items():
+            path = os.path.join(self.tmp.name, f"mode_{len(mode)}_{mode[0]}.png")
+            source.save(path)
+            assert Image.open(path).mode == mode
+            image, full_size = open_image(path, 100)
+            assert full_size == (800, 600)
+            assert image.size == (100, 75)
+
+    def test_open_mask_keeps_label_colors(self):
+        mask = np.zeros((600, 800, 3), dtype=np.uint8)
+        mask[:, 401:] = (10, 20, 30)
+        path = os.path.join(self.tmp.name, "segmentation_0.png")
+        Image.fromarray(mask).save(path)
+
+        resized = np.asarray(open_mask(path, (200, 150)))
+        assert resized.shape == (150, 200, 3)
+        colors = np.unique(resized.reshape(-1, 3), axis=0).tolist()
+        assert colors == [[0, 0, 0], [10, 20, 30]]
+
+    def test_decoded_cache_skips_decoding(self):
+        cache_dir = os.path.join(self.tmp.name, "decoded")
+        caching.decoded_cache.set_cache_dir(cache_dir)
+        self.addCleanup(caching.decoded_cache.set_cache_dir, None)
+        path = os.path.join(self.tmp.name, "rgb_0.png")
+        self.image.putalpha(255)
+        self.image.save(path)
+        mask_path = os.path.join(self.tmp.name, "segmentation_0.png")
+        self.image.convert("L").save(mask_path)
+
+        decoded, full_size = open_image(path, 200)
+        mask = open_mask(mask_path, (200, 150))
+        assert len(os.listdir(cache_dir)) == 2
+
+        opened = []
+        open_file = decoding.Image.open
+        self.addCleanup(setattr, decoding.Image, "open", open_file)
+        decoding.Image.open = lambda *args: opened.append(1) or open_file(*args)
+
+        cached, cached_size = open_image(path, 200)
+        assert cached_size == full_size == (800, 600)
+        assert cached.mode == "RGBA"
+        assert np.array_equal(np.asarray(cached), np.asarray(decoded))
+        cached_mask = open_mask(mask_path, (200, 150))
+        assert np.array_equal(np.asarray(cached_mask), np.asarray(mask))
+        # The header is still read for the full size but the mask is never opened
+        assert len(opened) == 1
+
+    def test_decoded_cache_evicts_least_recently_used(self):
+        cache_dir = os.path.join(self.tmp.name, "decoded")
+        cache = DecodedFrameCache(cache_dir, max_bytes=70000)
+        paths = []
+        for n in range(3):
+            path = os.path.join(self.tmp.name, f"rgb_{n}.png")
+            Image.new("RGB", (100, 100), (n, 0, 0)).save(path)
+            paths.append(path)
+
+        keys = [cache.make_key(path, ("max", None)) for path in paths]
+        cache.put(keys[0], Image.open(paths[0]).convert("RGB"))
+        cache.put(keys[1], Image.open(paths[1]).convert("RGB"))
+        past = os.stat(cache._get_path(keys[1])).st_mtime - 10
+        os.utime(cache._get_path(keys[1]), (past, past))
+        os.utime(cache._get_path(keys[0]), (past + 5, past + 5))
+        cache.put(keys[2], Image.open(paths[2]).convert("RGB"))
+
+        assert cache.disk_bytes <= cache.max_bytes
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]).getpixel((0, 0)) == (0, 0, 0)
+        assert cache.get(keys[2]).getpixel((0, 0)) == (2, 0, 0)
+        assert cache.make_key(os.path.join(self.tmp.name, "missing.png"), ()) is None
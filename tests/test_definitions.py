@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from datasetvisualizer.core.formats.definitions import DefinitionRegistry
+
+
+class DefinitionRegistryTests(TestCase):
+    def test_legacy_records(self):
+        registry = DefinitionRegistry(
+            [
+                {
+                    "id": "bb",
+                    "name": "bounding box",
+                    "spec": [{"label_id": 1, "label_name": "crate"}],
+                },
+                {
+                    "id": "kp",
+                    "name": "keypoints",
+                    "spec": [{"template_id": "t1", "key_points": [], "skeleton": []}],
+                },
+            ],
+            [{"id": "m", "name": "object count"}],
+        )
+
+        assert registry.get_annotation_names() == ["bounding box", "keypoints"]
+        assert registry.get_annotation_id("keypoints") == "kp"
+        assert registry.get_annotation_index("keypoints") == 1
+        assert registry.get_annotation_index("missing") == -1
+        assert registry.get_label_mappings("bb") == {1: "crate"}
+        assert registry.get_keypoint_template("t1")["template_id"] == "t1"
+        assert registry.get_metric_name("m") == "object count"
+        assert registry.get_metric_name("missing") is None
+
+    def test_solo_definitions(self):
+        template = {"templateId": "t1", "keypoints": [], "skeleton": []}
+        registry = DefinitionRegistry.from_solo(
+            {
+                "annotationDefinitions": [
+                    {
+                        "id": "bounding box",
+                        "spec": [{"label_id": 2, "label_name": "can"}],
+                    },
+                    {"id": "keypoints", "template": template},
+                ]
+            },
+            {"metricDefinitions": [{"id": "ObjectCount"}]},
+        )
+
+        assert registry.get_annotation_id("bounding box") == "bounding box"
+        assert registry.get_label_mappings("bounding box") == {2: "can"}
+        assert registry.get_label_mappings("keypoints") == {}
+        assert registry.get_keypoint_template("t1") is template
+        assert registry.get_metric_name("ObjectCount") == "ObjectCount"
@@ -0,0 +1,63 @@
+import io
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image, JpegImagePlugin
+
+from datasetvisualizer.core.caching import encoded_cache
+from datasetvisualizer.core.visualization.encoding import (
+    GRID_VIEW,
+    TRANSPORT_MAX_WIDTH,
+    ZOOM_VIEW,
+    EncodingSettings,
+    encode_frame,
+    encode_image,
+)
+
+
+class EncodingTests(TestCase):
+    def setUp(self):
+        self.addCleanup(encoded_cache.clear)
+        self.image = Image.fromarray(
+            np.random.default_rng(0).integers(0, 256, (300, 400, 3), dtype=np.uint8)
+        )
+
+    def test_encodes_with_settings(self):
+        for format, pil_format in (("jpeg", "JPEG"), ("webp", "WEBP"), ("png", "PNG")):
+            data = encode_image(self.image, EncodingSettings(format, 80))
+            decoded = Image.open(io.BytesIO(data))
+            assert decoded.format == pil_format
+            assert decoded.size == (400, 300)
+
+        for subsampling, sampling in (("4:4:4", 0), ("4:2:0", 2)):
+            data = encode_image(self.image, EncodingSettings("jpeg", 80, subsampling))
+            assert (
+                JpegImagePlugin.get_sampling(Image.open(io.BytesIO(data))) == sampling
+            )
+
+        with self.assertRaises(ValueError):
+            EncodingSettings("gif")
+
+    def test_downscales_to_transport_width(self):
+        wide = self.image.resize((TRANSPORT_MAX_WIDTH * 2, 600))
+        data = encode_image(wide, EncodingSettings())
+        assert Image.open(io.BytesIO(data)).size == (TRANSPORT_MAX_WIDTH, 300)
+
+        data = encode_image(wide, EncodingSettings(), max_width=None)
+        assert Image.open(io.BytesIO(data)).size == wide.size
+
+    def test_caches_encoded_frames(self):
+        data = encode_frame(self.image, GRID_VIEW, ("fake", 0))
+        assert encode_frame(Image.new("RGB", (4, 4)), GRID_VIEW, ("fake", 0)) is data
+        assert encode_frame(self.image, GRID_VIEW) is not data
+
+    def test_zoom_frames_are_lossless_at_full_size(self):
+        wide = self.image.resize((TRANSPORT_MAX_WIDTH * 2, 600))
+        zoom = Image.open(io.BytesIO(encode_frame(wide, ZOOM_VIEW, ("fake", 0))))
+        assert zoom.format == "PNG"
+        assert zoom.size == wide.size
+        assert np.array_equal(np.asarray(zoom), np.asarray(wide))
+
+        grid = Image.open(io.BytesIO(encode_frame(wide, GRID_VIEW, ("fake", 0))))
+        assert grid.format == "JPEG"
+        assert grid.size == (TRANSPORT_MAX_WIDTH, 300)
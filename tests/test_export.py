@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+from PIL import Image
+
+from datasetvisualizer.core.export import (
+    ExportJob,
+    main,
+    parse_frame_ranges,
+    run_export,
+    select_frames,
+)
+
+
+class FakeDataset:
+    renders = 0
+
+    def __init__(self, data_root):
+        self.data_root = data_root
+        self.dataset_valid = True
+
+    @staticmethod
+    def get_definition_files(data_root):
+        return []
+
+    def get_image_with_labelers(self, index, color, max_size=500):
+        FakeDataset.renders += 1
+        if index == 3:
+            raise ValueError("broken frame")
+        return Image.new("RGBA", (max_size, max_size), color)
+
+
+class ExportTests(TestCase):
+    def test_selects_range_frames_and_sample(self):
+        assert select_frames(10, start=2, end=8, step=2) == [2, 4, 6]
+        assert select_frames(10, end=50) == list(range(10))
+        assert select_frames(10, frames="0-2, 5, 8-20") == [0, 1, 2, 5, 8, 9]
+        assert select_frames(10, frames="3 - 4,") == [3, 4]
+
+        sample = select_frames(100, sample=5, seed=1)
+        assert len(sample) == 5 and sample == sorted(sample)
+        assert sample == select_frames(100, sample=5, seed=1)
+
+    def test_rejects_invalid_frames(self):
+        for spec in ("-5", "10-", "a", "1-2-3", "9-3"):
+            with self.assertRaises(ValueError):
+                parse_frame_ranges(spec)
+        with self.assertRaises(ValueError):
+            select_frames(10, frames="9-3")
+
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            with self.assertRaises(SystemExit):
+                main(["-d", ".", "-O", "out", "--frames", "10-"])
+        assert 'argument --frames: invalid frames "10-"' in err.getvalue()
+
+    def test_exports_frames_and_resumes(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            job = ExportJob(
+                FakeDataset, "fake", "get_image_with_labelers", ("red", 8), output_dir
+            )
+            progress = run_export(job, range(5), workers=1)
+
+            assert progress.done == 5 and progress.failed == 1
+            assert sorted(os.listdir(output_dir)) == [
+                f"frame_00000{i}.png" for i in (0, 1, 2, 4)
+            ]
+            assert Image.open(job.get_output_path(0)).size == (8, 8)
+
+            FakeDataset.renders = 0
+            progress = run_export(job, range(5), workers=1)
+            assert progress.skipped == 4 and FakeDataset.renders == 1
+
+    def test_exports_jpeg(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            job = ExportJob(
+                FakeDataset,
+                "fake",
+                "get_image_with_labelers",
+                ("blue", 8),
+                output_dir,
+                image_format="jpg",
+            )
+            run_export(job, [0], workers=1)
+
+            image = Image.open(job.get_output_path(0))
+            assert image.format == "JPEG" and image.mode == "RGB"
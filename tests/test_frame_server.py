@@ -0,0 +1,81 @@
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from PIL import Image
+
+from datasetvisualizer.core import frame_server
+from datasetvisualizer.core.caching import encoded_cache
+from datasetvisualizer.core.visualization.encoding import GRID_VIEW
+
+
+def fetch(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, dict(error.headers), b""
+
+
+class FrameServerTests(TestCase):
+    def setUp(self):
+        self.server = frame_server.FrameServer(port=0).start()
+        self.addCleanup(self.server.stop)
+
+    def test_serves_published_frames_with_cache_headers(self):
+        url = self.server.publish(b"frame bytes", "image/jpeg")
+        assert url.startswith(f"http://127.0.0.1:{self.server.port}/frames/")
+
+        status, headers, body = fetch(url)
+        assert status == 200
+        assert body == b"frame bytes"
+        assert headers["Content-Type"] == "image/jpeg"
+        assert headers["Cache-Control"] == frame_server.CACHE_CONTROL
+        assert headers["ETag"] == f'"{url.rsplit("/", 1)[1]}"'
+
+        status, headers, body = fetch(url, {"If-None-Match": headers["ETag"]})
+        assert status == 304
+        assert body == b""
+
+    def test_same_bytes_have_same_url(self):
+        assert self.server.publish(b"a", "image/jpeg") == self.server.publish(
+            b"a", "image/jpeg"
+        )
+        assert self.server.publish(b"a", "image/jpeg") != self.server.publish(
+            b"b", "image/jpeg"
+        )
+
+    def test_unknown_frames_are_not_found(self):
+        status, _, _ = fetch(f"{self.server.url}/frames/{'0' * 40}")
+        assert status == 404
+        status, _, _ = fetch(f"{self.server.url}/other")
+        assert status == 404
+
+    def test_public_url(self):
+        server = frame_server.FrameServer(public_url="https://host/proxy/")
+        assert server.publish(b"a", "image/png").startswith(
+            "https://host/proxy/frames/"
+        )
+
+
+class FrameSourceTests(TestCase):
+    def setUp(self):
+        self.addCleanup(encoded_cache.clear)
+        self.addCleanup(frame_server.stop_frame_server)
+        self.image = Image.new("RGB", (32, 24), (10, 20, 30))
+
+    def test_encoded_frame_without_server(self):
+        source = frame_server.get_frame_source(self.image, GRID_VIEW, key="frame")
+        assert isinstance(source, bytes)
+
+    def test_url_with_server(self):
+        data = frame_server.get_frame_source(self.image, GRID_VIEW, key="frame")
+        server = frame_server.start_frame_server(port=0)
+        url = frame_server.get_frame_source(self.image, GRID_VIEW, key="frame")
+        assert url.startswith(server.url)
+
+        status, headers, body = fetch(url)
+        assert status == 200
+        assert body == data
+        assert headers["Content-Type"] == "image/jpeg"
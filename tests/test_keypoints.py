@@ -0,0 +1,122 @@
+import unittest
+
+import numpy as np
+from datasetinsights.stats.visualization.plots import plot_keypoints
+from PIL import Image
+
+from datasetvisualizer.core.visualization.keypoints import (
+    DEFAULT_BONE_COLOR,
+    DEFAULT_JOINT_COLOR,
+    draw_keypoints,
+    get_legacy_colors,
+    get_solo_colors,
+)
+from datasetvisualizer.core.visualization.visualizers import (
+    draw_legacy_image_with_keypoints,
+)
+
+
+class TestKeypoints(unittest.TestCase):
+    def test_color_tables(self):
+        template = {
+            "keypoints": [{"index": 0, "color": [1, 2, 3, 4]}, {"index": 1}],
+            "skeleton": [{"joint1": 0, "joint2": 1}],
+        }
+        colors = get_solo_colors(template)
+        assert get_solo_colors(template) is colors
+        assert colors.bones.tolist() == [[0, 1]]
+        assert tuple(colors.bone_colors[0]) == DEFAULT_BONE_COLOR
+        joint_colors = colors.get_joint_colors(np.array([0, 1, -1, 5])).tolist()
+        assert (
+            joint_colors
+            == [[1, 2, 3, 4], list(DEFAULT_JOINT_COLOR)]
+            + [list(DEFAULT_JOINT_COLOR)] * 2
+        )
+
+    def test_legacy_drawing_matches_datasetinsights(self):
+        rng = np.random.default_rng(0)
+        num_joints = 5
+
+        def color():
+            return {c: float(rng.uniform(0.2, 1)) for c in "rgba"}
+
+        templates = [
+            {
+                "template_id": "t1",
+                "key_points": [
+                    {"index": i, "color": color()} for i in range(num_joints)
+                ],
+                "skeleton": [
+                    {"joint1": i, "joint2": i + 1, "color": color()}
+                    for i in range(num_joints - 1)
+                ],
+            }
+        ]
+        figures = [random_figure(rng, num_joints) for _ in range(300)]
+        figures[3]["template_guid"] = "unknown"
+
+        # OpenCV and PIL rasterize lines and dots slightly differently, the pixels they draw mostly overlap
+        image = Image.new("RGB", (640, 480))
+        expected = np.asarray(plot_keypoints(image.copy(), figures, templates))
+        actual = np.asarray(
+            draw_legacy_image_with_keypoints(image.copy(), figures, templates)
+        )
+        expected_mask = expected.any(axis=2)
+        actual_mask = actual.any(axis=2)
+        intersection = (expected_mask & actual_mask).sum()
+        union = (expected_mask | actual_mask).sum()
+        assert intersection / union > 0.8
+        assert get_legacy_colors(templates[0]).bones.shape == (num_joints - 1, 2)
+
+        # Far apart figures don't overlap, their joints have the template colors
+        sparse = []
+        for f in range(20):
+            figure = random_figure(rng, num_joints)
+            for j, keypoint in enumerate(figure["keypoints"]):
+                keypoint["x"] = 20.0 + 30 * f
+                keypoint["y"] = 20.0 + 90 * j
+                keypoint["state"] = 2
+            sparse.append(figure)
+        actual = np.asarray(
+            draw_legacy_image_with_keypoints(image.copy(), sparse, templates)
+        )
+        for j in range(num_joints):
+            joint_color = [
+                int(templates[0]["key_points"][j]["color"][c] * 255) for c in "rgb"
+            ]
+            for f in range(20):
+                assert actual[20 + 90 * j, 20 + 30 * f].tolist() == joint_color
+
+    def test_array_canvas_matches_image(self):
+        rng = np.random.default_rng(1)
+        template = {
+            "keypoints": [{"index": i} for i in range(4)],
+            "skeleton": [{"joint1": i, "joint2": i + 1} for i in range(3)],
+        }
+        locations = rng.uniform(-20, 120, (50, 4, 2))
+        states = np.full((50, 4), 2)
+        indices = np.tile(np.arange(4), (50, 1))
+        colors = get_solo_colors(template)
+
+        image = draw_keypoints(
+            Image.new("RGB", (100, 80)), locations, states, indices, colors
+        )
+        canvas = np.zeros((80, 100, 3), dtype=np.uint8)
+        assert draw_keypoints(canvas, locations, states, indices, colors) is canvas
+        assert np.array_equal(np.asarray(image), canvas)
+
+
+def random_figure(rng, num_joints):
+    center = rng.uniform(-20, 660, 2)
+    return {
+        "template_guid": "t1",
+        "keypoints": [
+            {
+                "index": j,
+                "x": float(center[0] + rng.uniform(-15, 15)),
+                "y": float(center[1] + rng.uniform(-15, 15)),
+                "state": int(rng.choice([0, 1, 2, 2])),
+            }
+            for j in range(num_joints)
+        ],
+    }
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.formats.perception.CaptureOffsetTable import (
+    CaptureOffsetTable,
+)
+from datasetvisualizer.core.formats.perception.LazyCaptures import (
+    LazyCaptures,
+    get_captures_size,
+)
+
+
+class LazyCapturesTests(TestCase):
+    def test_reads_captures_on_demand(self):
+        with tempfile.TemporaryDirectory() as captures_dir:
+            caching.set_index_dir(os.path.join(captures_dir, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            captures = [
+                {
+                    "id": f"cap{n}",
+                    "filename": f"RGB/rgb_{n}.png",
+                    "sensor": {"projection": "perspective"},
+                    "annotations": [
+                        {
+                            "id": f"box{n}",
+                            "annotation_definition": "boxes",
+                            "values": [{"label_id": n}],
+                        },
+                        {
+                            "id": f"seg{n}",
+                            "annotation_definition": "segmentation",
+                            "filename": f"Seg/seg_{n}.png",
+                        },
+                    ],
+                }
+                for n in (1, 0)
+            ]
+            path = os.path.join(captures_dir, "captures_000.json")
+            with open(path, "w", encoding="utf8") as f:
+                json.dump({"version": "0.0.1", "captures": captures}, f)
+
+            lazy = LazyCaptures(CaptureOffsetTable(captures_dir).load())
+
+            assert len(lazy) == 2
+            boxes = lazy.get_capture("boxes", 0)
+            assert boxes["filename"] == "RGB/rgb_0.png"
+            assert boxes["sensor"] == {"projection": "perspective"}
+            assert boxes["annotation.id"] == "box0"
+            assert boxes["annotation.values"] == [{"label_id": 0}]
+            assert "annotations" not in boxes
+
+            segmentation = lazy.get_capture("segmentation", 1)
+            assert segmentation["annotation.filename"] == "Seg/seg_1.png"
+            assert segmentation["annotation.values"] == []
+            assert lazy.get_capture("keypoints", 1)["annotation.values"] == []
+            assert len(lazy.records) == 2
+
+            assert get_captures_size([path, os.path.join(captures_dir, "x.json")]) == (
+                os.path.getsize(path)
+            )
+            with self.assertRaises(IndexError):
+                lazy.get_capture("boxes", 2)
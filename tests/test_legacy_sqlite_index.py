@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.formats.perception.LegacySQLiteIndex import (
+    LegacySQLiteIndex,
+)
+
+
+def write_captures(captures_dir, file, frames):
+    captures = [
+        {
+            "id": f"cap{n}",
+            "sequence_id": "seq",
+            "step": n,
+            "sensor": {"projection": "perspective"},
+            "filename": f"RGB/rgb_{n}.png",
+            "annotations": [
+                {
+                    "id": f"box{n}",
+                    "annotation_definition": "boxes",
+                    "values": [{"label_id": n, "label_name": "é"}],
+                },
+                {
+                    "id": f"seg{n}",
+                    "annotation_definition": "segmentation",
+                    "filename": f"Seg/seg_{n}.png",
+                },
+            ],
+        }
+        for n in frames
+    ]
+    with open(os.path.join(captures_dir, file), "w", encoding="utf8") as f:
+        json.dump({"version": "0.0.1", "captures": captures}, f)
+
+
+class LegacySQLiteIndexTests(TestCase):
+    def test_queries_captures_and_metrics(self):
+        with tempfile.TemporaryDirectory() as captures_dir:
+            caching.set_index_dir(os.path.join(captures_dir, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            write_captures(captures_dir, "captures_000.json", [2, 0])
+            write_captures(captures_dir, "captures_001.json", [1])
+            metrics = [
+                {"sequence_id": "seq", "step": step, "metric_definition": "m"}
+                for step in (1, 0, 1)
+            ]
+            with open(os.path.join(captures_dir, "metrics_000.json"), "w") as f:
+                json.dump({"version": "0.0.1", "metrics": metrics}, f)
+
+            assert LegacySQLiteIndex.open(captures_dir) is None
+            LegacySQLiteIndex(captures_dir).build()
+            index = LegacySQLiteIndex.open(captures_dir)
+
+            assert len(index) == 3
+            boxes = index.get_capture("boxes", 0)
+            assert boxes["filename"] == "RGB/rgb_0.png"
+            assert boxes["sensor"] == {"projection": "perspective"}
+            assert boxes["annotation.values"] == [{"label_id": 0, "label_name": "é"}]
+            assert index.get_capture("segmentation", 2)["annotation.filename"] == (
+                "Seg/seg_2.png"
+            )
+            assert index.get_capture("keypoints", 1)["annotation.values"] == []
+            with self.assertRaises(IndexError):
+                index.get_capture("boxes", 3)
+
+            record = index.get_capture_record(1)
+            assert record["id"] == "cap1"
+            assert [a["id"] for a in record["annotations"]] == ["box1", "seg1"]
+            assert len(index.get_metrics("seq", 1)) == 2
+            assert index.get_metrics("seq", 5) == []
+
+            write_captures(captures_dir, "captures_002.json", [3])
+            assert LegacySQLiteIndex.open(captures_dir) is None
@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from PIL import Image
+
+from datasetvisualizer.core.caching import render_cache
+from datasetvisualizer.core.visualization.mosaic import (
+    MOSAIC_PADDING,
+    compose_mosaic,
+    find_tile,
+    get_tile_width,
+    mosaic_cache,
+    render_mosaic,
+)
+
+
+class FakeDataset:
+    data_root = "fake"
+
+    def __init__(self):
+        self.rendered = []
+
+    def get_render_key(self, index, color, max_size=500):
+        return "fake", index, color, max_size
+
+    def get_image_with_labelers(self, index, color, max_size=500):
+        self.rendered.append(index)
+        return Image.new("RGB", (max_size, max_size // 2), color)
+
+
+class MosaicTests(TestCase):
+    def setUp(self):
+        self.addCleanup(render_cache.clear)
+        self.addCleanup(mosaic_cache.clear)
+
+    def test_maps_pixels_to_frames(self):
+        tile_width = get_tile_width(2, width=200)
+        assert tile_width == 100 - 2 * MOSAIC_PADDING
+        frames = {
+            i: Image.new("RGB", (tile_width, tile_width // 2), (i, 0, 0))
+            for i in (4, 5, 6)
+        }
+        mosaic, tiles = compose_mosaic(frames, [4, 5, 6, 7], 2, width=200)
+
+        assert mosaic.width == 200
+        assert [index for index, _ in tiles] == [4, 5, 6]
+        left, top, right, bottom = dict(tiles)[6]
+        assert (left, top) == (MOSAIC_PADDING, tile_width // 2 + 3 * MOSAIC_PADDING)
+        assert mosaic.getpixel((left, top)) == (6, 0, 0)
+        assert find_tile(tiles, right - 1, bottom - 1) == 6
+        assert find_tile(tiles, 150, 10) == 5
+        assert find_tile(tiles, 0, 0) is None
+        assert find_tile(tiles, 150, bottom - 1) is None
+
+    def test_reuses_encoded_pages(self):
+        ds = FakeDataset()
+        uri, tiles = render_mosaic(
+            ds, "get_image_with_labelers", [0, 1, 2], 3, None, "red", max_size=40
+        )
+        assert uri.startswith("data:image/jpeg;base64,")
+        assert sorted(ds.rendered) == [0, 1, 2]
+
+        assert render_mosaic(
+            ds, "get_image_with_labelers", [0, 1, 2], 3, None, "red", max_size=40
+        ) == (uri, tiles)
+        assert len(ds.rendered) == 3
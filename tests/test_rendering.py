@@ -0,0 +1,148 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+from PIL import Image
+
+from datasetvisualizer.core.caching import render_cache
+from datasetvisualizer.core.rendering import (
+    RenderExecutor,
+    RenderGeneration,
+    WorkerSettings,
+    get_neighbor_frames,
+    get_neighbor_pages,
+)
+
+
+class FakeDataset:
+    data_root = "fake"
+
+    def __init__(self):
+        self.rendered = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_render_key(self, index, color, max_size=500):
+        return "fake", index, color, max_size
+
+    def get_image_with_labelers(self, index, color, max_size=500):
+        self.started.set()
+        self.release.wait()
+        self.rendered.append(index)
+        return Image.new("RGB", (max_size, max_size), color)
+
+
+class RenderExecutorTests(TestCase):
+    def setUp(self):
+        self.addCleanup(render_cache.clear)
+
+    def test_renders_every_frame(self):
+        executor = RenderExecutor(workers=4)
+        frames = dict(
+            executor.render_frames(
+                FakeDataset(), "get_image_with_labelers", range(10), "red", max_size=8
+            )
+        )
+
+        assert sorted(frames.keys()) == list(range(10))
+        assert all(image.size == (8, 8) for image in frames.values())
+
+    def test_neighbors(self):
+        assert get_neighbor_pages(10, 5, 18) == [15, 16, 17, 5, 6, 7, 8, 9]
+        assert get_neighbor_pages(0, 5, 8) == [5, 6, 7]
+        assert get_neighbor_frames(1, 2, 4) == [2, 0, 3]
+
+    def test_prefetches_into_render_cache(self):
+        executor = RenderExecutor(workers=4, prefetch_workers=1)
+        ds = FakeDataset()
+        ds.release.clear()
+        executor.prefetch(ds, "get_image_with_labelers", [3, 4, 5], "red", max_size=8)
+        ds.started.wait()
+        executor.cancel_prefetches(keep=[ds.get_render_key(4, "red", 8)])
+        ds.release.set()
+        executor._prefetch_executor.shutdown(wait=True)
+
+        assert ds.rendered == [3, 4]
+        assert render_cache.get(ds.get_render_key(3, "red", 8)).size == (8, 8)
+        assert render_cache.get(ds.get_render_key(4, "red", 8)).size == (8, 8)
+        assert render_cache.get(ds.get_render_key(5, "red", 8)) is None
+
+    def test_requested_frames_reuse_running_prefetches(self):
+        executor = RenderExecutor(workers=4, prefetch_workers=1)
+        ds = FakeDataset()
+        ds.release.clear()
+        executor.prefetch(ds, "get_image_with_labelers", [1, 2, 3], "red", max_size=8)
+        ds.started.wait()
+        # Changing the labelers cancels the prefetches that haven't started
+        executor.prefetch(ds, "get_image_with_labelers", [1], "blue", max_size=8)
+
+        # The requested frame waits for its running prefetch and cancels the queued ones
+        ds.release.set()
+        image = executor.render_frame(ds, "get_image_with_labelers", 1, "red", 8)
+        executor._prefetch_executor.shutdown(wait=True)
+
+        assert image.getpixel((0, 0)) == (255, 0, 0)
+        assert ds.rendered == [1]
+        assert render_cache.get(ds.get_render_key(2, "red", 8)) is None
+        assert render_cache.get(ds.get_render_key(1, "blue", 8)) is None
+
+    def test_cancelled_generation_drops_its_frames(self):
+        executor = RenderExecutor(workers=2, prefetch_workers=0)
+        ds = FakeDataset()
+        ds.release.clear()
+        generation = RenderGeneration()
+        frames = []
+        consumer = threading.Thread(
+            target=lambda: frames.extend(
+                executor.render_frames(
+                    ds,
+                    "get_image_with_labelers",
+                    range(10),
+                    "red",
+                    generation=generation,
+                    max_size=8,
+                )
+            )
+        )
+        consumer.start()
+        ds.started.wait()
+
+        # A rerun of the script cancels the generation while the first frames render
+        generation.cancel()
+        ds.release.set()
+        consumer.join()
+        executor.get_executor().shutdown(wait=True)
+
+        assert frames == []
+        assert 1 <= len(ds.rendered) <= 2
+        assert (
+            executor.render_frame(
+                ds, "get_image_with_labelers", 0, "red", generation=generation
+            )
+            is None
+        )
+
+    def test_process_workers_get_settings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = os.path.join(tmp, "index")
+            decoded_dir = os.path.join(tmp, "decoded")
+            previous = WorkerSettings.current()
+            # Cleanups run last in first out, the budget of the render cache is restored after the settings
+            self.addCleanup(render_cache.set_max_bytes, render_cache.memory.max_bytes)
+            self.addCleanup(previous.apply)
+            WorkerSettings(index_dir, 1234, decoded_dir, 5678).apply()
+
+            executor = RenderExecutor(workers=1, use_processes=True)
+            try:
+                settings = (
+                    executor.get_executor().submit(WorkerSettings.current).result()
+                )
+            finally:
+                executor.get_executor().shutdown(wait=True)
+
+            assert settings.index_dir == index_dir
+            assert settings.lazy_captures_threshold == 1234
+            assert settings.decoded_cache_dir == decoded_dir
+            assert settings.decoded_cache_bytes == 5678
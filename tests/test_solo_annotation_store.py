@@ -0,0 +1,211 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.formats.solo.SoloAnnotations import (
+    BOUNDING_BOX_3D_TYPE,
+    BOUNDING_BOX_TYPE,
+    KEYPOINT_TYPE,
+    SEMANTIC_SEGMENTATION_TYPE,
+)
+from datasetvisualizer.core.formats.solo.SoloAnnotationStore import SoloAnnotationStore
+from datasetvisualizer.core.formats.solo.SoloFrameIndex import SoloFrameIndex
+
+
+def make_frame(step):
+    return {
+        "captures": [
+            {
+                "id": "camera",
+                "filename": f"step{step}.camera.png",
+                "matrix": [1, 0, 0, 0, 1, 0, 0, 0, 1],
+                "projection": "Perspective",
+                "annotations": [
+                    {
+                        "@type": BOUNDING_BOX_TYPE,
+                        "id": "bounding box",
+                        "values": [
+                            {
+                                "labelId": 1 + i,
+                                "labelName": f"label{i}",
+                                "origin": [step, i],
+                                "dimension": [10, 20],
+                            }
+                            for i in range(step + 1)
+                        ],
+                    },
+                    {
+                        "@type": BOUNDING_BOX_3D_TYPE,
+                        "id": "bounding box 3D",
+                        "values": [
+                            {
+                                "labelId": 4,
+                                "translation": [0, 0, 5],
+                                "size": [1, 2, 3],
+                                "rotation": [0, 0, 0, 1],
+                            }
+                        ],
+                    },
+                    {
+                        "@type": KEYPOINT_TYPE,
+                        "id": "keypoints",
+                        "templateId": "template",
+                        "values": [
+                            {
+                                "labelId": 2,
+                                "keypoints": [
+                                    {"index": 0, "location": [1, 2], "state": 2},
+                                    {"index": 1, "location": [3, 4], "state": 1},
+                                ],
+                            },
+                            {
+                                "labelId": 3,
+                                "keypoints": [
+                                    {"index": 0, "location": [5, 6], "state": 2}
+                                ],
+                            },
+                        ],
+                    },
+                    {
+                        "@type": SEMANTIC_SEGMENTATION_TYPE,
+                        "id": "semantic segmentation",
+                        "filename": f"step{step}.semantic.png",
+                    },
+                ],
+            }
+        ]
+    }
+
+
+def write_sequence(data_root, sequence, steps):
+    sequence_path = os.path.join(data_root, f"sequence.{sequence}")
+    os.makedirs(sequence_path)
+    for step in range(steps):
+        with open(os.path.join(sequence_path, f"step{step}.frame_data.json"), "w") as f:
+            json.dump(make_frame(step), f)
+
+
+class SoloAnnotationStoreTests(TestCase):
+    def test_reads_frames_from_store(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            caching.set_index_dir(os.path.join(data_root, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            write_sequence(data_root, 0, 2)
+            write_sequence(data_root, 1, 1)
+
+            frame_index = SoloFrameIndex(data_root).load()
+            store = SoloAnnotationStore(data_root, frame_index)
+            assert store.build() == 2
+
+            frame = store.get_frame(1)
+            assert frame.sensor.filename == "step1.camera.png"
+            assert frame.sensor.projection == "Perspective"
+            assert frame.sequence_path == os.path.join(data_root, "sequence.0")
+
+            boxes = frame.get_annotation(BOUNDING_BOX_TYPE, "bounding box")
+            assert boxes.label_ids.tolist() == [1, 2]
+            assert boxes.label_names == ["label0", "label1"]
+            assert boxes.origins.tolist() == [[1, 0], [1, 1]]
+
+            boxes_3d = frame.get_annotation(BOUNDING_BOX_3D_TYPE, "bounding box 3D")
+            assert boxes_3d.sizes.tolist() == [[1, 2, 3]]
+
+            figures = frame.get_annotation(KEYPOINT_TYPE, "keypoints")
+            assert figures.template_id == "template"
+            assert figures.label_ids.tolist() == [2, 3]
+            assert np.array_equal(figures.states, [[2, 1], [2, 0]])
+            assert np.array_equal(figures.indices, [[0, 1], [0, -1]])
+            assert figures.locations[1, 0].tolist() == [5, 6]
+
+            semantic = frame.get_annotation(SEMANTIC_SEGMENTATION_TYPE, "semantic")
+            assert semantic is None
+            semantic = frame.get_annotation(
+                SEMANTIC_SEGMENTATION_TYPE, "semantic segmentation"
+            )
+            assert semantic == "step1.semantic.png"
+
+            assert store.get_frame(2).sequence_path == os.path.join(
+                data_root, "sequence.1"
+            )
+
+    def test_builds_only_new_sequences(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            caching.set_index_dir(os.path.join(data_root, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            write_sequence(data_root, 0, 2)
+            SoloAnnotationStore(data_root, SoloFrameIndex(data_root).load()).build()
+
+            write_sequence(data_root, 1, 3)
+            frame_index = SoloFrameIndex(data_root).load()
+            store = SoloAnnotationStore(data_root, frame_index)
+            assert store.get_frame(0) is not None
+            assert store.get_frame(2) is None
+
+            built = []
+            assert store.build(lambda sequence, was_built: built.append(was_built)) == 1
+            assert built == [False, True]
+            boxes = store.get_frame(4).get_annotation(BOUNDING_BOX_TYPE, "bounding box")
+            assert len(boxes) == 3
+
+    def test_rebuilds_frames_rewritten_in_place(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            caching.set_index_dir(os.path.join(data_root, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            write_sequence(data_root, 0, 2)
+            frame_index = SoloFrameIndex(data_root).load()
+            SoloAnnotationStore(data_root, frame_index).build()
+
+            sequence_path = os.path.join(data_root, "sequence.0")
+            directory_stat = os.stat(sequence_path)
+            path = os.path.join(sequence_path, "step1.frame_data.json")
+            with open(path, "w") as f:
+                json.dump(make_frame(3), f)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            assert os.stat(sequence_path).st_mtime_ns == directory_stat.st_mtime_ns
+
+            store = SoloAnnotationStore(data_root, frame_index)
+            assert store.get_frame(1) is None
+            assert store.build() == 1
+            boxes = store.get_frame(1).get_annotation(BOUNDING_BOX_TYPE, "bounding box")
+            assert len(boxes) == 4
+
+    def test_dataset_stamps_change_with_frames_and_store(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            caching.set_index_dir(os.path.join(data_root, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            write_sequence(data_root, 0, 2)
+
+            def stamps():
+                return SoloFrameIndex.get_dataset_stamp(
+                    data_root
+                ) + SoloAnnotationStore.get_store_stamp(data_root)
+
+            initial = stamps()
+            assert initial[:2] == [1, 2]
+            assert stamps() == initial
+
+            write_sequence(data_root, 1, 3)
+            added = stamps()
+            assert added[:2] == [2, 5]
+
+            frame_index = SoloFrameIndex(data_root).load()
+            SoloAnnotationStore(data_root, frame_index).build()
+            built = stamps()
+            assert built[:3] == added
+            assert built[4] == 2
+
+            path = os.path.join(data_root, "sequence.1", "step0.frame_data.json")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            rewritten = stamps()
+            assert rewritten[2] > built[2]
+
+            sequence_file = os.path.join(built[3], "sequence.1.npz")
+            stat = os.stat(sequence_file)
+            os.utime(sequence_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            assert stamps()[5] > rewritten[5]
@@ -0,0 +1,35 @@
+import unittest
+
+import numpy as np
+
+from datasetvisualizer.core.formats.solo.SoloAnnotations import (
+    BoundingBoxes2D,
+    KeypointFigures,
+)
+
+
+class TestSoloAnnotations(unittest.TestCase):
+    def test_scaled_boxes(self):
+        boxes = BoundingBoxes2D(
+            np.array([1]),
+            ["crate"],
+            np.array([[100, 50]], dtype=np.float32),
+            np.array([[40, 20]], dtype=np.float32),
+        )
+        scaled = boxes.scaled(0.5, 0.25)
+        assert scaled.origins.tolist() == [[50, 12.5]]
+        assert scaled.dimensions.tolist() == [[20, 5]]
+        assert boxes.origins.tolist() == [[100, 50]]
+
+    def test_scaled_keypoints(self):
+        figures = KeypointFigures(
+            "template",
+            np.array([1]),
+            np.array([[[10, 20], [30, 40]]], dtype=np.float32),
+            np.array([[2, 0]]),
+            np.array([[0, 1]]),
+        )
+        scaled = figures.scaled(0.5, 0.5)
+        assert scaled.locations.tolist() == [[[5, 10], [15, 20]]]
+        assert scaled.states is figures.states
+        assert scaled.template_id == "template"
@@ -0,0 +1,38 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from datasetvisualizer.core import caching
+from datasetvisualizer.core.formats.solo.SoloFrameIndex import SoloFrameIndex
+
+
+class SoloFrameIndexTests(TestCase):
+    def test_sequences_of_different_lengths(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            caching.set_index_dir(os.path.join(data_root, "index"))
+            self.addCleanup(caching.set_index_dir, caching.DEFAULT_INDEX_DIR)
+            for sequence, steps in {0: 3, 1: 0, 2: 1, 10: 2}.items():
+                sequence_path = os.path.join(data_root, f"sequence.{sequence}")
+                os.makedirs(sequence_path)
+                for step in range(steps):
+                    for file in [f"step{step}.frame_data.json", f"step{step}.png"]:
+                        open(os.path.join(sequence_path, file), "w").close()
+
+            index = SoloFrameIndex(data_root).load()
+
+            assert len(index) == 6
+            assert [index.resolve(i) for i in range(6)] == [
+                (0, 0),
+                (0, 1),
+                (0, 2),
+                (2, 0),
+                (10, 0),
+                (10, 1),
+            ]
+            assert index.get_frame_data_path(5) == os.path.join(
+                data_root, "sequence.10", "step1.frame_data.json"
+            )
+            with self.assertRaises(IndexError):
+                index.resolve(6)
+
+            assert len(SoloFrameIndex(data_root).load()) == 6
@@ -0,0 +1,155 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+from datasetinsights.io.bbox import BBox2D
+from datasetinsights.stats.visualization.bbox2d_plot import add_single_bbox_on_image
+from PIL import Image
+
+from datasetvisualizer.core.formats.solo.SoloAnnotations import BoundingBoxes2D
+from datasetvisualizer.core.visualization.box_3d import draw_boxes_3d
+from datasetvisualizer.core.visualization.visualizers import (
+    BOX_3D_LINE_WIDTH,
+    KEYPOINT_VISUAL_WIDTH,
+    draw_image_with_box_3d,
+    draw_image_with_keypoints,
+    draw_image_with_segmentation,
+    draw_solo_image_with_boxes,
+    plot_keypoints_with_color,
+)
+
+
+class TestSegmentationOverlay(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new("RGB", (3, 2), (100, 100, 100))
+        segmentation = np.zeros((2, 3, 4), dtype=np.uint8)
+        segmentation[..., 3] = 255
+        segmentation[0, 0] = (255, 0, 0, 255)
+        segmentation[1, 2] = (0, 0, 0, 128)
+        self.segmentation = Image.fromarray(segmentation, "RGBA")
+
+    def test_black_is_left_out_and_colors_are_blended(self):
+        result = np.asarray(draw_image_with_segmentation(self.image, self.segmentation))
+        assert result.shape == (2, 3, 3)
+        assert tuple(result[0, 1]) == (100, 100, 100)
+        assert tuple(result[0, 0]) == (193, 40, 40)
+        # Translucent black keeps its own alpha
+        assert tuple(result[1, 2]) == (50, 50, 50)
+        assert tuple(np.asarray(self.image)[0, 0]) == (100, 100, 100)
+
+    def test_opacity(self):
+        opaque = draw_image_with_segmentation(self.image, self.segmentation, 1.0)
+        hidden = draw_image_with_segmentation(self.image, self.segmentation, 0.0)
+        assert opaque.getpixel((0, 0)) == (255, 0, 0)
+        assert hidden.getpixel((0, 0)) == (100, 100, 100)
+
+    def test_array_canvas(self):
+        expected = np.asarray(
+            draw_image_with_segmentation(self.image, self.segmentation)
+        )
+        canvas = np.array(self.image)
+        assert draw_image_with_segmentation(canvas, self.segmentation) is canvas
+        assert np.array_equal(canvas, expected)
+
+    def test_rgba_image(self):
+        image = self.image.convert("RGBA")
+        image.putpixel((0, 0), (100, 100, 100, 0))
+        expected = image.copy()
+        foreground = np.array(self.segmentation)
+        foreground[..., 3] = [[153, 0, 0], [0, 0, 128]]
+        foreground = Image.fromarray(foreground, "RGBA")
+        expected.paste(foreground, (0, 0), foreground)
+        result = draw_image_with_segmentation(image, self.segmentation)
+        assert result.mode == "RGBA"
+        assert np.array_equal(np.asarray(result), np.asarray(expected))
+
+    def test_smaller_segmentation(self):
+        segmentation = self.segmentation.crop((0, 0, 2, 1))
+        result = draw_image_with_segmentation(self.image, segmentation)
+        assert result.size == self.image.size
+        assert result.getpixel((2, 1)) == (100, 100, 100)
+
+
+class TestSoloLineWidths(unittest.TestCase):
+    """Keypoints and 3D boxes drawn on a downscaled SOLO frame are as thick as at full resolution once scaled"""
+
+    def setUp(self):
+        self.image = Image.new("RGB", (160, 120))
+
+    def test_keypoints(self):
+        figures = SimpleNamespace(
+            locations=np.array([[[20.0, 20.0], [100.0, 80.0]]]),
+            states=np.array([[2, 2]]),
+            indices=np.array([[0, 1]]),
+        )
+        template = {
+            "keypoints": [
+                {"index": 0, "color": [255, 0, 0, 255]},
+                {"index": 1, "color": [0, 255, 0, 255]},
+            ],
+            "skeleton": [{"joint1": 0, "joint2": 1, "color": [0, 0, 255, 255]}],
+        }
+
+        full = draw_image_with_keypoints(self.image.copy(), figures, template)
+        reduced = draw_image_with_keypoints(
+            self.image.copy(), figures, template, scale=0.25
+        )
+        expected = plot_keypoints_with_color(
+            self.image.copy(), figures, template, round(KEYPOINT_VISUAL_WIDTH / 4)
+        )
+        assert np.array_equal(np.asarray(reduced), np.asarray(expected))
+        assert np.count_nonzero(np.asarray(reduced)) < np.count_nonzero(
+            np.asarray(full)
+        )
+
+    def test_boxes_2d(self):
+        # The 640x480 image is a 1920x1440 capture downscaled 3 times
+        image = Image.new("RGB", (640, 480))
+        boxes = BoundingBoxes2D(
+            np.array([1]),
+            ["car"],
+            np.array([[240.0, 240.0]]),
+            np.array([[960.0, 720.0]]),
+        )
+        drawn = draw_solo_image_with_boxes(
+            image, boxes, {1: "car"}, scale=(1 / 3, 1 / 3), full_height=1440
+        )
+
+        # Lines are 1440 // 250 = 5 pixels wide at full resolution, sizing them from the 480 pixels high image would
+        # make them 480 // 250 = 1 pixel wide
+        expected = np.array(image)
+        add_single_bbox_on_image(
+            expected,
+            BBox2D(label=1, x=80, y=80, w=320, h=240, score=1),
+            "car",
+            None,
+            font_size=round(1440 // 35 / 3),
+            box_line_width=round(1440 // 250 / 3),
+        )
+        assert np.array_equal(np.asarray(drawn), expected)
+        assert np.asarray(drawn)[200, 81].any()
+
+    def test_box_3d(self):
+        sensor = SimpleNamespace(
+            matrix=[1.7, 0, 0, 0, 3.0, 0, 0, 0, -1.0], projection="Perspective"
+        )
+        boxes = SimpleNamespace(
+            translations=np.array([[0.5, 0.2, 8.0]]),
+            sizes=np.array([[2.0, 1.5, 1.0]]),
+            rotations=np.array([[0.0, 0.3, 0.0, 0.95]]),
+        )
+        projection = np.array([[1.7, 0, 0], [0, 3.0, 0], [0, 0, -1.0]])
+
+        for scale, line_width in ((1.0, BOX_3D_LINE_WIDTH), (0.25, 1)):
+            drawn = draw_image_with_box_3d(
+                self.image.copy(), sensor, boxes, None, scale=scale
+            )
+            expected = draw_boxes_3d(
+                self.image.copy(),
+                boxes.translations,
+                boxes.sizes,
+                boxes.rotations,
+                projection,
+                line_width=line_width,
+            )
+            assert np.array_equal(np.asarray(drawn), np.asarray(expected))